@@ -0,0 +1,3 @@
+"""
+EVduty charging stations synthetic fleet benchmarks
+"""
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import platform
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock
+
+from evdutyapi import EVDutyApi, Station
+
+from custom_components.evduty import EVDutyCoordinator, DOMAIN, number, sensor
+from custom_components.evduty.entity import EVDutyTerminalDevice
+from test import hass_mocks
+from .fleet import fleet, charged
+
+SIZES = [1, 100, 1000, 10000]
+MANIFEST = Path(__file__).parent.parent / 'custom_components' / DOMAIN / 'manifest.json'
+
+Run = Callable[[], Awaitable]
+
+
+async def measure(prepare: Callable[[], Awaitable[Run]], repeat: int) -> dict:
+    # everything runs on the event loop, so wall time is event loop time
+    durations = []
+    for _ in range(repeat):
+        run = await prepare()
+        start = time.perf_counter()
+        await run()
+        durations.append(time.perf_counter() - start)
+
+    run = await prepare()
+    tracemalloc.start()
+    await run()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': min(durations), 'peak_memory': peak_memory}
+
+
+def coordinator(stations: list[Station]) -> EVDutyCoordinator:
+    hass = hass_mocks.hass_mock()
+    api = Mock(EVDutyApi)
+    api.async_get_stations = AsyncMock(return_value=stations)
+    evduty_coordinator = EVDutyCoordinator(hass=hass, config_entry=hass_mocks.config_entry_mock(), api=api)
+    evduty_coordinator.data = {terminal.id: terminal for station in stations for terminal in station.terminals}
+    hass.data[DOMAIN] = {'e': evduty_coordinator}
+    return evduty_coordinator
+
+
+async def entities(evduty_coordinator: EVDutyCoordinator) -> list:
+    added = []
+    entry = Mock(entry_id='e')
+    await sensor.async_setup_entry(evduty_coordinator.hass, entry, added.extend)
+    await number.async_setup_entry(evduty_coordinator.hass, entry, added.extend)
+    return added
+
+
+async def update_data(stations: list[Station]) -> Run:
+    return coordinator(stations)._async_update_data
+
+
+async def entity_creation(stations: list[Station]) -> Run:
+    evduty_coordinator = coordinator(stations)
+    return lambda: entities(evduty_coordinator)
+
+
+async def update_fan_out(stations: list[Station]) -> Run:
+    # entities listen like once added to hass, then a poll reports more energy on every charging terminal
+    evduty_coordinator = coordinator(stations)
+    evduty_coordinator.async_update_listeners()
+    for entity in await entities(evduty_coordinator):
+        if not isinstance(entity, EVDutyTerminalDevice):
+            continue
+        entity.async_write_ha_state = Mock()
+        entity._written_state = entity._state()
+        evduty_coordinator.async_add_listener(entity._handle_coordinator_update, entity._terminal.id)
+    polled = {terminal.id: terminal for station in charged(stations, 100) for terminal in station.terminals}
+
+    async def run():
+        evduty_coordinator.async_set_updated_data(polled)
+
+    return run
+
+
+BENCHMARKS = {
+    'update_data': update_data,
+    'entity_creation': entity_creation,
+    'update_fan_out': update_fan_out,
+}
+
+
+async def async_benchmark(sizes: list[int], repeat: int, baseline: dict[tuple[str, int], dict]) -> list[dict]:
+    results = []
+    for size in sizes:
+        stations = fleet(size)
+        for name, benchmark in BENCHMARKS.items():
+            result = await measure(lambda: benchmark(stations), repeat)
+            line = f'{name:16} {size:>6} terminals {result["seconds"] * 1000:>10.2f} ms {result["peak_memory"] / 1024:>10.0f} KiB'
+            if (previous := baseline.get((name, size))) is not None:
+                line += f' {result["seconds"] / previous["seconds"]:>6.2f}x time {result["peak_memory"] / previous["peak_memory"]:>6.2f}x memory'
+            print(line)
+            results.append({'benchmark': name, 'terminals': size, **result})
+    return results
+
+
+def load_baseline(path: Path | None) -> dict[tuple[str, int], dict]:
+    if path is None:
+        return {}
+    return {(result['benchmark'], result['terminals']): result for result in json.loads(path.read_text())['results']}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python3 -m benchmark', description='Time the EVduty coordinator and entity update path on synthetic fleets')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='number of terminals of each fleet')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each benchmark, the fastest is kept')
+    parser.add_argument('--output', type=Path, default=Path('benchmark.json'), help='json file receiving the results')
+    parser.add_argument('--baseline', type=Path, help='results of a previous version to compare with')
+    args = parser.parse_args()
+
+    results = asyncio.run(async_benchmark(args.sizes, args.repeat, load_baseline(args.baseline)))
+    args.output.write_text(json.dumps({
+        'version': json.loads(MANIFEST.read_text())['version'],
+        'python': platform.python_version(),
+        'results': results,
+    }, indent=2))
+    print(f'Results saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
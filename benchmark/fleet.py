@@ -0,0 +1,41 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from evdutyapi import Station, Terminal, ChargingStatus, ChargingSession, NetworkInfo, ChargingProfile
+
+TERMINALS_PER_STATION = 2
+
+
+def fleet(size: int) -> list[Station]:
+    terminals = [terminal(index) for index in range(size)]
+    return [Station(id=f'station-{index}', name=f'Station {index}', terminals=terminals[index:index + TERMINALS_PER_STATION])
+            for index in range(0, size, TERMINALS_PER_STATION)]
+
+
+def terminal(index: int) -> Terminal:
+    charging = index % 2 == 0
+    return Terminal(id=f'terminal-{index}',
+                    station_id=f'station-{index // TERMINALS_PER_STATION}',
+                    name=f'Terminal {index}',
+                    status=ChargingStatus.in_use if charging else ChargingStatus.available,
+                    charge_box_identity='model',
+                    firmware_version='1.0.0',
+                    session=ChargingSession(is_active=charging,
+                                            is_charging=charging,
+                                            volt=240,
+                                            amp=30 if charging else 0,
+                                            power=7200 if charging else 0,
+                                            energy_consumed=1000 * (index % 50),
+                                            start_date=datetime(2024, 1, 1),
+                                            duration=timedelta(minutes=index % 120),
+                                            cost=0.1 * (index % 50)),
+                    network_info=NetworkInfo(wifi_ssid='ssid', wifi_rssi=-60, mac_address=f'mac-{index}', ip_address=f'10.0.{index // 256}.{index % 256}'),
+                    charging_profile=ChargingProfile(power_limitation=True, current_limit=32, current_max=48))
+
+
+def charged(stations: list[Station], energy: int) -> list[Station]:
+    # same fleet one poll later, every charging terminal consumed more energy
+    return [replace(station, terminals=[replace(terminal, session=replace(terminal.session, energy_consumed=terminal.session.energy_consumed + energy))
+                                        if terminal.status == ChargingStatus.in_use else terminal
+                                        for terminal in station.terminals])
+            for station in stations]
@@ -3,38 +3,125 @@ EVduty charging stations integration
 """
 from __future__ import annotations
 
-from evdutyapi import EVDutyApi
+from evdutyapi import Terminal
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform, CONF_USERNAME, CONF_PASSWORD
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .api import async_get_api, async_pool_api
+from .charging_planner import EVDutyChargingPlanner
+from .circuit_breaker import CircuitBreaker
+from .const import DOMAIN, DATA_APIS, DATA_CHARGING_PLANNERS, DATA_CIRCUIT_BREAKERS, LOGGER, CONF_SITE_CURRENT_LIMIT, CONF_BUILDING_LOAD_ENTITY, CONF_LOAD_BALANCING_THRESHOLD, CONF_SURPLUS_ENTITY, \
+    CONF_SURPLUS_WRITE_INTERVAL, DEFAULT_SITE_CURRENT_LIMIT, DEFAULT_LOAD_BALANCING_THRESHOLD, DEFAULT_SURPLUS_WRITE_INTERVAL
 from .coordinator import EVDutyCoordinator
+from .load_balancer import EVDutyLoadBalancer
+from .poll_scheduler import async_get_poll_scheduler
+from .request_scheduler import async_get_request_scheduler
+from .services import async_setup_services
+from .statistics import EVDutySessionStatistics
+from .storage import EVDutyStore
+from .surplus_follower import EVDutySurplusFollower
 
 PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.NUMBER]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    async_setup_services(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-    evduty_api = EVDutyApi(config_entry.data[CONF_USERNAME], config_entry.data[CONF_PASSWORD], async_get_clientsession(hass))
-    evduty_coordinator = EVDutyCoordinator(hass, config_entry, evduty_api)
+    evduty_api = async_get_api(hass, config_entry.data[CONF_USERNAME], config_entry.data[CONF_PASSWORD])
+    evduty_store = EVDutyStore(hass, config_entry.entry_id)
+    await evduty_store.async_load()
+    if evduty_store.restore_token(evduty_api):
+        LOGGER.debug('Reusing stored EVduty token')
+        evduty_api = async_pool_api(hass, evduty_api)
+
+    # kept across reloads so an entry reloaded during an outage keeps backing off
+    circuit_breaker = hass.data.setdefault(DATA_CIRCUIT_BREAKERS, {}).setdefault(config_entry.entry_id, CircuitBreaker())
+    scheduler = async_get_request_scheduler(hass, config_entry.data[CONF_USERNAME])
+    session_statistics = EVDutySessionStatistics(hass) if 'recorder' in hass.config.components else None
+    poll_scheduler = async_get_poll_scheduler(hass)
+    config_entry.async_on_unload(poll_scheduler.async_register(config_entry.entry_id))
+    evduty_coordinator = EVDutyCoordinator(hass, config_entry, evduty_api, evduty_store, circuit_breaker, scheduler, session_statistics, poll_scheduler)
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][config_entry.entry_id] = evduty_coordinator
 
-    await evduty_coordinator.async_config_entry_first_refresh()
+    if (terminals := evduty_store.restore_terminals()) is not None:
+        evduty_coordinator.async_restore_data(terminals)
+        config_entry.async_create_background_task(hass, evduty_coordinator.async_refresh(), f'{DOMAIN} first refresh')
+    else:
+        await evduty_coordinator.async_config_entry_first_refresh()
+
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
 
+    options = config_entry.options
+    load_balancer = None
+    if (site_current_limit := options.get(CONF_SITE_CURRENT_LIMIT, DEFAULT_SITE_CURRENT_LIMIT)) > 0:
+        load_balancer = EVDutyLoadBalancer(hass, evduty_coordinator, site_current_limit, options.get(CONF_BUILDING_LOAD_ENTITY),
+                                           options.get(CONF_LOAD_BALANCING_THRESHOLD, DEFAULT_LOAD_BALANCING_THRESHOLD))
+        config_entry.async_on_unload(load_balancer.async_start())
+
+    if (surplus_entity := options.get(CONF_SURPLUS_ENTITY)) is not None:
+        surplus_follower = EVDutySurplusFollower(hass, evduty_coordinator, surplus_entity,
+                                                 options.get(CONF_SURPLUS_WRITE_INTERVAL, DEFAULT_SURPLUS_WRITE_INTERVAL),
+                                                 options.get(CONF_LOAD_BALANCING_THRESHOLD, DEFAULT_LOAD_BALANCING_THRESHOLD), load_balancer)
+        config_entry.async_on_unload(surplus_follower.async_start())
+
+    charging_planner = hass.data.setdefault(DATA_CHARGING_PLANNERS, {})[config_entry.entry_id] = EVDutyChargingPlanner(hass, evduty_coordinator, evduty_store,
+                                                                                                                          load_balancer)
+    config_entry.async_on_unload(charging_planner.async_start())
+
+    options = dict(config_entry.options)
+
+    async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        # reauthentication only changes the data, the running coordinator already uses the new credentials
+        if entry.options != options:
+            await hass.config_entries.async_reload(entry.entry_id)
+
+    config_entry.async_on_unload(config_entry.add_update_listener(async_update_options))
+
+    @callback
+    def async_remove_vanished_terminals(_: list[Terminal], removed: list[str]) -> None:
+        # removing the entry from the device also removes the entities of the vanished terminals
+        device_registry = dr.async_get(hass)
+        for terminal_id in removed:
+            evduty_coordinator.device_infos.pop(terminal_id, None)
+            if (device := device_registry.async_get_device(identifiers={(DOMAIN, terminal_id)})) is not None:
+                device_registry.async_update_device(device.id, remove_config_entry_id=config_entry.entry_id)
+
+    config_entry.async_on_unload(evduty_coordinator.async_add_terminals_listener(async_remove_vanished_terminals))
+
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
+        hass.data.get(DATA_CHARGING_PLANNERS, {}).pop(entry.entry_id, None)
 
     return unload_ok
 
 
+async def async_remove_config_entry_device(hass: HomeAssistant, config_entry: ConfigEntry, device: dr.DeviceEntry) -> bool:
+    # the account device and the terminals still in the account come back on the next refresh
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    return not any(identifier[0] == DOMAIN and (identifier[1] == config_entry.entry_id or identifier[1] in coordinator.data)
+                   for identifier in device.identifiers)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    hass.data.get(DATA_CIRCUIT_BREAKERS, {}).pop(entry.entry_id, None)
+    hass.data.get(DATA_APIS, {}).pop(entry.data[CONF_USERNAME].lower(), None)
+    await EVDutyStore(hass, entry.entry_id).async_remove()
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     await async_unload_entry(hass, entry)
     await async_setup_entry(hass, entry)
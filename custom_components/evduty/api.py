@@ -0,0 +1,30 @@
+"""
+EVduty charging stations account clients
+"""
+from evdutyapi import EVDutyApi
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import DATA_APIS
+
+
+@callback
+def async_get_api(hass: HomeAssistant, username: str, password: str) -> EVDutyApi:
+    # one client per account on the shared session, the token of the config flow login is reused by the entry setup,
+    # a client with other credentials is only pooled once logged in
+    api = hass.data.get(DATA_APIS, {}).get(username.lower())
+    if api is None or api.username != username or api.password != password:
+        return EVDutyApi(username, password, async_get_clientsession(hass))
+    return api
+
+
+@callback
+def async_pool_api(hass: HomeAssistant, api: EVDutyApi) -> EVDutyApi:
+    # a client logged in again hands its credentials and token to the pooled one, so entries keep using the same instance
+    pooled = hass.data.setdefault(DATA_APIS, {}).setdefault(api.username.lower(), api)
+    if pooled is not api:
+        pooled.username = api.username
+        pooled.password = api.password
+        pooled.headers.update(api.headers)
+        pooled.expires_at = api.expires_at
+    return pooled
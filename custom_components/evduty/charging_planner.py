@@ -0,0 +1,324 @@
+"""
+EVduty charging stations time-of-use charging plans
+"""
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from math import ceil
+
+from evdutyapi import Terminal
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, Event, State, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time, async_track_state_change_event
+from homeassistant.util import dt as dt_util
+
+from .const import LOGGER, MIN_CHARGING_CURRENT, DEFAULT_VOLTAGE
+from .coordinator import EVDutyCoordinator
+from .load_balancer import EVDutyLoadBalancer
+from .storage import EVDutyStore
+
+PLAN_SLOT = timedelta(minutes=15)
+
+
+@dataclass(frozen=True)
+class ChargingPlan:
+    energy: float
+    departure: datetime
+    tariff: tuple[tuple[str, float], ...] | None
+    price_entity: str | None
+    # price of each slot the plan was computed with, and the current to set from each time until the next one
+    prices: tuple[tuple[datetime, float | None], ...]
+    setpoints: tuple[tuple[datetime, int], ...]
+
+    def setpoint(self, now: datetime) -> int | None:
+        current = None
+        for start, setpoint in self.setpoints:
+            if start > now:
+                break
+            current = setpoint
+        return current
+
+    def next_change(self, now: datetime) -> datetime:
+        return next((start for start, _ in self.setpoints if start > now), self.departure)
+
+
+def plan_slots(now: datetime, departure: datetime) -> list[tuple[datetime, datetime]]:
+    # slots end on quarter hours so they line up with tariff and price changes, the first one starts now
+    slots = []
+    start = now
+    while start < departure:
+        end = min(slot_floor(start) + PLAN_SLOT, departure)
+        slots.append((start, end))
+        start = end
+    return slots
+
+
+def slot_floor(when: datetime) -> datetime:
+    return when.replace(minute=when.minute - when.minute % 15, second=0, microsecond=0)
+
+
+def plan_setpoints(slots: list[tuple[datetime, datetime, float | None]], energy: float, current_max: int, volt: int) -> tuple[tuple[datetime, int], ...]:
+    # the cheapest slots charge at the terminal max until the energy (Wh) is planned, slots with an unknown price are used last,
+    # the other slots pause charging and consecutive slots with the same current become a single setpoint
+    currents = {}
+    remaining = energy
+    for start, end, _ in sorted(slots, key=lambda slot: (slot[2] is None, slot[2] or 0, slot[0])):
+        if remaining <= 0:
+            break
+        hours = (end - start).total_seconds() / 3600
+        if current_max * volt * hours <= remaining:
+            currents[start] = current_max
+        else:
+            currents[start] = min(current_max, max(MIN_CHARGING_CURRENT, ceil(remaining / (volt * hours))))
+        remaining -= currents[start] * volt * hours
+
+    if remaining > 0:
+        LOGGER.warning(f'Charging plan is {remaining / 1000:.1f} kWh short of its target before departure')
+
+    setpoints = []
+    for start, _, _ in slots:
+        current = currents.get(start, 0)
+        if not setpoints or setpoints[-1][1] != current:
+            setpoints.append((start, current))
+    return tuple(setpoints)
+
+
+def tariff_price(tariff: tuple[tuple[str, float], ...]) -> Callable[[datetime], float | None]:
+    # daily time-of-use table, each price applies from its local time until the next one
+    changes = sorted((time.fromisoformat(start), price) for start, price in tariff)
+
+    def price_at(when: datetime) -> float | None:
+        local_time = dt_util.as_local(when).time()
+        price = changes[-1][1]
+        for start, change_price in changes:
+            if start <= local_time:
+                price = change_price
+        return price
+
+    return price_at
+
+
+def forecast_prices(state: State | None) -> list[tuple[datetime, datetime, float]]:
+    # price sensors publish their forecast as lists of {start, end, price or value} in their attributes,
+    # a price without an end lasts until the next one, or one hour for the last one
+    if state is None:
+        return []
+
+    prices = []
+    for value in state.attributes.values():
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if not isinstance(item, dict) or 'start' not in item:
+                continue
+            try:
+                start = forecast_time(item['start'])
+                end = forecast_time(item['end']) if item.get('end') is not None else None
+                price = float(item['price'] if 'price' in item else item['value'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if start is not None:
+                prices.append((start, end, price))
+
+    prices.sort(key=lambda price: price[0])
+    return [(start, end or (prices[index + 1][0] if index + 1 < len(prices) else start + timedelta(hours=1)), price)
+            for index, (start, end, price) in enumerate(prices)]
+
+
+def forecast_time(value) -> datetime | None:
+    when = value if isinstance(value, datetime) else dt_util.parse_datetime(str(value))
+    return None if when is None else dt_util.as_utc(when)
+
+
+def forecast_price(forecast: list[tuple[datetime, datetime, float]]) -> Callable[[datetime], float | None]:
+    def price_at(when: datetime) -> float | None:
+        return next((price for start, end, price in forecast if start <= when < end), None)
+
+    return price_at
+
+
+def delivered_energy(terminal: Terminal) -> float:
+    return terminal.session.energy_consumed / 1000 if terminal.session.is_active else 0
+
+
+class EVDutyChargingPlanner:
+    # plans are computed once per target or price change, setpoints are only written at the slot boundaries that change them
+    def __init__(self, hass: HomeAssistant, coordinator: EVDutyCoordinator, store: EVDutyStore | None = None,
+                 load_balancer: EVDutyLoadBalancer | None = None) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.store = store
+        self.load_balancer = load_balancer
+        self.plans: dict[str, ChargingPlan] = {}
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._unsub_prices: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        if self.store is not None:
+            self.plans = plans_from_json(self.store.restore_plans())
+        self._async_track_prices()
+        self.async_apply()
+
+        @callback
+        def async_stop() -> None:
+            self._async_cancel_timer()
+            if self._unsub_prices is not None:
+                self._unsub_prices()
+                self._unsub_prices = None
+
+        return async_stop
+
+    @callback
+    def async_set_plan(self, terminal_id: str, energy: float, departure: datetime, tariff: tuple[tuple[str, float], ...] | None = None,
+                       price_entity: str | None = None) -> ChargingPlan:
+        plan = self.plans[terminal_id] = self._plan(terminal_id, energy, departure, tariff, price_entity)
+        self._async_plans_changed()
+        return plan
+
+    @callback
+    def async_clear_plan(self, terminal_id: str) -> bool:
+        if self.plans.pop(terminal_id, None) is None:
+            return False
+        self._async_restore_max_current([terminal_id])
+        self._async_plans_changed()
+        return True
+
+    @callback
+    def async_apply(self, _: datetime | None = None) -> None:
+        self._async_cancel_timer()
+        now = dt_util.utcnow()
+        terminals = self.coordinator.data or {}
+
+        finished = [terminal_id for terminal_id, plan in self.plans.items() if now >= plan.departure]
+        for terminal_id in finished:
+            del self.plans[terminal_id]
+
+        changes = {}
+        for terminal_id, plan in self.plans.items():
+            if (terminal := terminals.get(terminal_id)) is not None:
+                current = plan.setpoint(now)
+                if current is not None and current != terminal.charging_profile.current_limit:
+                    changes[terminal_id] = current
+        if changes:
+            self._async_write(changes)
+
+        if finished:
+            LOGGER.debug(f'Charging plans of {finished} reached their departure')
+            self._async_restore_max_current(finished)
+            self._async_save()
+            self._async_track_prices()
+
+        if self.plans:
+            next_change = min(plan.next_change(now) for plan in self.plans.values())
+            self._unsub_timer = async_track_point_in_utc_time(self.hass, self.async_apply, next_change)
+
+    def _plan(self, terminal_id: str, energy: float, departure: datetime, tariff: tuple[tuple[str, float], ...] | None,
+              price_entity: str | None) -> ChargingPlan:
+        now = dt_util.utcnow()
+        terminal = self.coordinator.data[terminal_id]
+        price_at = tariff_price(tariff) if tariff else forecast_price(forecast_prices(self.hass.states.get(price_entity)))
+        slots = [(start, end, price_at(start)) for start, end in plan_slots(now, departure)]
+        remaining = max(energy - delivered_energy(terminal), 0) * 1000
+        setpoints = plan_setpoints(slots, remaining, terminal.charging_profile.current_max, terminal.session.volt or DEFAULT_VOLTAGE)
+        LOGGER.debug(f'Planned {remaining / 1000:.1f} kWh for terminal {terminal_id} before {departure}: {setpoints}')
+        return ChargingPlan(energy=energy, departure=departure, tariff=tariff, price_entity=price_entity,
+                            prices=tuple((start, price) for start, _, price in slots), setpoints=setpoints)
+
+    @callback
+    def _async_plans_changed(self) -> None:
+        self._async_save()
+        self._async_track_prices()
+        self.async_apply()
+
+    @callback
+    def _async_track_prices(self) -> None:
+        if self._unsub_prices is not None:
+            self._unsub_prices()
+            self._unsub_prices = None
+        if price_entities := sorted({plan.price_entity for plan in self.plans.values() if plan.price_entity is not None}):
+            self._unsub_prices = async_track_state_change_event(self.hass, price_entities, self._async_prices_changed)
+
+    @callback
+    def _async_prices_changed(self, event: Event) -> None:
+        # the plan is kept while the price sensor has no forecast, and only recomputed when a remaining slot changed price
+        forecast = forecast_prices(event.data['new_state'])
+        if not forecast:
+            return
+
+        now = dt_util.utcnow()
+        price_at = forecast_price(forecast)
+        replanned = []
+        for terminal_id, plan in list(self.plans.items()):
+            if plan.price_entity != event.data['entity_id'] or terminal_id not in (self.coordinator.data or {}) or now >= plan.departure:
+                continue
+            planned = {slot_floor(start): price for start, price in plan.prices}
+            if all(planned.get(slot_floor(start)) == price_at(start) for start, _ in plan_slots(now, plan.departure)):
+                continue
+            self.plans[terminal_id] = self._plan(terminal_id, plan.energy, plan.departure, plan.tariff, plan.price_entity)
+            replanned.append(terminal_id)
+
+        if replanned:
+            LOGGER.debug(f'Prices of {event.data["entity_id"]} changed, replanned {replanned}')
+            self._async_plans_changed()
+
+    @callback
+    def _async_restore_max_current(self, terminal_ids: list[str]) -> None:
+        terminals = self.coordinator.data or {}
+        changes = {terminal_id: terminals[terminal_id].charging_profile.current_max for terminal_id in terminal_ids
+                   if terminal_id in terminals and terminals[terminal_id].charging_profile.current_limit != terminals[terminal_id].charging_profile.current_max}
+        if changes:
+            self._async_write(changes)
+
+    @callback
+    def _async_write(self, changes: dict[str, int]) -> None:
+        if self.load_balancer is not None:
+            terminals = self.coordinator.data or {}
+            changes = {terminal_id: current for terminal_id, current in self.load_balancer.async_cap(changes).items()
+                       if current != terminals[terminal_id].charging_profile.current_limit}
+            if not changes:
+                return
+        LOGGER.debug(f'Applying charging plan setpoints: {changes}')
+        self.hass.async_create_task(self._async_write_setpoints(changes), 'evduty charging plan')
+
+    async def _async_write_setpoints(self, changes: dict[str, int]) -> None:
+        results = await self.coordinator.async_set_terminals_max_charging_current(changes)
+        if any(error is not None for error in results.values()):
+            # written again at the next slot boundary
+            LOGGER.warning(f'Charging plan could not update every terminal: {results}')
+
+    @callback
+    def _async_save(self) -> None:
+        if self.store is not None:
+            self.store.async_save_plans(plans_to_json(self.plans))
+
+    @callback
+    def _async_cancel_timer(self) -> None:
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+
+def plans_to_json(plans: dict[str, ChargingPlan]) -> dict[str, dict]:
+    return {terminal_id: {
+        'energy': plan.energy,
+        'departure': plan.departure.isoformat(),
+        'tariff': None if plan.tariff is None else [list(change) for change in plan.tariff],
+        'price_entity': plan.price_entity,
+        'prices': [[start.isoformat(), price] for start, price in plan.prices],
+        'setpoints': [[start.isoformat(), current] for start, current in plan.setpoints],
+    } for terminal_id, plan in plans.items()}
+
+
+def plans_from_json(data: dict[str, dict]) -> dict[str, ChargingPlan]:
+    try:
+        return {terminal_id: ChargingPlan(
+            energy=plan['energy'],
+            departure=datetime.fromisoformat(plan['departure']),
+            tariff=None if plan['tariff'] is None else tuple((start, price) for start, price in plan['tariff']),
+            price_entity=plan['price_entity'],
+            prices=tuple((datetime.fromisoformat(start), price) for start, price in plan['prices']),
+            setpoints=tuple((datetime.fromisoformat(start), current) for start, current in plan['setpoints']),
+        ) for terminal_id, plan in data.items()}
+    except (KeyError, TypeError, ValueError) as error:
+        LOGGER.warning(f'Ignoring invalid stored charging plans: {error}')
+        return {}
@@ -0,0 +1,60 @@
+"""
+EVduty charging stations cloud circuit breaker
+"""
+from enum import StrEnum
+from random import uniform
+from time import monotonic
+
+FAILURE_THRESHOLD = 2
+BASE_DELAY = 30
+MAX_DELAY = 900
+
+
+class CircuitState(StrEnum):
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half_open'
+
+
+class CircuitBreaker:
+    # opens after consecutive failures, then lets a single probe through once a jittered exponential delay has passed
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY) -> None:
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CircuitState.closed
+        self.failures = 0
+        self._open_until = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        return max(self._open_until - monotonic(), 0)
+
+    def allow_request(self) -> bool:
+        if self.state == CircuitState.closed:
+            return True
+        if self.state == CircuitState.open and monotonic() >= self._open_until:
+            self.state = CircuitState.half_open
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = CircuitState.closed
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == CircuitState.half_open or self.failures >= self.failure_threshold:
+            delay = min(self.base_delay * 2 ** max(self.failures - self.failure_threshold, 0), self.max_delay)
+            # jitter spreads the accounts probing a recovering cloud
+            self._open_until = monotonic() + uniform(delay / 2, delay)
+            self.state = CircuitState.open
+
+    def release(self) -> None:
+        # a cancelled probe did not learn anything, the next request probes again
+        if self.state == CircuitState.half_open:
+            self.state = CircuitState.open
+            self._open_until = 0.0
+
+    def as_dict(self) -> dict:
+        return {'state': self.state.value, 'failures': self.failures, 'retry_in': self.retry_in}
@@ -6,12 +6,18 @@ from __future__ import annotations
 from typing import Any
 
 import voluptuous as vol
-from evdutyapi import EVDutyApi, EVDutyApiInvalidCredentialsError, EVDutyApiError
+from evdutyapi import EVDutyApiInvalidCredentialsError, EVDutyApiError
 from homeassistant import config_entries
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.core import callback
+from homeassistant.components.sensor import SensorDeviceClass
+from homeassistant.helpers.selector import EntitySelector, EntitySelectorConfig
 
-from .const import DOMAIN, LOGGER
+from .const import DOMAIN, LOGGER, CONF_CHARGING_INTERVAL, CONF_IDLE_INTERVAL, CONF_MAX_IDLE_INTERVAL, CONF_NETWORK_INTERVAL, CONF_SITE_CURRENT_LIMIT, CONF_BUILDING_LOAD_ENTITY, \
+    CONF_LOAD_BALANCING_THRESHOLD, CONF_SURPLUS_ENTITY, CONF_SURPLUS_WRITE_INTERVAL, CONF_ENERGY_ESTIMATE_INTERVAL, CONF_LOCAL_SESSION_DURATION, DEFAULT_CHARGING_INTERVAL, DEFAULT_IDLE_INTERVAL, DEFAULT_MAX_IDLE_INTERVAL, DEFAULT_NETWORK_INTERVAL, \
+    DEFAULT_SITE_CURRENT_LIMIT, DEFAULT_LOAD_BALANCING_THRESHOLD, DEFAULT_SURPLUS_WRITE_INTERVAL, DEFAULT_ENERGY_ESTIMATE_INTERVAL, DEFAULT_LOCAL_SESSION_DURATION
+from .api import async_get_api, async_pool_api
+from .request_scheduler import async_get_request_scheduler
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
@@ -27,6 +33,11 @@ class EVDutyConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         self._reauth_entry: config_entries.ConfigEntry | None = None
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> EVDutyOptionsFlow:
+        return EVDutyOptionsFlow()
+
     async def async_step_user(self, data: dict[str, Any] | None = None):
         if data is None:
             return self.async_show_form(step_id='user', data_schema=STEP_USER_DATA_SCHEMA)
@@ -37,19 +48,25 @@ class EVDutyConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         errors: dict[str, str] = {}
         try:
-            evduty_api = EVDutyApi(data[CONF_USERNAME], data[CONF_PASSWORD], async_create_clientsession(self.hass))
-            await evduty_api.async_authenticate()
+            evduty_api = async_get_api(self.hass, data[CONF_USERNAME], data[CONF_PASSWORD])
+            await async_get_request_scheduler(self.hass, data[CONF_USERNAME]).async_authenticate(evduty_api.async_authenticate)
+            evduty_api = async_pool_api(self.hass, evduty_api)
 
             if self._reauth_entry is None:
                 return self.async_create_entry(title=data[CONF_USERNAME], data=data)
             else:
-                self.hass.config_entries.async_update_entry(self._reauth_entry, data=data)
-                await self.hass.config_entries.async_reload(self._reauth_entry.entry_id)
+                coordinator = self.hass.data.get(DOMAIN, {}).get(self._reauth_entry.entry_id)
+                if self._reauth_entry.state == config_entries.ConfigEntryState.LOADED and coordinator.api.username.lower() == data[CONF_USERNAME].lower():
+                    coordinator.async_update_credentials(evduty_api)
+                    self.hass.config_entries.async_update_entry(self._reauth_entry, data=data)
+                else:
+                    self.hass.config_entries.async_update_entry(self._reauth_entry, data=data)
+                    await self.hass.config_entries.async_reload(self._reauth_entry.entry_id)
                 return self.async_abort(reason="reauth_successful")
 
         except EVDutyApiInvalidCredentialsError:
             errors['base'] = 'invalid_auth'
-        except EVDutyApiError:
+        except (EVDutyApiError, TimeoutError):
             errors['base'] = 'cannot_connect'
         except Exception:
             LOGGER.exception('Unexpected exception')
@@ -60,3 +77,35 @@ class EVDutyConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_reauth(self, data: dict[str, Any] | None = None):
         self._reauth_entry = self.hass.config_entries.async_get_entry(self.context["entry_id"])
         return await self.async_step_user(data)
+
+
+class EVDutyOptionsFlow(config_entries.OptionsFlow):
+
+    async def async_step_init(self, data: dict[str, Any] | None = None):
+        if data is not None:
+            return self.async_create_entry(data=data)
+
+        return self.async_show_form(step_id='init', data_schema=self._options_schema())
+
+    def _options_schema(self) -> vol.Schema:
+        options = self.config_entry.options
+        return vol.Schema(
+            {
+                vol.Required(CONF_CHARGING_INTERVAL, default=options.get(CONF_CHARGING_INTERVAL, DEFAULT_CHARGING_INTERVAL)): vol.All(int, vol.Range(min=10)),
+                vol.Required(CONF_IDLE_INTERVAL, default=options.get(CONF_IDLE_INTERVAL, DEFAULT_IDLE_INTERVAL)): vol.All(int, vol.Range(min=10)),
+                vol.Required(CONF_MAX_IDLE_INTERVAL, default=options.get(CONF_MAX_IDLE_INTERVAL, DEFAULT_MAX_IDLE_INTERVAL)): vol.All(int, vol.Range(min=10)),
+                vol.Required(CONF_NETWORK_INTERVAL, default=options.get(CONF_NETWORK_INTERVAL, DEFAULT_NETWORK_INTERVAL)): vol.All(int, vol.Range(min=60)),
+                vol.Required(CONF_SITE_CURRENT_LIMIT, default=options.get(CONF_SITE_CURRENT_LIMIT, DEFAULT_SITE_CURRENT_LIMIT)): vol.All(int, vol.Range(min=0)),
+                vol.Optional(CONF_BUILDING_LOAD_ENTITY, description={'suggested_value': options.get(CONF_BUILDING_LOAD_ENTITY)}):
+                    EntitySelector(EntitySelectorConfig(domain='sensor', device_class=SensorDeviceClass.CURRENT)),
+                vol.Required(CONF_LOAD_BALANCING_THRESHOLD, default=options.get(CONF_LOAD_BALANCING_THRESHOLD, DEFAULT_LOAD_BALANCING_THRESHOLD)):
+                    vol.All(int, vol.Range(min=1)),
+                vol.Optional(CONF_SURPLUS_ENTITY, description={'suggested_value': options.get(CONF_SURPLUS_ENTITY)}):
+                    EntitySelector(EntitySelectorConfig(domain='sensor', device_class=SensorDeviceClass.POWER)),
+                vol.Required(CONF_SURPLUS_WRITE_INTERVAL, default=options.get(CONF_SURPLUS_WRITE_INTERVAL, DEFAULT_SURPLUS_WRITE_INTERVAL)):
+                    vol.All(int, vol.Range(min=30)),
+                vol.Required(CONF_ENERGY_ESTIMATE_INTERVAL, default=options.get(CONF_ENERGY_ESTIMATE_INTERVAL, DEFAULT_ENERGY_ESTIMATE_INTERVAL)):
+                    vol.All(int, vol.Range(min=0)),
+                vol.Required(CONF_LOCAL_SESSION_DURATION, default=options.get(CONF_LOCAL_SESSION_DURATION, DEFAULT_LOCAL_SESSION_DURATION)): bool,
+            }
+        )
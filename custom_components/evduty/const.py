@@ -4,3 +4,33 @@ LOGGER: Logger = getLogger(__package__)
 
 DOMAIN = 'evduty'
 MANUFACTURER = 'EVduty'
+DATA_CIRCUIT_BREAKERS = f'{DOMAIN}_circuit_breakers'
+DATA_REQUEST_SCHEDULERS = f'{DOMAIN}_request_schedulers'
+DATA_POLL_SCHEDULER = f'{DOMAIN}_poll_scheduler'
+DATA_APIS = f'{DOMAIN}_apis'
+DATA_CHARGING_PLANNERS = f'{DOMAIN}_charging_planners'
+
+CONF_CHARGING_INTERVAL = 'charging_interval'
+CONF_IDLE_INTERVAL = 'idle_interval'
+CONF_MAX_IDLE_INTERVAL = 'max_idle_interval'
+CONF_NETWORK_INTERVAL = 'network_interval'
+CONF_SITE_CURRENT_LIMIT = 'site_current_limit'
+CONF_BUILDING_LOAD_ENTITY = 'building_load_entity'
+CONF_LOAD_BALANCING_THRESHOLD = 'load_balancing_threshold'
+CONF_SURPLUS_ENTITY = 'surplus_entity'
+CONF_SURPLUS_WRITE_INTERVAL = 'surplus_write_interval'
+CONF_ENERGY_ESTIMATE_INTERVAL = 'energy_estimate_interval'
+CONF_LOCAL_SESSION_DURATION = 'local_session_duration'
+
+DEFAULT_CHARGING_INTERVAL = 15
+DEFAULT_IDLE_INTERVAL = 60
+DEFAULT_MAX_IDLE_INTERVAL = 300
+DEFAULT_NETWORK_INTERVAL = 3600
+DEFAULT_SITE_CURRENT_LIMIT = 0
+DEFAULT_LOAD_BALANCING_THRESHOLD = 2
+DEFAULT_SURPLUS_WRITE_INTERVAL = 300
+DEFAULT_ENERGY_ESTIMATE_INTERVAL = 0
+DEFAULT_LOCAL_SESSION_DURATION = False
+
+MIN_CHARGING_CURRENT = 6
+DEFAULT_VOLTAGE = 240
@@ -1,45 +1,335 @@
 import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from functools import partial
 from datetime import timedelta
 from http import HTTPStatus
+from time import monotonic
+from typing import Any
 
-from evdutyapi import EVDutyApi, Terminal, EVDutyApiInvalidCredentialsError, EVDutyApiError
+from evdutyapi import EVDutyApi, Terminal, ChargingStatus, EVDutyApiInvalidCredentialsError, EVDutyApiError
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, LOGGER
+from .circuit_breaker import CircuitBreaker
+from .const import DOMAIN, LOGGER, CONF_CHARGING_INTERVAL, CONF_IDLE_INTERVAL, CONF_MAX_IDLE_INTERVAL, CONF_NETWORK_INTERVAL, DEFAULT_CHARGING_INTERVAL, \
+    DEFAULT_IDLE_INTERVAL, DEFAULT_MAX_IDLE_INTERVAL, DEFAULT_NETWORK_INTERVAL
+from .health import CoordinatorHealth
+from .poll_scheduler import EVDutyPollScheduler
+from .request_scheduler import EVDutyRequestScheduler
+from .statistics import EVDutySessionStatistics, completed_sessions
+from .storage import EVDutyStore
+from .telemetry import TerminalTelemetry
+
+SLOW_TIER = 'slow'
+MAX_CONCURRENT_WRITES = 5
+
+
+def fast_tier(terminal: Terminal) -> tuple:
+    return terminal.status, terminal.session, terminal.charging_profile
+
+
+def slow_tier(terminal: Terminal) -> tuple:
+    return terminal.station_id, terminal.name, terminal.charge_box_identity, terminal.firmware_version, terminal.network_info
 
 
 # https://developers.home-assistant.io/docs/integration_fetching_data#coordinated-single-api-poll-for-data-for-all-entities
 class EVDutyCoordinator(DataUpdateCoordinator):
     config_entry: ConfigEntry
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, api: EVDutyApi) -> None:
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, api: EVDutyApi, store: EVDutyStore | None = None,
+                 circuit_breaker: CircuitBreaker | None = None, scheduler: EVDutyRequestScheduler | None = None,
+                 session_statistics: EVDutySessionStatistics | None = None, poll_scheduler: EVDutyPollScheduler | None = None) -> None:
+        idle_interval = config_entry.options.get(CONF_IDLE_INTERVAL, DEFAULT_IDLE_INTERVAL)
         super().__init__(hass=hass, config_entry=config_entry, logger=LOGGER, name=DOMAIN,
-                         update_interval=timedelta(seconds=60))
+                         update_interval=timedelta(seconds=idle_interval), always_update=False)
         self.api = api
+        self.store = store
+        self.stale = False
+        self.telemetry: dict[str, TerminalTelemetry] = {}
+        # device info shared by the entities of each terminal, dropped with the terminal
+        self.device_infos: dict[str, tuple[tuple, DeviceInfo]] = {}
+        self.health = CoordinatorHealth()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.scheduler = scheduler or EVDutyRequestScheduler()
+        self.session_statistics = session_statistics
+        self.poll_scheduler = poll_scheduler or EVDutyPollScheduler()
+        self._terminal_listeners: dict[str | None, dict[CALLBACK_TYPE, CALLBACK_TYPE]] = {}
+        self._notified_data: dict[str, Terminal] | None = None
+        self._notified_update_success = True
+        self._terminals_listeners: list[Callable[[list[Terminal], list[str]], None]] = []
+        self._known_terminal_ids: set[str] | None = None
+        self._slow_tier_refreshed_at: float | None = None
 
-    async def _async_update_data(self) -> dict[str, Terminal]:
+    @callback
+    def async_restore_data(self, terminals: dict[str, Terminal]) -> None:
+        # stored terminals let entities be created before the first refresh, they stay stale until it completes
+        self.data = terminals
+        self.stale = True
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE, context: Any = None) -> Callable[[], None]:
+        # listeners are indexed by terminal id (their context) so a refresh only wakes up the changed terminals,
+        # listeners of (terminal id, SLOW_TIER) are only woken up when the network or device metadata of the terminal changed
+        remove_listener = super().async_add_listener(update_callback, context)
+        listeners = self._terminal_listeners.setdefault(context, {})
+
+        @callback
+        def remove_terminal_listener() -> None:
+            remove_listener()
+            listeners.pop(remove_terminal_listener, None)
+            if not listeners and self._terminal_listeners.get(context) is listeners:
+                del self._terminal_listeners[context]
+
+        listeners[remove_terminal_listener] = update_callback
+        return remove_terminal_listener
+
+    @callback
+    def async_add_terminals_listener(self, terminals_callback: Callable[[list[Terminal], list[str]], None]) -> CALLBACK_TYPE:
+        # called with the terminals that appeared and the ids of those that vanished since the entities were created from the data
+        if self._known_terminal_ids is None:
+            self._known_terminal_ids = set(self.data or {})
+        self._terminals_listeners.append(terminals_callback)
+
+        @callback
+        def remove_terminals_listener() -> None:
+            self._terminals_listeners.remove(terminals_callback)
+
+        return remove_terminals_listener
+
+    @callback
+    def async_update_listeners(self) -> None:
+        self._async_update_terminals_listeners()
+
+        if self._notified_data is None or self._notified_update_success != self.last_update_success:
+            contexts = list(self._terminal_listeners)
+        else:
+            contexts = [None, *self._changed_contexts()]
+
+        self._notified_data = self.data
+        self._notified_update_success = self.last_update_success
+
+        for context in contexts:
+            for update_callback in list(self._terminal_listeners.get(context, {}).values()):
+                update_callback()
+
+    @callback
+    def _async_update_terminals_listeners(self) -> None:
+        current = self.data or {}
+        if self._known_terminal_ids is None or self._known_terminal_ids == current.keys():
+            return
+
+        added = [current[terminal_id] for terminal_id in sorted(current.keys() - self._known_terminal_ids)]
+        removed = sorted(self._known_terminal_ids - current.keys())
+        self._known_terminal_ids = set(current)
+        LOGGER.debug(f'EVduty terminals added: {[terminal.id for terminal in added]}, removed: {removed}')
+        for terminals_callback in list(self._terminals_listeners):
+            terminals_callback(added, removed)
+
+    def _changed_contexts(self) -> set[str | tuple[str, str]]:
+        previous = self._notified_data
+        current = self.data or {}
+        changed = set()
+        for terminal_id, terminal in current.items():
+            previous_terminal = previous.get(terminal_id)
+            if previous_terminal == terminal:
+                continue
+            if previous_terminal is None or fast_tier(previous_terminal) != fast_tier(terminal):
+                changed.add(terminal_id)
+            if previous_terminal is None or slow_tier(previous_terminal) != slow_tier(terminal):
+                changed.add((terminal_id, SLOW_TIER))
+        for terminal_id in previous.keys() - current.keys():
+            changed.update((terminal_id, (terminal_id, SLOW_TIER)))
+        return changed
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        # same as the base coordinator, except the refresh lands on the slot of the account in the poll schedule
+        if self._update_interval_seconds is None or self.config_entry.pref_disable_polling:
+            return
+
+        self._async_unsub_refresh()
+        loop = self.hass.loop
+        next_refresh = self.poll_scheduler.next_refresh(self.config_entry.entry_id, loop.time(), self._update_interval_seconds)
+        self._unsub_refresh = loop.call_at(next_refresh, self._async_handle_refresh_slot).cancel
+
+    @callback
+    def _async_handle_refresh_slot(self) -> None:
+        self.config_entry.async_create_background_task(self.hass, self._handle_refresh_interval(), f'{DOMAIN} scheduled refresh')
+
+    async def _async_refresh(self, *args, **kwargs) -> None:
+        # health is pushed after every poll, even when the data did not change and listeners were not notified
+        was_stale = self.stale
         try:
-            async with asyncio.timeout(10):
-                stations = await self.api.async_get_stations()
-                return {terminal.id: terminal for station in stations for terminal in station.terminals}
-        except EVDutyApiInvalidCredentialsError as error:
-            raise ConfigEntryAuthFailed from error
-        except EVDutyApiError as error:
-            if error.status == HTTPStatus.UNAUTHORIZED:
-                LOGGER.debug(f'Simultaneous EVduty account usage. Returning last data: {self.data}')
-                return self.data
+            await super()._async_refresh(*args, **kwargs)
+        finally:
+            if was_stale and not self.stale and self._notified_data is not self.data:
+                # a first refresh equal to the stored terminals does not notify listeners, their entities still show an assumed state
+                self._notified_data = None
+                self.async_update_listeners()
+            self.health.async_update_listeners()
+
+    async def _async_update_data(self) -> dict[str, Terminal]:
+        if not self.circuit_breaker.allow_request():
+            raise UpdateFailed(f'EVduty API unavailable, retrying in {self.circuit_breaker.retry_in:.0f} seconds')
+
+        async with self.poll_scheduler.async_poll():
+            start = monotonic()
+            try:
+                async with self._async_guard_api_call():
+                    stations = await self.scheduler.async_run(self.api.async_get_stations, key='stations', authenticate=self.api.async_authenticate)
+                    terminals = {terminal.id: terminal for station in stations for terminal in station.terminals}
+                    self._hold_slow_tier(terminals)
+                    self.health.record_success(monotonic() - start)
+                    self._adapt_update_interval(terminals)
+                    self._record_telemetry(terminals)
+                    self._import_completed_sessions(terminals)
+                    self._save(terminals)
+                    self.stale = False
+                    return terminals
+            except TimeoutError:
+                self.health.record_timeout(monotonic() - start)
+                raise
+            except EVDutyApiInvalidCredentialsError as error:
+                self.health.record_error(monotonic() - start)
+                self._clear_token()
+                raise ConfigEntryAuthFailed from error
+            except EVDutyApiError as error:
+                if error.status == HTTPStatus.UNAUTHORIZED:
+                    self.health.record_stale_return(monotonic() - start)
+                    LOGGER.debug(f'Simultaneous EVduty account usage. Returning last data: {self.data}')
+                    return self.data
+                else:
+                    self.health.record_error(monotonic() - start)
+                    raise ConnectionError from error
+
+    def _hold_slow_tier(self, terminals: dict[str, Terminal]) -> None:
+        # the cloud sends network info and firmware with every poll, keeping the previous values between slow refreshes
+        # stops the Wi-Fi signal noise from changing the terminals and waking up their entities on every poll
+        now = monotonic()
+        interval = self.config_entry.options.get(CONF_NETWORK_INTERVAL, DEFAULT_NETWORK_INTERVAL)
+        if self._slow_tier_refreshed_at is None or now - self._slow_tier_refreshed_at >= interval or not self.data:
+            self._slow_tier_refreshed_at = now
+            return
+
+        for terminal_id, terminal in terminals.items():
+            if (previous_terminal := self.data.get(terminal_id)) is not None:
+                terminal.firmware_version = previous_terminal.firmware_version
+                terminal.network_info = previous_terminal.network_info
+
+    def _adapt_update_interval(self, terminals: dict[str, Terminal]) -> None:
+        # poll fast while charging, then back off in steps up to the max idle interval
+        options = self.config_entry.options
+        if any(terminal.status == ChargingStatus.in_use for terminal in terminals.values()):
+            seconds = options.get(CONF_CHARGING_INTERVAL, DEFAULT_CHARGING_INTERVAL)
+        else:
+            idle_interval = options.get(CONF_IDLE_INTERVAL, DEFAULT_IDLE_INTERVAL)
+            max_idle_interval = options.get(CONF_MAX_IDLE_INTERVAL, DEFAULT_MAX_IDLE_INTERVAL)
+            current_interval = self.update_interval.total_seconds()
+            if current_interval < idle_interval:
+                seconds = idle_interval
             else:
-                raise ConnectionError from error
+                seconds = max(idle_interval, min(current_interval * 2, max_idle_interval))
+
+        if self.update_interval != timedelta(seconds=seconds):
+            LOGGER.debug(f'Refreshing EVduty data every {seconds} seconds')
+            self.update_interval = timedelta(seconds=seconds)
+
+    def _record_telemetry(self, terminals: dict[str, Terminal]) -> None:
+        timestamp = dt_util.utcnow().timestamp()
+        for terminal_id in self.telemetry.keys() - terminals.keys():
+            del self.telemetry[terminal_id]
+        for terminal_id, terminal in terminals.items():
+            self.telemetry.setdefault(terminal_id, TerminalTelemetry()).append(timestamp, terminal.session)
+
+    def _import_completed_sessions(self, terminals: dict[str, Terminal]) -> None:
+        # stored terminals are the previous data after a restart, so sessions that ended while Home Assistant was down are imported too
+        if self.session_statistics is not None and (sessions := completed_sessions(self.data, terminals)):
+            self.session_statistics.async_import(sessions)
+
+    @callback
+    def async_update_credentials(self, api: EVDutyApi) -> None:
+        # the client logged in by the reauth flow hands its password and token to the running client, then polling resumes
+        self.api.password = api.password
+        self.api.headers['Authorization'] = api.headers['Authorization']
+        self.api.expires_at = api.expires_at
+        self.config_entry.async_create_background_task(self.hass, self.async_refresh(), f'{DOMAIN} refresh after reauthentication')
 
     async def async_set_terminal_max_charging_current(self, terminal: Terminal, current: int):
+        await self._async_write_max_charging_current(terminal, current)
+        await self.async_request_refresh()
+
+    async def async_set_terminals_max_charging_current(self, currents: dict[str, int]) -> dict[str, str | None]:
+        # writes run concurrently and are confirmed by a single refresh, errors are reported per terminal
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_WRITES)
+
+        async def async_write(terminal_id: str, current: int) -> str | None:
+            async with semaphore:
+                try:
+                    await self._async_write_max_charging_current(self.data[terminal_id], current)
+                except ConfigEntryAuthFailed:
+                    return 'invalid_auth'
+                except ConnectionError:
+                    return 'cannot_connect'
+                except TimeoutError:
+                    return 'timeout'
+                return None
+
+        errors = await asyncio.gather(*(async_write(terminal_id, current) for terminal_id, current in currents.items()))
+        results = dict(zip(currents, errors))
+
+        if 'invalid_auth' in errors:
+            self.config_entry.async_start_reauth(self.hass)
+        if any(error is None for error in errors):
+            await self.async_request_refresh()
+        return results
+
+    async def _async_write_max_charging_current(self, terminal: Terminal, current: int) -> None:
+        if not self.circuit_breaker.allow_request():
+            raise ConnectionError(f'EVduty API unavailable, retrying in {self.circuit_breaker.retry_in:.0f} seconds')
+
         try:
-            async with asyncio.timeout(10):
-                await self.api.async_set_terminal_max_charging_current(terminal, current)
-                await self.async_request_refresh()
+            async with self._async_guard_api_call():
+                await self.scheduler.async_run(partial(self.api.async_set_terminal_max_charging_current, terminal, current), authenticate=self.api.async_authenticate)
         except EVDutyApiInvalidCredentialsError as error:
+            self._clear_token()
             raise ConfigEntryAuthFailed from error
         except EVDutyApiError as error:
             raise ConnectionError from error
+
+    @asynccontextmanager
+    async def _async_guard_api_call(self) -> AsyncIterator[None]:
+        # only an unreachable or failing cloud trips the breaker, credential and simultaneous usage errors prove it is up
+        try:
+            yield
+        except EVDutyApiInvalidCredentialsError:
+            self.circuit_breaker.record_success()
+            raise
+        except EVDutyApiError as error:
+            if error.status == HTTPStatus.UNAUTHORIZED:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+            raise
+        except Exception:
+            self.circuit_breaker.record_failure()
+            raise
+        except BaseException:
+            self.circuit_breaker.release()
+            raise
+        else:
+            self.circuit_breaker.record_success()
+
+    def _save(self, terminals: dict[str, Terminal]) -> None:
+        if self.store is not None:
+            self.store.async_save_token(self.api)
+            if terminals != self.data:
+                self.store.async_save_terminals(terminals)
+
+    def _clear_token(self) -> None:
+        if self.store is not None:
+            self.store.async_clear_token()
@@ -0,0 +1,48 @@
+"""
+EVduty charging stations diagnostics
+"""
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from enum import Enum
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.core import HomeAssistant
+
+from .charging_planner import plans_to_json
+from .const import DOMAIN, DATA_CHARGING_PLANNERS
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, 'mac_address', 'ip_address', 'wifi_ssid'}
+TELEMETRY_WINDOW = 3600
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        'entry': async_redact_data({'data': dict(entry.data), 'options': dict(entry.options)}, TO_REDACT),
+        'update_interval': coordinator.update_interval.total_seconds(),
+        'last_update_success': coordinator.last_update_success,
+        'stale': coordinator.stale,
+        'health': coordinator.health.as_dict(),
+        'circuit_breaker': coordinator.circuit_breaker.as_dict(),
+        'request_scheduler': coordinator.scheduler.as_dict(),
+        'poll_scheduler': coordinator.poll_scheduler.as_dict(hass.loop.time()),
+        'charging_plans': plans_to_json(planner.plans) if (planner := hass.data.get(DATA_CHARGING_PLANNERS, {}).get(entry.entry_id)) is not None else {},
+        'telemetry': {terminal_id: [sample._asdict() for sample in telemetry.window(TELEMETRY_WINDOW)] for terminal_id, telemetry in coordinator.telemetry.items()},
+        'terminals': async_redact_data({terminal_id: asdict(terminal, dict_factory=json_dict) for terminal_id, terminal in (coordinator.data or {}).items()}, TO_REDACT),
+    }
+
+
+def json_dict(items: list[tuple]) -> dict:
+    return {key: json_value(value) for key, value in items}
+
+
+def json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Enum):
+        return value.value
+    return value
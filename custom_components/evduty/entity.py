@@ -0,0 +1,77 @@
+"""
+EVduty charging stations terminal device
+"""
+from functools import lru_cache
+
+from evdutyapi import Terminal
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import slugify
+
+from .const import DOMAIN, MANUFACTURER
+from .coordinator import EVDutyCoordinator, SLOW_TIER
+
+SLUGIFY_CACHE_SIZE = 256
+
+
+class EVDutyTerminalDevice(CoordinatorEntity[EVDutyCoordinator]):
+    _attr_attribution = f'Data provided by {MANUFACTURER}'
+
+    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal, sensor_name: str, slow_tier: bool = False) -> None:
+        super().__init__(coordinator, context=(terminal.id, SLOW_TIER) if slow_tier else terminal.id)
+        device_name = f'{MANUFACTURER} {terminal.name}'
+        self._attr_name = f'{device_name} {sensor_name}'
+        # same as slugify(self._attr_name), slugifying is most of the cost of creating an entity so each part is done once
+        self._attr_unique_id = f'{cached_slugify(device_name)}_{cached_slugify(sensor_name)}'
+        self._attr_device_info = terminal_device_info(coordinator, terminal)
+        self._terminal = terminal
+        self._written_state = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._written_state = self._state()
+
+    @property
+    def available(self) -> bool:
+        return super().available and self._terminal.id in self.coordinator.data
+
+    @property
+    def assumed_state(self) -> bool:
+        return self.coordinator.stale
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._terminal = self.coordinator.data.get(self._terminal.id, self._terminal)
+        self._async_write_ha_state_if_changed()
+
+    @callback
+    def _async_write_ha_state_if_changed(self) -> None:
+        state = self._state()
+        if state != self._written_state:
+            self._written_state = state
+            self.async_write_ha_state()
+
+    def _state(self) -> tuple:
+        return self.available, self.assumed_state, self.native_value
+
+
+def terminal_device_info(coordinator: EVDutyCoordinator, terminal: Terminal) -> DeviceInfo:
+    # every entity of a terminal shares the same device info, kept per coordinator until the device changes or the terminal is removed
+    key = (terminal.name, terminal.charge_box_identity, terminal.firmware_version, terminal.network_info.mac_address)
+    cached = coordinator.device_infos.get(terminal.id)
+    if cached is None or cached[0] != key:
+        cached = coordinator.device_infos[terminal.id] = (key, DeviceInfo(
+            identifiers={(DOMAIN, terminal.id)},
+            manufacturer=MANUFACTURER,
+            model=terminal.charge_box_identity,
+            sw_version=terminal.firmware_version,
+            connections={(CONNECTION_NETWORK_MAC, terminal.network_info.mac_address)},
+            name=f'{MANUFACTURER} {terminal.name}'))
+    return cached[1]
+
+
+@lru_cache(maxsize=SLUGIFY_CACHE_SIZE)
+def cached_slugify(text: str) -> str:
+    return slugify(text)
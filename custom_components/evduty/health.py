@@ -0,0 +1,77 @@
+"""
+EVduty charging stations cloud polling health
+"""
+from bisect import bisect_left
+from collections.abc import Callable
+from datetime import datetime
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.util import dt as dt_util
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10)
+
+
+class CoordinatorHealth:
+    def __init__(self) -> None:
+        self.successes = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.stale_returns = 0
+        self.last_latency: float | None = None
+        self.last_success: datetime | None = None
+        # one count per upper bound of LATENCY_BUCKETS, the last one counts slower calls
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._listeners: dict[CALLBACK_TYPE, CALLBACK_TYPE] = {}
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.last_success = dt_util.utcnow()
+        self._record_latency(latency)
+
+    def record_stale_return(self, latency: float) -> None:
+        self.stale_returns += 1
+        self._record_latency(latency)
+
+    def record_error(self, latency: float) -> None:
+        self.errors += 1
+        self._record_latency(latency)
+
+    def record_timeout(self, latency: float) -> None:
+        self.timeouts += 1
+        self._record_latency(latency)
+
+    def _record_latency(self, latency: float) -> None:
+        self.last_latency = latency
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    @property
+    def data_age(self) -> float | None:
+        if self.last_success is None:
+            return None
+        return (dt_util.utcnow() - self.last_success).total_seconds()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        @callback
+        def remove_listener() -> None:
+            self._listeners.pop(remove_listener, None)
+
+        self._listeners[remove_listener] = update_callback
+        return remove_listener
+
+    @callback
+    def async_update_listeners(self) -> None:
+        for update_callback in list(self._listeners.values()):
+            update_callback()
+
+    def as_dict(self) -> dict:
+        return {
+            'successes': self.successes,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'stale_returns': self.stale_returns,
+            'last_latency': self.last_latency,
+            'last_success': None if self.last_success is None else self.last_success.isoformat(),
+            'data_age': self.data_age,
+            'latency_histogram': {f'le_{bound}': count for bound, count in zip([*LATENCY_BUCKETS, 'inf'], self.latency_histogram)},
+        }
@@ -0,0 +1,131 @@
+"""
+EVduty charging stations site load balancing
+"""
+import asyncio
+
+from evdutyapi import ChargingStatus
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, Event, callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import LOGGER, MIN_CHARGING_CURRENT
+from .coordinator import EVDutyCoordinator
+
+
+def allocate_current(available: int, current_max: dict[str, int]) -> dict[str, int]:
+    # share the available amps equally, terminals with a lower max give their unused share to the others
+    terminal_ids = sorted(current_max, key=lambda terminal_id: (current_max[terminal_id], terminal_id))
+    served = min(len(terminal_ids), max(available, 0) // MIN_CHARGING_CURRENT)
+    allocation = {terminal_id: 0 for terminal_id in sorted(terminal_ids)[served:]}
+
+    remaining = max(available, 0)
+    served_ids = [terminal_id for terminal_id in terminal_ids if terminal_id not in allocation]
+    for index, terminal_id in enumerate(served_ids):
+        share = remaining // (len(served_ids) - index)
+        allocation[terminal_id] = min(current_max[terminal_id], share)
+        remaining -= allocation[terminal_id]
+    return allocation
+
+
+class EVDutyLoadBalancer:
+    def __init__(self, hass: HomeAssistant, coordinator: EVDutyCoordinator, site_current_limit: int, building_load_entity: str | None,
+                 threshold: int) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.site_current_limit = site_current_limit
+        self.building_load_entity = building_load_entity
+        self.threshold = threshold
+        self._last_inputs: tuple | None = None
+        self._lowered: set[str] = set()
+        self.allocation: dict[str, int] = {}
+        self._balancing: asyncio.Task | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        unsubscribes = [self.coordinator.async_add_listener(self.async_balance)]
+        if self.building_load_entity is not None:
+            unsubscribes.append(async_track_state_change_event(self.hass, [self.building_load_entity], self._async_building_load_changed))
+
+        @callback
+        def async_stop() -> None:
+            for unsubscribe in unsubscribes:
+                unsubscribe()
+
+        return async_stop
+
+    @callback
+    def _async_building_load_changed(self, _: Event) -> None:
+        self.async_balance()
+
+    @callback
+    def async_balance(self) -> None:
+        available = self._available_current()
+        if available is None or self._balancing is not None:
+            return
+
+        # terminals lowered or paused by the balancer may no longer be reported in use, they stay balanced until their session ends
+        # and then get their max current back for the next car
+        terminals = self.coordinator.data
+        self._lowered &= terminals.keys()
+        ended = {terminal_id for terminal_id in self._lowered
+                 if terminals[terminal_id].status != ChargingStatus.in_use and not terminals[terminal_id].session.is_active}
+        charging = {terminal.id: terminal.charging_profile.current_max for terminal in terminals.values()
+                    if terminal.status == ChargingStatus.in_use or (terminal.id in self._lowered and terminal.id not in ended)}
+        # a session ending always changes the charging terminals, so restoring their max current needs no input of its own
+        inputs = (available, tuple(sorted(charging.items())))
+        if inputs == self._last_inputs:
+            return
+        self._last_inputs = inputs
+
+        allocation = self.allocation = allocate_current(available, charging)
+        changes = {terminal_id: current for terminal_id, current in allocation.items()
+                   if abs(current - terminals[terminal_id].charging_profile.current_limit) >= self.threshold}
+        for terminal_id in ended:
+            if terminals[terminal_id].charging_profile.current_limit == terminals[terminal_id].charging_profile.current_max:
+                self._lowered.discard(terminal_id)
+            else:
+                changes[terminal_id] = terminals[terminal_id].charging_profile.current_max
+        if changes:
+            LOGGER.debug(f'Balancing {available}A across charging terminals: {changes}')
+            self._balancing = self.hass.async_create_task(self._async_apply(changes), 'evduty load balancing')
+
+    async def _async_apply(self, changes: dict[str, int]) -> None:
+        try:
+            results = await self.coordinator.async_set_terminals_max_charging_current(changes)
+        finally:
+            self._balancing = None
+
+        terminals = self.coordinator.data
+        for terminal_id, current in changes.items():
+            if results.get(terminal_id) is None and terminal_id in terminals:
+                if current < terminals[terminal_id].charging_profile.current_max:
+                    self._lowered.add(terminal_id)
+                else:
+                    self._lowered.discard(terminal_id)
+
+        if any(error is not None for error in results.values()):
+            # retried on the next coordinator or building load update
+            LOGGER.warning(f'Load balancing could not update every terminal: {results}')
+            self._last_inputs = None
+        else:
+            # inputs may have changed while the writes were running
+            self.async_balance()
+
+    @callback
+    def async_cap(self, currents: dict[str, int]) -> dict[str, int]:
+        # surplus following and charging plans never raise a charging terminal above its share of the site limit,
+        # a terminal that starts charging changes the balanced terminals and is lowered to its share by the balancer
+        return {terminal_id: min(current, self.allocation.get(terminal_id, current)) for terminal_id, current in currents.items()}
+
+    def _available_current(self) -> int | None:
+        if self.building_load_entity is None:
+            return self.site_current_limit
+
+        state = self.hass.states.get(self.building_load_entity)
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return None
+        try:
+            building_load = float(state.state)
+        except ValueError:
+            return None
+        return int(self.site_current_limit - building_load)
@@ -7,13 +7,14 @@ from homeassistant.components.number import NumberEntity
 from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.const import UnitOfElectricCurrent
 from homeassistant.core import callback
-from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
-from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.util import slugify
+from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.debounce import Debouncer
 
-from . import EVDutyCoordinator
-from .const import DOMAIN, MANUFACTURER
+from .const import DOMAIN, LOGGER
+from .coordinator import EVDutyCoordinator
+from .entity import EVDutyTerminalDevice
+
+WRITE_COOLDOWN = 2
 
 
 async def async_setup_entry(hass, entry, async_add_devices) -> None:
@@ -25,28 +26,12 @@ async def async_setup_entry(hass, entry, async_add_devices) -> None:
 
     async_add_devices(numbers)
 
-
-class EVDutyTerminalDevice(CoordinatorEntity):
-    _attr_attribution = f'Data provided by {MANUFACTURER}'
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal, sensor_name: str) -> None:
-        super().__init__(coordinator)
-        device_name = f'{MANUFACTURER} {terminal.name}'
-        self._attr_name = f'{device_name} {sensor_name}'
-        self._attr_unique_id = slugify(self._attr_name)
-        self._terminal = terminal
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, terminal.id)},
-            manufacturer=MANUFACTURER,
-            model=terminal.charge_box_identity,
-            sw_version=terminal.firmware_version,
-            connections={(CONNECTION_NETWORK_MAC, terminal.network_info.mac_address)},
-            name=device_name)
-
     @callback
-    def _handle_coordinator_update(self) -> None:
-        self._terminal = self.coordinator.data[self._terminal.id]
-        self.async_write_ha_state()
+    def async_add_terminals(added: list[Terminal], _: list[str]) -> None:
+        if added:
+            async_add_devices([MaxAmpNumber(coordinator, terminal) for terminal in added])
+
+    entry.async_on_unload(coordinator.async_add_terminals_listener(async_add_terminals))
 
 
 class MaxAmpNumber(EVDutyTerminalDevice, NumberEntity):
@@ -55,6 +40,10 @@ class MaxAmpNumber(EVDutyTerminalDevice, NumberEntity):
 
     def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
         super().__init__(coordinator, terminal, 'Max Amp')
+        self._optimistic_value: int | None = None
+        # only the last value set within the cooldown is sent to EVduty
+        self._write_debouncer = Debouncer(coordinator.hass, LOGGER, cooldown=WRITE_COOLDOWN, immediate=False,
+                                          function=self._async_write_max_charging_current)
 
     @property
     def native_max_value(self) -> int:
@@ -70,7 +59,35 @@ class MaxAmpNumber(EVDutyTerminalDevice, NumberEntity):
 
     @property
     def native_value(self):
+        if self._optimistic_value is not None:
+            return self._optimistic_value
         return self._terminal.charging_profile.current_limit
 
+    def _state(self) -> tuple:
+        return *super()._state(), self.native_max_value
+
     async def async_set_native_value(self, value: int) -> None:
-        await self.coordinator.async_set_terminal_max_charging_current(self._terminal, value)
\ No newline at end of file
+        self._optimistic_value = int(value)
+        self._async_write_ha_state_if_changed()
+        await self._write_debouncer.async_call()
+
+    async def _async_write_max_charging_current(self) -> None:
+        # the debouncer only logs errors and drops calls made while it runs, so failures are handled here and a value set
+        # during a write is written right after it, the refreshed value then replaces the one set
+        value = None
+        while self._optimistic_value is not None and self._optimistic_value != value:
+            value = self._optimistic_value
+            try:
+                await self.coordinator.async_set_terminal_max_charging_current(self._terminal, value)
+            except ConfigEntryAuthFailed:
+                LOGGER.error(f'Could not set max current of {self._terminal.name} to {value} A, EVduty credentials are invalid')
+                self.coordinator.config_entry.async_start_reauth(self.coordinator.hass)
+                break
+            except (ConnectionError, TimeoutError) as error:
+                LOGGER.error(f'Could not set max current of {self._terminal.name} to {value} A: {error!r}')
+        self._optimistic_value = None
+        self._handle_coordinator_update()
+
+    async def async_will_remove_from_hass(self) -> None:
+        self._write_debouncer.async_cancel()
+        await super().async_will_remove_from_hass()
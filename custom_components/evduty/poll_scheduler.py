@@ -0,0 +1,83 @@
+"""
+EVduty charging stations domain wide poll scheduling
+"""
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from math import ceil
+from random import uniform
+from typing import Any
+
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, callback
+
+from .const import DATA_POLL_SCHEDULER
+
+MAX_CONCURRENT_POLLS = 4
+SLOT_JITTER = 0.25
+
+
+class EVDutyPollScheduler:
+    # accounts get evenly spread slots in their refresh interval so they stop polling in bursts after a restart,
+    # and only a few accounts poll at once while they are still lined up
+    def __init__(self, max_concurrent_polls: int = MAX_CONCURRENT_POLLS) -> None:
+        self.max_concurrent_polls = max_concurrent_polls
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent_polls)
+        self._jitters: dict[str, float] = {}
+        self._next_refreshes: dict[str, float] = {}
+
+    @callback
+    def async_register(self, entry_id: str) -> CALLBACK_TYPE:
+        self._jitters[entry_id] = uniform(0, SLOT_JITTER)
+
+        @callback
+        def async_unregister() -> None:
+            self._jitters.pop(entry_id, None)
+            self._next_refreshes.pop(entry_id, None)
+
+        return async_unregister
+
+    def phase(self, entry_id: str) -> float:
+        # share of the interval before the slot of the entry
+        if entry_id not in self._jitters:
+            return 0.0
+        index = list(self._jitters).index(entry_id)
+        return (index + self._jitters[entry_id]) / len(self._jitters)
+
+    def next_refresh(self, entry_id: str, now: float, interval: float) -> float:
+        # the first slot at least half an interval away, refreshes settle on their slot without polling twice in a row
+        offset = self.phase(entry_id) * interval
+        when = ceil((now + interval / 2 - offset) / interval) * interval + offset
+        self._next_refreshes[entry_id] = when
+        return when
+
+    @asynccontextmanager
+    async def async_poll(self) -> AsyncIterator[None]:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        return {
+            'max_concurrent_polls': self.max_concurrent_polls,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'schedule': [{'entry_id': entry_id,
+                          'phase': round(self.phase(entry_id), 3),
+                          'next_refresh_in': None if (when := self._next_refreshes.get(entry_id)) is None else round(max(when - now, 0), 1)}
+                         for entry_id in self._jitters],
+        }
+
+
+@callback
+def async_get_poll_scheduler(hass: HomeAssistant) -> EVDutyPollScheduler:
+    return hass.data.setdefault(DATA_POLL_SCHEDULER, EVDutyPollScheduler())
@@ -0,0 +1,61 @@
+"""
+EVduty charging stations per account request scheduling
+"""
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_REQUEST_SCHEDULERS
+
+REQUEST_TIMEOUT = 10
+
+_T = TypeVar('_T')
+
+
+class EVDutyRequestScheduler:
+    # the cloud answers 401 when an account logs in twice at once, so logins of an account run one at a time,
+    # requests with a valid token run concurrently
+    def __init__(self) -> None:
+        self.requests = 0
+        self.deduplicated = 0
+        self.authentications = 0
+        self._auth_lock = asyncio.Lock()
+        self._pending: dict[Hashable, asyncio.Task] = {}
+
+    async def async_run(self, call: Callable[[], Awaitable[_T]], key: Hashable | None = None,
+                        authenticate: Callable[[], Awaitable[None]] | None = None) -> _T:
+        # requests with the same key share the result of the one already running, cancelling a caller does not cancel it for the others
+        if key is None:
+            return await self._async_run(call, authenticate)
+
+        if (pending := self._pending.get(key)) is not None:
+            self.deduplicated += 1
+        else:
+            pending = self._pending[key] = asyncio.ensure_future(self._async_run(call, authenticate))
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def async_authenticate(self, authenticate: Callable[[], Awaitable[None]]) -> None:
+        # the client skips the login while its token is valid, so requests queued behind a login reuse its token
+        async with self._auth_lock:
+            self.authentications += 1
+            async with asyncio.timeout(REQUEST_TIMEOUT):
+                await authenticate()
+
+    async def _async_run(self, call: Callable[[], Awaitable[_T]], authenticate: Callable[[], Awaitable[None]] | None) -> _T:
+        if authenticate is not None:
+            await self.async_authenticate(authenticate)
+        self.requests += 1
+        # the timeout does not include the time spent waiting for a login
+        async with asyncio.timeout(REQUEST_TIMEOUT):
+            return await call()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {'requests': self.requests, 'deduplicated': self.deduplicated, 'authentications': self.authentications}
+
+
+@callback
+def async_get_request_scheduler(hass: HomeAssistant, username: str) -> EVDutyRequestScheduler:
+    return hass.data.setdefault(DATA_REQUEST_SCHEDULERS, {}).setdefault(username.lower(), EVDutyRequestScheduler())
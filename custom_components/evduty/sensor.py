@@ -1,201 +1,247 @@
 """
-EVduty charging stations terminal device and sensors
+EVduty charging stations terminal sensors
 """
-from datetime import datetime
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 
 from evdutyapi import Terminal, ChargingStatus
+from homeassistant.components.sensor import SensorEntity, SensorEntityDescription, SensorDeviceClass, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import UnitOfPower, UnitOfElectricCurrent, UnitOfElectricPotential, UnitOfEnergy, UnitOfTime, EntityCategory, SIGNAL_STRENGTH_DECIBELS_MILLIWATT
 from homeassistant.core import callback
-from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
+from homeassistant.helpers.device_registry import DeviceEntryType
 from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.util import slugify
-
-from . import EVDutyCoordinator
-from .const import DOMAIN, MANUFACTURER, LOGGER
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.typing import StateType
+from homeassistant.util import slugify, dt as dt_util
+
+from .const import DOMAIN, MANUFACTURER, LOGGER, CONF_ENERGY_ESTIMATE_INTERVAL, CONF_LOCAL_SESSION_DURATION, DEFAULT_ENERGY_ESTIMATE_INTERVAL, \
+    DEFAULT_LOCAL_SESSION_DURATION
+from .coordinator import EVDutyCoordinator
+from .entity import EVDutyTerminalDevice
+from .health import CoordinatorHealth
+
+
+@dataclass(frozen=True, kw_only=True)
+class EVDutySensorEntityDescription(SensorEntityDescription):
+    value_fn: Callable[[Terminal], StateType | datetime]
+    slow_tier: bool = False
+
+
+@dataclass(frozen=True, kw_only=True)
+class EVDutyHealthSensorEntityDescription(SensorEntityDescription):
+    value_fn: Callable[[CoordinatorHealth], StateType | datetime]
+    entity_registry_enabled_default: bool = False
+
+
+def charging_state(terminal: Terminal) -> str:
+    if terminal.status == ChargingStatus.in_use:
+        return 'Charging'
+    elif terminal.status == ChargingStatus.out_of_service:
+        return 'Offline'
+    return 'Available'
+
+
+def session_start_date(terminal: Terminal) -> datetime | None:
+    if terminal.session.start_date == datetime.min:
+        return None
+    return terminal.session.start_date
+
+
+def local_session_duration(start_date: datetime) -> int:
+    return round((dt_util.utcnow() - start_date).total_seconds())
+
+
+SENSORS: tuple[EVDutySensorEntityDescription, ...] = (
+    EVDutySensorEntityDescription(key='power', name='Power', state_class=SensorStateClass.MEASUREMENT, device_class=SensorDeviceClass.POWER,
+                                  native_unit_of_measurement=UnitOfPower.WATT, value_fn=lambda terminal: terminal.session.power),
+    EVDutySensorEntityDescription(key='amp', name='Amp', device_class=SensorDeviceClass.CURRENT, native_unit_of_measurement=UnitOfElectricCurrent.AMPERE,
+                                  value_fn=lambda terminal: terminal.session.amp),
+    EVDutySensorEntityDescription(key='volt', name='Volt', device_class=SensorDeviceClass.VOLTAGE, native_unit_of_measurement=UnitOfElectricPotential.VOLT,
+                                  value_fn=lambda terminal: terminal.session.volt),
+    EVDutySensorEntityDescription(key='state', name='State', device_class=SensorDeviceClass.ENUM, options=['Available', 'Charging', 'Offline'],
+                                  value_fn=charging_state),
+    EVDutySensorEntityDescription(key='session_start_date', name='Session Start Date', device_class=SensorDeviceClass.TIMESTAMP, value_fn=session_start_date),
+    EVDutySensorEntityDescription(key='session_estimated_cost', name='Session Estimated Cost', state_class=SensorStateClass.TOTAL_INCREASING,
+                                  native_unit_of_measurement='$', suggested_display_precision=2, value_fn=lambda terminal: terminal.session.cost),
+    EVDutySensorEntityDescription(key='wifi_ip', name='Wi-Fi IP', entity_category=EntityCategory.DIAGNOSTIC, entity_registry_enabled_default=False, slow_tier=True,
+                                  value_fn=lambda terminal: terminal.network_info.ip_address),
+    EVDutySensorEntityDescription(key='wifi_ssid', name='Wi-Fi SSID', entity_category=EntityCategory.DIAGNOSTIC, entity_registry_enabled_default=False, slow_tier=True,
+                                  value_fn=lambda terminal: terminal.network_info.wifi_ssid),
+    EVDutySensorEntityDescription(key='wifi_rssi', name='Wi-Fi Signal Strength', device_class=SensorDeviceClass.SIGNAL_STRENGTH,
+                                  entity_category=EntityCategory.DIAGNOSTIC, entity_registry_enabled_default=False, slow_tier=True,
+                                  native_unit_of_measurement=SIGNAL_STRENGTH_DECIBELS_MILLIWATT, value_fn=lambda terminal: terminal.network_info.wifi_rssi),
+)
+
+SESSION_DURATION_SENSOR = EVDutySensorEntityDescription(key='session_duration', name='Session Duration', device_class=SensorDeviceClass.DURATION,
+                                                        native_unit_of_measurement=UnitOfTime.SECONDS,
+                                                        value_fn=lambda terminal: terminal.session.duration.total_seconds())
+
+ENERGY_CONSUMED_SENSOR = EVDutySensorEntityDescription(key='energy_consumed', name='Energy Consumed', state_class=SensorStateClass.TOTAL_INCREASING,
+                                                       device_class=SensorDeviceClass.ENERGY, native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+                                                       suggested_display_precision=1, value_fn=lambda terminal: terminal.session.energy_consumed / 1000)
+
+HEALTH_SENSORS: tuple[EVDutyHealthSensorEntityDescription, ...] = (
+    EVDutyHealthSensorEntityDescription(key='poll_latency', name='Poll Latency', state_class=SensorStateClass.MEASUREMENT, device_class=SensorDeviceClass.DURATION,
+                                        native_unit_of_measurement=UnitOfTime.SECONDS, suggested_display_precision=2, value_fn=lambda health: health.last_latency),
+    EVDutyHealthSensorEntityDescription(key='successful_polls', name='Successful Polls', state_class=SensorStateClass.TOTAL_INCREASING,
+                                        value_fn=lambda health: health.successes),
+    EVDutyHealthSensorEntityDescription(key='failed_polls', name='Failed Polls', state_class=SensorStateClass.TOTAL_INCREASING, value_fn=lambda health: health.errors),
+    EVDutyHealthSensorEntityDescription(key='timed_out_polls', name='Timed Out Polls', state_class=SensorStateClass.TOTAL_INCREASING,
+                                        value_fn=lambda health: health.timeouts),
+    EVDutyHealthSensorEntityDescription(key='stale_polls', name='Stale Polls', state_class=SensorStateClass.TOTAL_INCREASING, value_fn=lambda health: health.stale_returns),
+    EVDutyHealthSensorEntityDescription(key='last_successful_poll', name='Last Successful Poll', device_class=SensorDeviceClass.TIMESTAMP,
+                                        value_fn=lambda health: health.last_success),
+)
 
 
 async def async_setup_entry(hass, entry, async_add_devices) -> None:
     coordinator = hass.data[DOMAIN][entry.entry_id]
 
-    sensors = []
-    for terminal in coordinator.data.values():
-        LOGGER.debug(terminal)
-        sensors.append(PowerSensor(coordinator, terminal))
-        sensors.append(AmpSensor(coordinator, terminal))
-        sensors.append(VoltSensor(coordinator, terminal))
-        sensors.append(EnergyConsumedSensor(coordinator, terminal))
-        sensors.append(ChargingStateSensor(coordinator, terminal))
-        sensors.append(ChargingSessionStartDateSensor(coordinator, terminal))
-        sensors.append(ChargingSessionDurationSensor(coordinator, terminal))
-        sensors.append(ChargingSessionEstimatedCostSensor(coordinator, terminal))
-        sensors.append(WifiIpSensor(coordinator, terminal))
-        sensors.append(WifiSsidSensor(coordinator, terminal))
-        sensors.append(WifiRssiSensor(coordinator, terminal))
+    sensors = terminal_sensors(coordinator, coordinator.data.values())
+    sensors.extend(EVDutyHealthSensor(coordinator, entry, description) for description in HEALTH_SENSORS)
 
     async_add_devices(sensors)
 
-
-class EVDutyTerminalDevice(CoordinatorEntity):
-    _attr_attribution = f'Data provided by {MANUFACTURER}'
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal, sensor_name: str) -> None:
-        super().__init__(coordinator)
-        device_name = f'{MANUFACTURER} {terminal.name}'
-        self._attr_name = f'{device_name} {sensor_name}'
-        self._attr_unique_id = slugify(self._attr_name)
-        self._terminal = terminal
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, terminal.id)},
-            manufacturer=MANUFACTURER,
-            model=terminal.charge_box_identity,
-            sw_version=terminal.firmware_version,
-            connections={(CONNECTION_NETWORK_MAC, terminal.network_info.mac_address)},
-            name=device_name)
-
     @callback
-    def _handle_coordinator_update(self) -> None:
-        self._terminal = self.coordinator.data[self._terminal.id]
-        self.async_write_ha_state()
-
-
-class PowerSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_state_class = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.POWER
-    _attr_native_unit_of_measurement = UnitOfPower.WATT
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Power')
-
-    @property
-    def native_value(self):
-        return self._terminal.session.power
-
-
-class AmpSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_device_class = SensorDeviceClass.CURRENT
-    _attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Amp')
-
-    @property
-    def native_value(self):
-        return self._terminal.session.amp
-
-
-class VoltSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_device_class = SensorDeviceClass.VOLTAGE
-    _attr_native_unit_of_measurement = UnitOfElectricPotential.VOLT
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Volt')
-
-    @property
-    def native_value(self):
-        return self._terminal.session.volt
-
-
-class EnergyConsumedSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_state_class = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-    _attr_suggested_display_precision = 1
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Energy Consumed')
-
-    @property
-    def native_value(self):
-        return self._terminal.session.energy_consumed / 1000
-
-
-class ChargingStateSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_device_class = SensorDeviceClass.ENUM
-    _attr_options = ['Available', 'Charging', 'Offline']
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'State')
-
-    @property
-    def native_value(self):
-        if self._terminal.status == ChargingStatus.in_use:
-            return 'Charging'
-        elif self._terminal.status == ChargingStatus.out_of_service:
-            return 'Offline'
-        return 'Available'
+    def async_add_terminals(added: list[Terminal], _: list[str]) -> None:
+        if added:
+            async_add_devices(terminal_sensors(coordinator, added))
 
+    entry.async_on_unload(coordinator.async_add_terminals_listener(async_add_terminals))
 
-class ChargingSessionStartDateSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_device_class = SensorDeviceClass.TIMESTAMP
 
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Session Start Date')
-
-    @property
-    def native_value(self):
-        if self._terminal.session.start_date == datetime.min:
-            return None
-        return self._terminal.session.start_date
+def terminal_sensors(coordinator: EVDutyCoordinator, terminals: Iterable[Terminal]) -> list[SensorEntity]:
+    sensors = []
+    for terminal in terminals:
+        LOGGER.debug(terminal)
+        sensors.extend(EVDutySensor(coordinator, terminal, description) for description in SENSORS)
+        sensors.append(SessionDurationSensor(coordinator, terminal))
+        sensors.append(EnergyConsumedSensor(coordinator, terminal))
+    return sensors
 
 
-class ChargingSessionDurationSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_device_class = SensorDeviceClass.DURATION
-    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+class EVDutySensor(EVDutyTerminalDevice, SensorEntity):
+    entity_description: EVDutySensorEntityDescription
 
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Session Duration')
+    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal, description: EVDutySensorEntityDescription) -> None:
+        super().__init__(coordinator, terminal, description.name, description.slow_tier)
+        self.entity_description = description
 
     @property
     def native_value(self):
-        return self._terminal.session.duration.total_seconds()
-
+        return self.entity_description.value_fn(self._terminal)
 
-class ChargingSessionEstimatedCostSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_state_class = SensorStateClass.TOTAL_INCREASING
-    _attr_native_unit_of_measurement = '$'
-    _attr_suggested_display_precision = 2
 
+class SessionDurationSensor(EVDutySensor):
     def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Session Estimated Cost')
+        super().__init__(coordinator, terminal, SESSION_DURATION_SENSOR)
+        self._local_duration = coordinator.config_entry.options.get(CONF_LOCAL_SESSION_DURATION, DEFAULT_LOCAL_SESSION_DURATION)
+        self._final_duration: float | None = None
 
     @property
     def native_value(self):
-        return self._terminal.session.cost
-
-
-class WifiIpSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_entity_category = EntityCategory.DIAGNOSTIC
+        # while charging the duration is counted from the start date, the duration of the session is held once it ends
+        if self._local_duration:
+            if self._terminal.status == ChargingStatus.in_use and (start_date := session_start_date(self._terminal)) is not None:
+                return local_session_duration(start_date)
+            if self._final_duration is not None:
+                return self._final_duration
+        return super().native_value
 
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        previous = self._terminal
+        terminal = self.coordinator.data.get(previous.id, previous)
+        if terminal.status == ChargingStatus.in_use:
+            self._final_duration = None
+        elif previous.status == ChargingStatus.in_use and (start_date := session_start_date(previous)) is not None:
+            # the cloud either keeps the ended session with its final duration or clears it
+            if terminal.session.start_date == previous.session.start_date and terminal.session.duration:
+                self._final_duration = terminal.session.duration.total_seconds()
+            else:
+                self._final_duration = local_session_duration(start_date)
+        super()._handle_coordinator_update()
+
+    def _state(self) -> tuple:
+        # the local duration is fully determined by the start date, so the state is only written when a session starts or ends,
+        # the session start date sensor gives the live duration
+        if self._local_duration:
+            start_date = self._terminal.session.start_date if self._terminal.status == ChargingStatus.in_use else None
+            return self.available, self.assumed_state, start_date, self._final_duration
+        return super()._state()
+
+
+class EnergyConsumedSensor(EVDutySensor):
     def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        LOGGER.info('Wi-Fi IP')
-        super().__init__(coordinator, terminal, 'Wi-Fi IP')
+        super().__init__(coordinator, terminal, ENERGY_CONSUMED_SENSOR)
+        self._reading_time = dt_util.utcnow()
+        self._estimated_energy: float | None = None
 
-    @property
-    def native_value(self):
-        return self._terminal.network_info.ip_address
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        interval = self.coordinator.config_entry.options.get(CONF_ENERGY_ESTIMATE_INTERVAL, DEFAULT_ENERGY_ESTIMATE_INTERVAL)
+        if interval > 0:
+            self.async_on_remove(async_track_time_interval(self.hass, self._async_estimate_energy, timedelta(seconds=interval)))
 
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        previous_energy = self._terminal.session.energy_consumed
+        self._terminal = self.coordinator.data.get(self._terminal.id, self._terminal)
+        energy = self._terminal.session.energy_consumed
+        if energy != previous_energy:
+            self._reading_time = dt_util.utcnow()
+        if self._estimated_energy is not None:
+            # the estimate is clamped to at most one refresh interval of energy above the reading, and dropped when a new session starts
+            self._estimated_energy = min(self._estimated_energy, self._projected_energy(self.coordinator.update_interval))
+            if energy < previous_energy or energy / 1000 >= self._estimated_energy:
+                self._estimated_energy = None
+        self._async_write_ha_state_if_changed()
 
-class WifiSsidSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_entity_category = EntityCategory.DIAGNOSTIC
-
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Wi-Fi SSID')
+    @callback
+    def _async_estimate_energy(self, now: datetime) -> None:
+        # project the last reading forward at the last power reading, for one refresh interval at most and only while refreshes succeed
+        if not self.coordinator.last_update_success or self._terminal.status != ChargingStatus.in_use or self._terminal.session.power <= 0:
+            return
+        estimated_energy = self._projected_energy(min(now - self._reading_time, self.coordinator.update_interval))
+        self._estimated_energy = max(estimated_energy, self._estimated_energy or 0)
+        self._async_write_ha_state_if_changed()
+
+    def _projected_energy(self, elapsed: timedelta) -> float:
+        session = self._terminal.session
+        return (session.energy_consumed + session.power * elapsed.total_seconds() / 3600) / 1000
 
     @property
     def native_value(self):
-        return self._terminal.network_info.wifi_ssid
+        energy = super().native_value
+        if self._estimated_energy is not None and self._estimated_energy > energy:
+            return round(self._estimated_energy, 3)
+        return energy
 
 
-class WifiRssiSensor(EVDutyTerminalDevice, SensorEntity):
-    _attr_device_class = SensorDeviceClass.SIGNAL_STRENGTH
+class EVDutyHealthSensor(SensorEntity):
+    _attr_attribution = f'Data provided by {MANUFACTURER}'
     _attr_entity_category = EntityCategory.DIAGNOSTIC
-    _attr_native_unit_of_measurement = SIGNAL_STRENGTH_DECIBELS_MILLIWATT
+    _attr_should_poll = False
+    entity_description: EVDutyHealthSensorEntityDescription
+
+    def __init__(self, coordinator: EVDutyCoordinator, entry: ConfigEntry, description: EVDutyHealthSensorEntityDescription) -> None:
+        device_name = f'{MANUFACTURER} {entry.title}'
+        self.entity_description = description
+        self._attr_name = f'{device_name} {description.name}'
+        self._attr_unique_id = f'{entry.entry_id}_{slugify(description.name)}'
+        self._health = coordinator.health
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            manufacturer=MANUFACTURER,
+            entry_type=DeviceEntryType.SERVICE,
+            name=device_name)
 
-    def __init__(self, coordinator: EVDutyCoordinator, terminal: Terminal) -> None:
-        super().__init__(coordinator, terminal, 'Wi-Fi Signal Strength')
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._health.async_add_listener(self.async_write_ha_state))
 
     @property
     def native_value(self):
-        return self._terminal.network_info.wifi_rssi
+        return self.entity_description.value_fn(self._health)
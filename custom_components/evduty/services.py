@@ -0,0 +1,156 @@
+"""
+EVduty charging stations services
+"""
+import asyncio
+from datetime import datetime, time, timedelta
+
+import voluptuous as vol
+from homeassistant.const import ATTR_DEVICE_ID
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.util import dt as dt_util
+
+from .charging_planner import EVDutyChargingPlanner, forecast_prices
+from .const import DOMAIN, DATA_CHARGING_PLANNERS
+from .coordinator import EVDutyCoordinator
+
+SERVICE_SET_MAX_CURRENT = 'set_max_current'
+SERVICE_PLAN_CHARGING = 'plan_charging'
+SERVICE_CLEAR_CHARGING_PLAN = 'clear_charging_plan'
+
+ATTR_CURRENT = 'current'
+ATTR_STATION_ID = 'station_id'
+ATTR_CONFIG_ENTRY_ID = 'config_entry_id'
+ATTR_ENERGY = 'energy'
+ATTR_DEPARTURE = 'departure'
+ATTR_TARIFF = 'tariff'
+ATTR_PRICE_ENTITY = 'price_entity'
+
+SET_MAX_CURRENT_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CURRENT): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(ATTR_DEVICE_ID, default=[]): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_STATION_ID, default=[]): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID, default=[]): vol.All(cv.ensure_list, [cv.string]),
+    }
+)
+
+PLAN_CHARGING_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+            vol.Required(ATTR_ENERGY): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(ATTR_DEPARTURE): cv.time,
+            vol.Exclusive(ATTR_TARIFF, 'prices'): vol.All({cv.time: vol.Coerce(float)}, vol.Length(min=1)),
+            vol.Exclusive(ATTR_PRICE_ENTITY, 'prices'): cv.entity_id,
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_TARIFF, ATTR_PRICE_ENTITY),
+)
+
+CLEAR_CHARGING_PLAN_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    async def async_set_max_current(call: ServiceCall) -> ServiceResponse:
+        terminal_ids = async_get_terminal_ids(hass, call.data[ATTR_DEVICE_ID])
+        station_ids = set(call.data[ATTR_STATION_ID])
+        entry_ids = set(call.data[ATTR_CONFIG_ENTRY_ID])
+
+        writes = []
+        names = {}
+        for coordinator in async_get_coordinators(hass):
+            currents = {}
+            for terminal in coordinator.data.values():
+                if terminal.id in terminal_ids or terminal.station_id in station_ids or coordinator.config_entry.entry_id in entry_ids:
+                    currents[terminal.id] = min(call.data[ATTR_CURRENT], terminal.charging_profile.current_max)
+                    names[terminal.id] = terminal.name
+            if currents:
+                writes.append((coordinator, currents))
+
+        if not writes:
+            raise ServiceValidationError(translation_domain=DOMAIN, translation_key='no_terminal_selected')
+
+        errors = await asyncio.gather(*(coordinator.async_set_terminals_max_charging_current(currents) for coordinator, currents in writes))
+
+        terminals = {}
+        # a refresh during the writes may drop a terminal, the names are read before writing
+        for (_, currents), coordinator_errors in zip(writes, errors):
+            for terminal_id, current in currents.items():
+                terminals[terminal_id] = {'name': names[terminal_id], 'current': current, 'error': coordinator_errors[terminal_id]}
+        return {'terminals': terminals}
+
+    hass.services.async_register(DOMAIN, SERVICE_SET_MAX_CURRENT, async_set_max_current, schema=SET_MAX_CURRENT_SCHEMA,
+                                 supports_response=SupportsResponse.OPTIONAL)
+
+    async def async_plan_charging(call: ServiceCall) -> ServiceResponse:
+        terminal_ids = async_get_terminal_ids(hass, call.data[ATTR_DEVICE_ID])
+        price_entity = call.data.get(ATTR_PRICE_ENTITY)
+        if price_entity is not None and not forecast_prices(hass.states.get(price_entity)):
+            raise ServiceValidationError(translation_domain=DOMAIN, translation_key='no_price_forecast', translation_placeholders={'entity_id': price_entity})
+
+        tariff = None
+        if ATTR_TARIFF in call.data:
+            tariff = tuple((start.isoformat(), price) for start, price in sorted(call.data[ATTR_TARIFF].items()))
+        departure = next_departure(call.data[ATTR_DEPARTURE])
+
+        terminals = {}
+        for coordinator, planner in async_get_planners(hass):
+            for terminal_id in sorted(terminal_ids & coordinator.data.keys()):
+                plan = planner.async_set_plan(terminal_id, call.data[ATTR_ENERGY], departure, tariff, price_entity)
+                terminals[terminal_id] = {'name': coordinator.data[terminal_id].name,
+                                          'departure': plan.departure.isoformat(),
+                                          'setpoints': [{'start': start.isoformat(), 'current': current} for start, current in plan.setpoints]}
+
+        if not terminals:
+            raise ServiceValidationError(translation_domain=DOMAIN, translation_key='no_terminal_selected')
+        return {'terminals': terminals}
+
+    hass.services.async_register(DOMAIN, SERVICE_PLAN_CHARGING, async_plan_charging, schema=PLAN_CHARGING_SCHEMA,
+                                 supports_response=SupportsResponse.OPTIONAL)
+
+    async def async_clear_charging_plan(call: ServiceCall) -> None:
+        terminal_ids = async_get_terminal_ids(hass, call.data[ATTR_DEVICE_ID])
+        for _, planner in async_get_planners(hass):
+            for terminal_id in terminal_ids:
+                planner.async_clear_plan(terminal_id)
+
+    hass.services.async_register(DOMAIN, SERVICE_CLEAR_CHARGING_PLAN, async_clear_charging_plan, schema=CLEAR_CHARGING_PLAN_SCHEMA)
+
+
+def next_departure(departure: time) -> datetime:
+    now = dt_util.now()
+    when = now.replace(hour=departure.hour, minute=departure.minute, second=departure.second, microsecond=0)
+    if when <= now:
+        when += timedelta(days=1)
+    return dt_util.as_utc(when)
+
+
+@callback
+def async_get_terminal_ids(hass: HomeAssistant, device_ids: list[str]) -> set[str]:
+    if not device_ids:
+        return set()
+
+    device_registry = dr.async_get(hass)
+    terminal_ids = set()
+    for device_id in device_ids:
+        if device := device_registry.async_get(device_id):
+            terminal_ids.update(identifier for domain, identifier in device.identifiers if domain == DOMAIN)
+    return terminal_ids
+
+
+def async_get_coordinators(hass: HomeAssistant) -> list[EVDutyCoordinator]:
+    # an account that could not be reached at startup has no data until its entry is set up again
+    return [coordinator for coordinator in hass.data.get(DOMAIN, {}).values() if isinstance(coordinator, EVDutyCoordinator) and coordinator.data is not None]
+
+
+def async_get_planners(hass: HomeAssistant) -> list[tuple[EVDutyCoordinator, EVDutyChargingPlanner]]:
+    planners = hass.data.get(DATA_CHARGING_PLANNERS, {})
+    return [(coordinator, planners[coordinator.config_entry.entry_id]) for coordinator in async_get_coordinators(hass)
+            if coordinator.config_entry.entry_id in planners]
@@ -0,0 +1,84 @@
+"""
+EVduty charging stations completed charging sessions statistics
+"""
+import asyncio
+from collections.abc import Callable
+from datetime import datetime
+
+from evdutyapi import Terminal, ChargingSession
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
+from homeassistant.const import UnitOfEnergy, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import slugify, dt as dt_util
+
+from .const import DOMAIN, MANUFACTURER, LOGGER
+
+SESSION_STATISTICS: tuple[tuple[str, str, str, Callable[[ChargingSession], float]], ...] = (
+    ('energy', 'Session Energy', UnitOfEnergy.KILO_WATT_HOUR, lambda session: session.energy_consumed / 1000),
+    ('cost', 'Session Cost', '$', lambda session: session.cost or 0),
+    ('duration', 'Session Duration', UnitOfTime.HOURS, lambda session: session.duration.total_seconds() / 3600),
+)
+
+
+def completed_sessions(previous: dict[str, Terminal] | None, terminals: dict[str, Terminal]) -> list[tuple[Terminal, ChargingSession]]:
+    # a session is completed when it is no longer active or is replaced by another session, the last reading of the session is kept,
+    # a paused session stays active with the same start date and is only completed once
+    completed = []
+    for terminal_id, terminal in terminals.items():
+        previous_terminal = (previous or {}).get(terminal_id)
+        if previous_terminal is None or not previous_terminal.session.is_active or previous_terminal.session.start_date == datetime.min:
+            continue
+        if not terminal.session.is_active or terminal.session.start_date != previous_terminal.session.start_date:
+            completed.append((previous_terminal, previous_terminal.session))
+    return completed
+
+
+def session_statistic_id(terminal: Terminal, key: str) -> str:
+    return f'{DOMAIN}:{slugify(terminal.id)}_session_{key}'
+
+
+class EVDutySessionStatistics:
+    # completed sessions are imported as hourly external statistics, summed per terminal at the hour the session ended
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.imported = 0
+        self._lock = asyncio.Lock()
+        self._last_sums: dict[str, tuple[float, float]] = {}
+
+    @callback
+    def async_import(self, sessions: list[tuple[Terminal, ChargingSession]]) -> None:
+        self.hass.async_create_background_task(self.async_import_sessions(sessions), f'{DOMAIN} session statistics')
+
+    async def async_import_sessions(self, sessions: list[tuple[Terminal, ChargingSession]]) -> None:
+        # the recorder writes statistics in the background, the sums are read once then followed in memory
+        async with self._lock:
+            for key, name, unit, value_fn in SESSION_STATISTICS:
+                for terminal, session in sessions:
+                    await self._async_import_session(terminal, session, key, name, unit, value_fn(session))
+            self.imported += len(sessions)
+
+    async def _async_import_session(self, terminal: Terminal, session: ChargingSession, key: str, name: str, unit: str, value: float) -> None:
+        statistic_id = session_statistic_id(terminal, key)
+        start = dt_util.as_utc(session.start_date + session.duration).replace(minute=0, second=0, microsecond=0)
+        last_start, last_sum = await self._async_last_sum(statistic_id)
+        if start.timestamp() < last_start:
+            LOGGER.debug(f'Skipping {statistic_id} of session started {session.start_date}, a later session is already imported')
+            return
+
+        total = last_sum + value
+        metadata = StatisticMetaData(has_mean=False, has_sum=True, name=f'{MANUFACTURER} {terminal.name} {name}', source=DOMAIN,
+                                     statistic_id=statistic_id, unit_of_measurement=unit)
+        async_add_external_statistics(self.hass, metadata, [StatisticData(start=start, state=total, sum=total)])
+        # the previous sessions of the same hour are part of last_sum, the next session of that hour adds to this one
+        self._last_sums[statistic_id] = (start.timestamp(), total)
+
+    async def _async_last_sum(self, statistic_id: str) -> tuple[float, float]:
+        if statistic_id not in self._last_sums:
+            statistics = await get_instance(self.hass).async_add_executor_job(get_last_statistics, self.hass, 1, statistic_id, False, {'sum'})
+            if rows := statistics.get(statistic_id):
+                self._last_sums[statistic_id] = (rows[0]['start'], rows[0]['sum'] or 0)
+            else:
+                self._last_sums[statistic_id] = (0, 0)
+        return self._last_sums[statistic_id]
@@ -0,0 +1,130 @@
+"""
+EVduty charging stations local storage
+"""
+from dataclasses import astuple
+from datetime import datetime, timedelta
+
+from evdutyapi import EVDutyApi, Terminal, ChargingStatus, ChargingSession, NetworkInfo, ChargingProfile
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, LOGGER
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+
+class EVDutyStore:
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, f'{DOMAIN}.{entry_id}', private=True)
+        self._data: dict = {}
+        self._terminals: dict[str, Terminal] | None = None
+
+    async def async_load(self) -> None:
+        self._data = await self._store.async_load() or {}
+
+    def restore_token(self, api: EVDutyApi) -> bool:
+        token = self._data.get('token')
+        if token is None:
+            return False
+
+        expires_at = datetime.fromtimestamp(token['expires_at'])
+        if expires_at <= datetime.now():
+            return False
+
+        api.headers['Authorization'] = token['authorization']
+        api.expires_at = expires_at
+        return True
+
+    @callback
+    def async_save_token(self, api: EVDutyApi) -> None:
+        authorization = api.headers.get('Authorization')
+        if authorization is None:
+            return
+
+        token = {'authorization': authorization, 'expires_at': api.expires_at.timestamp()}
+        if token != self._data.get('token'):
+            self._data['token'] = token
+            self._async_delay_save()
+
+    @callback
+    def async_clear_token(self) -> None:
+        if self._data.pop('token', None) is not None:
+            self._async_delay_save()
+
+    def restore_terminals(self) -> dict[str, Terminal] | None:
+        if 'terminals' not in self._data:
+            return None
+
+        try:
+            terminals = [terminal_from_json(terminal) for terminal in self._data['terminals']]
+        except (TypeError, ValueError) as error:
+            LOGGER.warning(f'Ignoring invalid stored EVduty terminals: {error}')
+            return None
+        return {terminal.id: terminal for terminal in terminals}
+
+    @callback
+    def async_save_terminals(self, terminals: dict[str, Terminal]) -> None:
+        # serialized lazily when the delayed save runs
+        self._terminals = terminals
+        self._async_delay_save()
+
+    def restore_plans(self) -> dict[str, dict]:
+        return self._data.get('plans', {})
+
+    @callback
+    def async_save_plans(self, plans: dict[str, dict]) -> None:
+        self._data['plans'] = plans
+        self._async_delay_save()
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+    @callback
+    def _async_delay_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict:
+        if self._terminals is not None:
+            self._data['terminals'] = [terminal_to_json(terminal) for terminal in self._terminals.values()]
+        return self._data
+
+
+def terminal_to_json(terminal: Terminal) -> list:
+    session = terminal.session
+    return [
+        terminal.id,
+        terminal.station_id,
+        terminal.name,
+        terminal.status.value,
+        terminal.charge_box_identity,
+        terminal.firmware_version,
+        [session.is_active, session.is_charging, session.volt, session.amp, session.power, session.energy_consumed,
+         session.start_date.isoformat(), session.duration.total_seconds(), session.cost],
+        None if terminal.network_info is None else list(astuple(terminal.network_info)),
+        None if terminal.charging_profile is None else list(astuple(terminal.charging_profile)),
+    ]
+
+
+def terminal_from_json(data: list) -> Terminal:
+    terminal_id, station_id, name, status, charge_box_identity, firmware_version, session, network_info, charging_profile = data
+    is_active, is_charging, volt, amp, power, energy_consumed, start_date, duration, cost = session
+    return Terminal(
+        id=terminal_id,
+        station_id=station_id,
+        name=name,
+        status=ChargingStatus(status),
+        charge_box_identity=charge_box_identity,
+        firmware_version=firmware_version,
+        session=ChargingSession(is_active=is_active,
+                                is_charging=is_charging,
+                                volt=volt,
+                                amp=amp,
+                                power=power,
+                                energy_consumed=energy_consumed,
+                                start_date=datetime.fromisoformat(start_date),
+                                duration=timedelta(seconds=duration),
+                                cost=cost),
+        network_info=None if network_info is None else NetworkInfo(*network_info),
+        charging_profile=None if charging_profile is None else ChargingProfile(*charging_profile),
+    )
@@ -0,0 +1,122 @@
+"""
+EVduty charging stations solar surplus following
+"""
+import asyncio
+from datetime import datetime
+from math import exp
+from time import monotonic
+
+from evdutyapi import ChargingStatus
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, CALLBACK_TYPE, Event, callback
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+
+from .const import LOGGER, DEFAULT_VOLTAGE
+from .coordinator import EVDutyCoordinator
+from .load_balancer import EVDutyLoadBalancer, allocate_current
+
+SMOOTHING_TIME_CONSTANT = 120
+
+
+class EVDutySurplusFollower:
+    # the export sensor ticks every few seconds, the surplus is smoothed on every tick but the terminals are only written
+    # when the allocation moved by the threshold and the write interval elapsed since the last write
+    def __init__(self, hass: HomeAssistant, coordinator: EVDutyCoordinator, surplus_entity: str, write_interval: int, threshold: int,
+                 load_balancer: EVDutyLoadBalancer | None = None) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.load_balancer = load_balancer
+        self.surplus_entity = surplus_entity
+        self.write_interval = write_interval
+        self.threshold = threshold
+        self.surplus: float | None = None
+        self._surplus_at: float | None = None
+        self._last_write: float | None = None
+        self._paused: set[str] = set()
+        self._following: asyncio.Task | None = None
+        self._unsub_retry: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        unsubscribe = async_track_state_change_event(self.hass, [self.surplus_entity], self._async_surplus_changed)
+
+        @callback
+        def async_stop() -> None:
+            unsubscribe()
+            self._async_cancel_retry()
+
+        return async_stop
+
+    @callback
+    def _async_surplus_changed(self, event: Event) -> None:
+        state = event.data['new_state']
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return
+        try:
+            exported = float(state.state)
+        except ValueError:
+            return
+
+        # the export is measured with the terminals charging, what they draw is part of the surplus
+        charging_power = sum(terminal.session.power for terminal in (self.coordinator.data or {}).values() if terminal.status == ChargingStatus.in_use)
+        self._smooth(exported + charging_power, monotonic())
+        self.async_follow()
+
+    def _smooth(self, surplus: float, now: float) -> None:
+        # exponential moving average weighted by the time since the previous sample, irregular sensor ticks count for their duration
+        if self.surplus is None:
+            self.surplus = surplus
+        else:
+            self.surplus += (1 - exp(-(now - self._surplus_at) / SMOOTHING_TIME_CONSTANT)) * (surplus - self.surplus)
+        self._surplus_at = now
+
+    @callback
+    def async_follow(self, _: datetime | None = None) -> None:
+        self._async_cancel_retry()
+        if self.surplus is None or self._following is not None:
+            return
+
+        terminals = self.coordinator.data or {}
+        # terminals paused for lack of surplus may no longer be reported in use, they are resumed once the surplus is back
+        self._paused &= terminals.keys()
+        following = {terminal.id: terminal for terminal in terminals.values() if terminal.status == ChargingStatus.in_use or terminal.id in self._paused}
+        if not following:
+            return
+
+        volt = next((terminal.session.volt for terminal in following.values() if terminal.session.volt), DEFAULT_VOLTAGE)
+        allocation = allocate_current(int(self.surplus / volt), {terminal_id: terminal.charging_profile.current_max for terminal_id, terminal in following.items()})
+        if self.load_balancer is not None:
+            allocation = self.load_balancer.async_cap(allocation)
+        changes = {terminal_id: current for terminal_id, current in allocation.items()
+                   if abs(current - following[terminal_id].charging_profile.current_limit) >= self.threshold}
+        if not changes:
+            return
+
+        now = monotonic()
+        if self._last_write is not None and (wait := self._last_write + self.write_interval - now) > 0:
+            # followed once the interval elapsed, even if the sensor stops ticking
+            self._unsub_retry = async_call_later(self.hass, wait, self.async_follow)
+            return
+
+        LOGGER.debug(f'Following {self.surplus:.0f}W of surplus: {changes}')
+        self._last_write = now
+        self._paused.update(terminal_id for terminal_id, current in changes.items() if current == 0)
+        self._paused.difference_update(terminal_id for terminal_id, current in changes.items() if current > 0)
+        self._following = self.hass.async_create_task(self._async_apply(changes), 'evduty surplus following')
+
+    async def _async_apply(self, changes: dict[str, int]) -> None:
+        try:
+            results = await self.coordinator.async_set_terminals_max_charging_current(changes)
+        finally:
+            self._following = None
+
+        if any(error is not None for error in results.values()):
+            # retried on the next sensor update
+            LOGGER.warning(f'Surplus following could not update every terminal: {results}')
+            self._last_write = None
+
+    @callback
+    def _async_cancel_retry(self) -> None:
+        if self._unsub_retry is not None:
+            self._unsub_retry()
+            self._unsub_retry = None
@@ -0,0 +1,83 @@
+"""
+EVduty charging stations telemetry
+"""
+from array import array
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from evdutyapi import ChargingSession
+
+TELEMETRY_SIZE = 240
+
+
+class TelemetrySample(NamedTuple):
+    timestamp: float
+    power: float
+    amp: float
+    volt: float
+    energy: float
+
+
+class TerminalTelemetry:
+    # one array per value, grown up to the size then the oldest sample is overwritten
+    __slots__ = ('size', '_count', '_next', '_timestamps', '_power', '_amp', '_volt', '_energy')
+
+    def __init__(self, size: int = TELEMETRY_SIZE) -> None:
+        self.size = size
+        self._count = 0
+        self._next = 0
+        self._timestamps = array('d')
+        self._power = array('d')
+        self._amp = array('d')
+        self._volt = array('d')
+        self._energy = array('d')
+
+    def append(self, timestamp: float, session: ChargingSession) -> None:
+        index = self._next
+        if self._count < self.size:
+            self._timestamps.append(timestamp)
+            self._power.append(session.power)
+            self._amp.append(session.amp)
+            self._volt.append(session.volt)
+            self._energy.append(session.energy_consumed)
+            self._count += 1
+        else:
+            self._timestamps[index] = timestamp
+            self._power[index] = session.power
+            self._amp[index] = session.amp
+            self._volt[index] = session.volt
+            self._energy[index] = session.energy_consumed
+        self._next = (index + 1) % self.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> TelemetrySample:
+        # 0 is the oldest sample, -1 the latest
+        if not -self._count <= index < self._count:
+            raise IndexError('telemetry index out of range')
+        index = self._position(index % self._count)
+        return TelemetrySample(self._timestamps[index], self._power[index], self._amp[index], self._volt[index], self._energy[index])
+
+    def __iter__(self) -> Iterator[TelemetrySample]:
+        return (self[index] for index in range(self._count))
+
+    def latest(self) -> TelemetrySample | None:
+        return self[-1] if self._count else None
+
+    def window(self, seconds: float) -> list[TelemetrySample]:
+        # samples of the last seconds before the latest one, oldest first, the first one is found by bisecting the timestamps
+        if not self._count:
+            return []
+        since = self._timestamps[self._position(self._count - 1)] - seconds
+        low, high = 0, self._count - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[self._position(middle)] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return [self[index] for index in range(low, self._count)]
+
+    def _position(self, index: int) -> int:
+        return (self._next - self._count + index) % self.size
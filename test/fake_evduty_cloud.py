@@ -0,0 +1,180 @@
+"""
+Local imitation of the EVduty cloud endpoints used by evdutyapi, to exercise the real HTTP path offline
+
+    python3 -m test.fake_evduty_cloud --terminals 1000 --latency 0.2 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import random
+import secrets
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+USERNAME = 'user@example.com'
+PASSWORD = 'password'
+
+
+@dataclass
+class FakeTerminal:
+    id: str
+    station_id: str
+    name: str
+    status: str = 'available'
+    amperage: int = 48
+    charging_rate: int | None = None
+    power: int = 0
+    energy_consumed: float = 0
+    charge_start_date: float = field(default_factory=lambda: datetime(2024, 1, 1).timestamp())
+    cost_local: float | None = 0.1
+
+    def charge(self, power: int = 7200, energy_consumed: float = 0) -> None:
+        self.status = 'inUse'
+        self.power = power
+        self.energy_consumed = energy_consumed
+
+    def terminal_json(self) -> dict:
+        return {'id': self.id, 'name': self.name, 'status': self.status, 'chargeBoxIdentity': 'fake', 'firmwareVersion': '1.0.0'}
+
+    def details_json(self) -> dict:
+        details = {'id': self.id, 'wifiSSID': 'fake', 'wifiRSSI': -60, 'macAddress': f'mac-{self.id}', 'localIPAddress': '127.0.0.1',
+                   'amperage': self.amperage, 'costLocal': self.cost_local}
+        if self.charging_rate is not None:
+            details['chargingProfile'] = {'chargingRate': self.charging_rate, 'chargingRateUnit': 'A'}
+        return details
+
+    def session_json(self) -> dict | None:
+        if self.status != 'inUse':
+            return None
+        return {'isActive': True, 'isCharging': self.power > 0, 'volt': 240, 'amp': round(self.power / 240), 'power': self.power,
+                'energyConsumed': self.energy_consumed, 'chargeStartDate': self.charge_start_date, 'duration': 600,
+                'station': {'terminal': {'costLocal': self.cost_local}}}
+
+
+class FakeEVDutyCloud:
+    # a new login revokes the previous token, like the EVduty cloud does when an account is used twice at once
+    def __init__(self, username: str = USERNAME, password: str = PASSWORD, token_lifetime: int = 3600) -> None:
+        self.username = username
+        self.password = password
+        self.token_lifetime = token_lifetime
+        self.terminals: dict[str, FakeTerminal] = {}
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.unauthorized_requests = 0
+        self.requests: list[tuple[str, str]] = []
+        self.logins = 0
+        self._token: str | None = None
+        self._server: TestServer | None = None
+        self._random = random.Random(0)
+
+    @property
+    def base_url(self) -> str:
+        return str(self._server.make_url('')).rstrip('/')
+
+    def add_fleet(self, size: int, terminals_per_station: int = 2) -> list[FakeTerminal]:
+        terminals = []
+        for index in range(size):
+            station_id = f'station-{index // terminals_per_station}'
+            terminal = FakeTerminal(id=f'terminal-{index}', station_id=station_id, name=f'Terminal {index}')
+            self.terminals[terminal.id] = terminal
+            terminals.append(terminal)
+        return terminals
+
+    def revoke_token(self) -> None:
+        self._token = None
+
+    async def start(self, port: int | None = None) -> None:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post('/v1/account/login', self._login)
+        app.router.add_get('/v1/account/stations', self._stations)
+        app.router.add_get('/v1/account/stations/{station_id}/terminals/{terminal_id}', self._terminal)
+        app.router.add_put('/v1/account/stations/{station_id}/terminals/{terminal_id}', self._set_terminal)
+        app.router.add_get('/v1/account/stations/{station_id}/terminals/{terminal_id}/session', self._session)
+        self._server = TestServer(app, port=port)
+        await self._server.start_server()
+
+    async def close(self) -> None:
+        await self._server.close()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests.append((request.method, request.path))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return web.Response(status=500)
+        if request.path == '/v1/account/login':
+            return await handler(request)
+
+        if self.unauthorized_requests > 0:
+            self.unauthorized_requests -= 1
+            return web.Response(status=401)
+        if self._token is None or request.headers.get('Authorization') != f'Bearer {self._token}':
+            return web.Response(status=401)
+        return await handler(request)
+
+    async def _login(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body.get('email') != self.username or body.get('password') != self.password:
+            return web.Response(status=400)
+        self.logins += 1
+        self._token = secrets.token_hex(8)
+        return web.json_response({'accessToken': self._token, 'expiresIn': self.token_lifetime})
+
+    async def _stations(self, _: web.Request) -> web.Response:
+        stations: dict[str, list[FakeTerminal]] = {}
+        for terminal in self.terminals.values():
+            stations.setdefault(terminal.station_id, []).append(terminal)
+        return web.json_response([{'id': station_id, 'name': station_id, 'terminals': [terminal.terminal_json() for terminal in terminals]}
+                                  for station_id, terminals in stations.items()])
+
+    async def _terminal(self, request: web.Request) -> web.Response:
+        return web.json_response(self._find_terminal(request).details_json())
+
+    async def _set_terminal(self, request: web.Request) -> web.Response:
+        terminal = self._find_terminal(request)
+        terminal.charging_rate = (await request.json())['chargingProfile']['chargingRate']
+        return web.json_response(terminal.details_json())
+
+    async def _session(self, request: web.Request) -> web.Response:
+        session = self._find_terminal(request).session_json()
+        return web.Response(text='') if session is None else web.json_response(session)
+
+    def _find_terminal(self, request: web.Request) -> FakeTerminal:
+        terminal = self.terminals.get(request.match_info['terminal_id'])
+        if terminal is None or terminal.station_id != request.match_info['station_id']:
+            raise web.HTTPNotFound()
+        return terminal
+
+
+async def async_serve(args: argparse.Namespace) -> None:
+    cloud = FakeEVDutyCloud()
+    cloud.add_fleet(args.terminals)
+    for terminal in list(cloud.terminals.values())[::2]:
+        terminal.charge()
+    cloud.latency = args.latency
+    cloud.error_rate = args.error_rate
+    await cloud.start(args.port)
+    print(f'Fake EVduty cloud serving {args.terminals} terminals on {cloud.base_url} for {USERNAME} / {PASSWORD}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await cloud.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python3 -m test.fake_evduty_cloud', description='Serve a fake EVduty cloud')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--terminals', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to each request')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of requests answering 500')
+    try:
+        asyncio.run(async_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
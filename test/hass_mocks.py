@@ -1,4 +1,4 @@
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry, ConfigEntries
@@ -6,10 +6,12 @@ from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
 from homeassistant.core import HomeAssistant
 
 
-def config_entry_mock(username='u', password='p', id='e'):
+def config_entry_mock(username='u', password='p', id='e', options=None):
     entry = AsyncMock(ConfigEntry)
     entry.entry_id = id
     entry.data = {CONF_USERNAME: username, CONF_PASSWORD: password}
+    entry.options = options or {}
+    entry.pref_disable_polling = False
     entry.state = config_entries.ConfigEntryState.SETUP_IN_PROGRESS
     return entry
 
@@ -17,5 +19,7 @@ def config_entry_mock(username='u', password='p', id='e'):
 def hass_mock():
     hass = AsyncMock(HomeAssistant)
     hass.data = {}
+    hass.loop = MagicMock()
     hass.config_entries = AsyncMock(ConfigEntries)
+    hass.config = MagicMock(components=set())
     return hass
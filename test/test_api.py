@@ -0,0 +1,47 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+from custom_components.evduty.api import async_get_api, async_pool_api
+from custom_components.evduty.const import DATA_APIS
+from test import hass_mocks
+
+
+@patch('custom_components.evduty.api.async_get_clientsession')
+class AsyncGetApiTest(TestCase):
+
+    def test_share_client_of_an_account_once_pooled(self, async_get_clientsession):
+        hass = hass_mocks.hass_mock()
+
+        api = async_pool_api(hass, async_get_api(hass, 'user@example.com', 'password'))
+
+        self.assertIs(async_get_api(hass, 'user@example.com', 'password'), api)
+        self.assertIs(hass.data[DATA_APIS]['user@example.com'], api)
+        self.assertIs(api.session, async_get_clientsession.return_value)
+        async_get_clientsession.assert_called_once_with(hass)
+
+    def test_keep_one_client_per_account(self, _):
+        hass = hass_mocks.hass_mock()
+
+        self.assertIsNot(async_pool_api(hass, async_get_api(hass, 'user@example.com', 'password')),
+                         async_pool_api(hass, async_get_api(hass, 'other@example.com', 'password')))
+
+    def test_do_not_pool_client_before_login(self, _):
+        hass = hass_mocks.hass_mock()
+
+        async_get_api(hass, 'user@example.com', 'password')
+
+        self.assertNotIn('user@example.com', hass.data.get(DATA_APIS, {}))
+
+    def test_update_pooled_client_when_credentials_changed(self, _):
+        hass = hass_mocks.hass_mock()
+        api = async_pool_api(hass, async_get_api(hass, 'user@example.com', 'password'))
+        new_api = async_get_api(hass, 'User@example.com', 'new-password')
+        new_api.headers['Authorization'] = 'Bearer new-token'
+        new_api.expires_at = datetime(2024, 1, 1)
+
+        self.assertIsNot(new_api, api)
+        self.assertIs(async_pool_api(hass, new_api), api)
+        self.assertEqual((api.username, api.password, api.headers['Authorization'], api.expires_at),
+                         ('User@example.com', 'new-password', 'Bearer new-token', datetime(2024, 1, 1)))
+        self.assertIs(hass.data[DATA_APIS]['user@example.com'], api)
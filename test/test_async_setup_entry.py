@@ -3,7 +3,11 @@ from unittest.mock import patch, AsyncMock, MagicMock
 
 from aiohttp import ClientSession
 
-from custom_components.evduty import async_setup_entry, PLATFORMS, DOMAIN, EVDutyCoordinator
+from custom_components.evduty import async_setup, async_setup_entry, async_unload_entry, async_remove_config_entry_device, PLATFORMS, DOMAIN, EVDutyCoordinator
+from custom_components.evduty.api import async_get_api, async_pool_api
+from custom_components.evduty.const import CONF_SITE_CURRENT_LIMIT, CONF_SURPLUS_ENTITY, DATA_APIS, CONF_SURPLUS_WRITE_INTERVAL, DATA_CHARGING_PLANNERS, DATA_CIRCUIT_BREAKERS, DATA_REQUEST_SCHEDULERS, DATA_POLL_SCHEDULER
+from custom_components.evduty.services import SERVICE_SET_MAX_CURRENT, SERVICE_PLAN_CHARGING, SERVICE_CLEAR_CHARGING_PLAN
+from custom_components.evduty.statistics import EVDutySessionStatistics
 from test import hass_mocks
 
 
@@ -11,8 +15,33 @@ from test import hass_mocks
 # https://developers.home-assistant.io/docs/integration_fetching_data/#coordinated-single-api-poll-for-data-for-all-entities
 class AsyncSetupEntryTest(IsolatedAsyncioTestCase):
 
-    @patch('custom_components.evduty.EVDutyApi')
-    @patch('custom_components.evduty.async_get_clientsession')
+    def setUp(self):
+        store_patcher = patch('custom_components.evduty.EVDutyStore')
+        self.evduty_store_constructor = store_patcher.start()
+        self.addCleanup(store_patcher.stop)
+        self.evduty_store = AsyncMock()
+        self.evduty_store.restore_token = MagicMock(return_value=False)
+        self.evduty_store.restore_terminals = MagicMock(return_value=None)
+        self.evduty_store.restore_plans = MagicMock(return_value={})
+        # the save methods are callbacks, only loading and removing the store are awaited
+        self.evduty_store.async_save_token = MagicMock()
+        self.evduty_store.async_clear_token = MagicMock()
+        self.evduty_store.async_save_terminals = MagicMock()
+        self.evduty_store.async_save_plans = MagicMock()
+        self.evduty_store_constructor.return_value = self.evduty_store
+
+    async def test_registers_services(self):
+        hass = hass_mocks.hass_mock()
+        hass.services = MagicMock()
+
+        result = await async_setup(hass, {})
+
+        self.assertTrue(result)
+        self.assertEqual([call.args[:2] for call in hass.services.async_register.call_args_list],
+                         [(DOMAIN, SERVICE_SET_MAX_CURRENT), (DOMAIN, SERVICE_PLAN_CHARGING), (DOMAIN, SERVICE_CLEAR_CHARGING_PLAN)])
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
     async def test_creates_api_with_user_credentials(self, async_get_clientsession_constructor, evduty_api_constructor):
         self.evduty_api_mock(evduty_api_constructor)
         async_get_clientsession = self.async_get_client_session_mock(async_get_clientsession_constructor)
@@ -23,8 +52,52 @@ class AsyncSetupEntryTest(IsolatedAsyncioTestCase):
 
         evduty_api_constructor.assert_called_once_with('username', 'password', async_get_clientsession)
 
-    @patch('custom_components.evduty.EVDutyApi')
-    @patch('custom_components.evduty.async_get_clientsession')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_reuses_client_logged_in_by_config_flow(self, async_get_clientsession_constructor, evduty_api_constructor):
+        evduty_api = self.evduty_api_mock(evduty_api_constructor)
+        evduty_api.username, evduty_api.password = 'username', 'password'
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        flow_api = async_pool_api(hass, async_get_api(hass, 'username', 'password'))
+
+        await async_setup_entry(hass=hass, config_entry=hass_mocks.config_entry_mock(username='username', password='password', id='entry'))
+
+        self.assertIs(hass.data[DOMAIN]['entry'].api, flow_api)
+        evduty_api_constructor.assert_called_once()
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_restores_stored_token(self, async_get_clientsession_constructor, evduty_api_constructor):
+        evduty_api = self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        entry = hass_mocks.config_entry_mock(id='entry')
+
+        await async_setup_entry(hass=hass, config_entry=entry)
+
+        self.evduty_store_constructor.assert_called_once_with(hass, 'entry')
+        self.evduty_store.async_load.assert_called_once()
+        self.evduty_store.restore_token.assert_called_once_with(evduty_api)
+        self.assertEqual(hass.data[DOMAIN]['entry'].store, self.evduty_store)
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_pools_client_only_with_restored_token(self, async_get_clientsession_constructor, evduty_api_constructor):
+        evduty_api = self.evduty_api_mock(evduty_api_constructor)
+        evduty_api.username = 'username'
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+
+        await async_setup_entry(hass=hass, config_entry=hass_mocks.config_entry_mock(id='entry-1'))
+        self.assertNotIn('username', hass.data.get(DATA_APIS, {}))
+
+        self.evduty_store.restore_token.return_value = True
+        await async_setup_entry(hass=hass, config_entry=hass_mocks.config_entry_mock(id='entry-2'))
+        self.assertIs(hass.data[DATA_APIS]['username'], evduty_api)
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
     async def test_forwards_entries(self, async_get_clientsession_constructor, evduty_api_constructor):
         self.evduty_api_mock(evduty_api_constructor)
         self.async_get_client_session_mock(async_get_clientsession_constructor)
@@ -35,8 +108,8 @@ class AsyncSetupEntryTest(IsolatedAsyncioTestCase):
 
         hass.config_entries.async_forward_entry_setups.assert_called_once_with(config_entry, PLATFORMS)
 
-    @patch('custom_components.evduty.EVDutyApi')
-    @patch('custom_components.evduty.async_get_clientsession')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
     async def test_starts_the_coordinator(self, async_get_clientsession_constructor, evduty_api_constructor):
         evduty_api = self.evduty_api_mock(evduty_api_constructor)
         self.async_get_client_session_mock(async_get_clientsession_constructor)
@@ -48,8 +121,224 @@ class AsyncSetupEntryTest(IsolatedAsyncioTestCase):
         self.assertIsInstance(hass.data[DOMAIN]['entry'], EVDutyCoordinator)
         evduty_api.async_get_stations.assert_called_once()
 
-    @patch('custom_components.evduty.EVDutyApi')
-    @patch('custom_components.evduty.async_get_clientsession')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_starts_the_coordinator_from_stored_terminals(self, async_get_clientsession_constructor, evduty_api_constructor):
+        evduty_api = self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        terminals = {'123': MagicMock()}
+        self.evduty_store.restore_terminals.return_value = terminals
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        coordinator = hass.data[DOMAIN]['entry']
+        self.assertEqual(coordinator.data, terminals)
+        self.assertTrue(coordinator.stale)
+        evduty_api.async_get_stations.assert_not_called()
+        config_entry.async_create_background_task.assert_called_once()
+        config_entry.async_create_background_task.call_args.args[1].close()
+        hass.config_entries.async_forward_entry_setups.assert_called_once_with(config_entry, PLATFORMS)
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_keeps_circuit_breaker_across_reloads(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+        circuit_breaker = hass.data[DOMAIN]['entry'].circuit_breaker
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        self.assertIs(hass.data[DOMAIN]['entry'].circuit_breaker, circuit_breaker)
+        self.assertIs(hass.data[DATA_CIRCUIT_BREAKERS]['entry'], circuit_breaker)
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_schedules_requests_per_account(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(username='username', id='entry')
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        self.assertIs(hass.data[DOMAIN]['entry'].scheduler, hass.data[DATA_REQUEST_SCHEDULERS]['username'])
+
+    @patch('custom_components.evduty.dr.async_get')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_removes_devices_of_vanished_terminals(self, async_get_clientsession_constructor, evduty_api_constructor, device_registry_getter):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        device_registry = device_registry_getter.return_value
+        device_registry.async_get_device.return_value = MagicMock(id='device')
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+        coordinator = hass.data[DOMAIN]['entry']
+        coordinator.data = {'1': MagicMock(id='1')}
+        coordinator.async_update_listeners()
+        coordinator.device_infos['1'] = ((), MagicMock())
+
+        coordinator.data = {}
+        coordinator.async_update_listeners()
+
+        device_registry.async_get_device.assert_called_once_with(identifiers={(DOMAIN, '1')})
+        device_registry.async_update_device.assert_called_once_with('device', remove_config_entry_id='entry')
+        self.assertEqual(coordinator.device_infos, {})
+
+    async def test_allows_removing_devices_of_vanished_terminals_only(self):
+        hass = hass_mocks.hass_mock()
+        coordinator = MagicMock(data={'1': MagicMock()})
+        hass.data[DOMAIN] = {'entry': coordinator}
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+
+        self.assertFalse(await async_remove_config_entry_device(hass, config_entry, MagicMock(identifiers={(DOMAIN, '1')})))
+        self.assertFalse(await async_remove_config_entry_device(hass, config_entry, MagicMock(identifiers={(DOMAIN, 'entry')})))
+        self.assertTrue(await async_remove_config_entry_device(hass, config_entry, MagicMock(identifiers={(DOMAIN, '2')})))
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_reloads_only_when_options_changed(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+        async_update_options = config_entry.add_update_listener.call_args.args[0]
+
+        config_entry.data = {'username': 'u', 'password': 'new'}
+        await async_update_options(hass, config_entry)
+        hass.config_entries.async_reload.assert_not_called()
+
+        config_entry.options = {CONF_SITE_CURRENT_LIMIT: 60}
+        await async_update_options(hass, config_entry)
+        hass.config_entries.async_reload.assert_called_once_with('entry')
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_schedules_polls_of_all_accounts(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+
+        await async_setup_entry(hass=hass, config_entry=hass_mocks.config_entry_mock(id='entry-1'))
+        await async_setup_entry(hass=hass, config_entry=hass_mocks.config_entry_mock(id='entry-2'))
+
+        poll_scheduler = hass.data[DATA_POLL_SCHEDULER]
+        self.assertIs(hass.data[DOMAIN]['entry-1'].poll_scheduler, poll_scheduler)
+        self.assertIs(hass.data[DOMAIN]['entry-2'].poll_scheduler, poll_scheduler)
+        self.assertEqual([entry['entry_id'] for entry in poll_scheduler.as_dict(0)['schedule']], ['entry-1', 'entry-2'])
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_imports_session_statistics_only_with_recorder(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+        self.assertIsNone(hass.data[DOMAIN]['entry'].session_statistics)
+
+        hass.config.components.add('recorder')
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+        self.assertIsInstance(hass.data[DOMAIN]['entry'].session_statistics, EVDutySessionStatistics)
+
+    @patch('custom_components.evduty.EVDutyLoadBalancer')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_starts_load_balancing_when_site_limit_set(self, async_get_clientsession_constructor, evduty_api_constructor, load_balancer_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry', options={CONF_SITE_CURRENT_LIMIT: 60})
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        load_balancer_constructor.assert_called_once_with(hass, hass.data[DOMAIN]['entry'], 60, None, 2)
+        config_entry.async_on_unload.assert_any_call(load_balancer_constructor.return_value.async_start.return_value)
+
+    @patch('custom_components.evduty.EVDutyLoadBalancer')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_does_not_start_load_balancing_by_default(self, async_get_clientsession_constructor, evduty_api_constructor, load_balancer_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        load_balancer_constructor.assert_not_called()
+
+    @patch('custom_components.evduty.EVDutySurplusFollower')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_starts_surplus_following_when_surplus_entity_set(self, async_get_clientsession_constructor, evduty_api_constructor, surplus_follower_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry', options={CONF_SURPLUS_ENTITY: 'sensor.grid_export', CONF_SURPLUS_WRITE_INTERVAL: 600})
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        surplus_follower_constructor.assert_called_once_with(hass, hass.data[DOMAIN]['entry'], 'sensor.grid_export', 600, 2, None)
+        config_entry.async_on_unload.assert_any_call(surplus_follower_constructor.return_value.async_start.return_value)
+
+    @patch('custom_components.evduty.EVDutySurplusFollower')
+    @patch('custom_components.evduty.EVDutyLoadBalancer')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_caps_surplus_following_and_charging_plans_by_site_limit(self, async_get_clientsession_constructor, evduty_api_constructor, load_balancer_constructor,
+                                                                           surplus_follower_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(id='entry', options={CONF_SITE_CURRENT_LIMIT: 60, CONF_SURPLUS_ENTITY: 'sensor.grid_export'})
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        self.assertIs(surplus_follower_constructor.call_args.args[-1], load_balancer_constructor.return_value)
+        self.assertIs(hass.data[DATA_CHARGING_PLANNERS]['entry'].load_balancer, load_balancer_constructor.return_value)
+
+    @patch('custom_components.evduty.EVDutySurplusFollower')
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_does_not_follow_surplus_by_default(self, async_get_clientsession_constructor, evduty_api_constructor, surplus_follower_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+
+        await async_setup_entry(hass=hass, config_entry=hass_mocks.config_entry_mock())
+
+        surplus_follower_constructor.assert_not_called()
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_starts_charging_planner(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        hass = hass_mocks.hass_mock()
+        hass.config_entries.async_unload_platforms.return_value = True
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+
+        await async_setup_entry(hass=hass, config_entry=config_entry)
+
+        planner = hass.data[DATA_CHARGING_PLANNERS]['entry']
+        self.assertIs(planner.coordinator, hass.data[DOMAIN]['entry'])
+        self.assertIs(planner.store, self.evduty_store)
+
+        await async_unload_entry(hass, config_entry)
+
+        self.assertEqual(hass.data[DATA_CHARGING_PLANNERS], {})
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
     async def test_returns_true(self, async_get_clientsession_constructor, evduty_api_constructor):
         self.evduty_api_mock(evduty_api_constructor)
         self.async_get_client_session_mock(async_get_clientsession_constructor)
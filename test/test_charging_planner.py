@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta, timezone
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
+
+from evdutyapi import Terminal, ChargingProfile, ChargingSession
+from homeassistant.core import Event, State
+
+from custom_components.evduty import EVDutyCoordinator
+from custom_components.evduty.charging_planner import EVDutyChargingPlanner, plan_slots, plan_setpoints, tariff_price, forecast_prices, plans_to_json, \
+    plans_from_json
+from custom_components.evduty.load_balancer import EVDutyLoadBalancer
+from custom_components.evduty.storage import EVDutyStore
+from test import hass_mocks
+
+NOW = datetime(2024, 1, 1, 20, 0, tzinfo=timezone.utc)
+TARIFF = (('00:00:00', 0.08), ('07:00:00', 0.2), ('21:00:00', 0.08))
+# one hour at 48 A and 240 V
+HOUR_AT_MAX = 48 * 240
+
+
+class PlanTest(IsolatedAsyncioTestCase):
+
+    def test_slots_end_on_quarter_hours(self):
+        self.assertEqual(plan_slots(NOW + timedelta(minutes=10), NOW + timedelta(minutes=40)),
+                         [(NOW + timedelta(minutes=10), NOW + timedelta(minutes=15)),
+                          (NOW + timedelta(minutes=15), NOW + timedelta(minutes=30)),
+                          (NOW + timedelta(minutes=30), NOW + timedelta(minutes=40))])
+
+    def test_charge_at_max_in_cheapest_slots(self):
+        self.assertEqual(plan_setpoints(slots(0.2, 0.2, 0.2, 0.2, 0.08, 0.08, 0.08, 0.08), HOUR_AT_MAX, 48, 240),
+                         ((NOW, 0), (at(1), 48)))
+
+    def test_charge_the_remaining_energy_in_the_next_cheapest_slot(self):
+        self.assertEqual(plan_setpoints(slots(0.2, 0.2, 0.08, 0.08), HOUR_AT_MAX / 2 + HOUR_AT_MAX / 8, 48, 240),
+                         ((NOW, 24), (at(0.25), 0), (at(0.5), 48)))
+
+    def test_charge_at_least_the_minimum_current(self):
+        self.assertEqual(plan_setpoints(slots(0.08, 0.2), 100, 48, 240), ((NOW, 6), (at(0.25), 0)))
+
+    def test_use_slots_with_unknown_price_last(self):
+        self.assertEqual(plan_setpoints(slots(None, 0.5), HOUR_AT_MAX / 4, 48, 240), ((NOW, 0), (at(0.25), 48)))
+
+    def test_charge_every_slot_when_target_not_reachable(self):
+        self.assertEqual(plan_setpoints(slots(0.2, 0.08), HOUR_AT_MAX, 48, 240), ((NOW, 48),))
+
+    def test_tariff_price_applies_until_next_change(self):
+        price_at = tariff_price(TARIFF)
+
+        self.assertEqual(price_at(NOW.replace(hour=6, minute=59)), 0.08)
+        self.assertEqual(price_at(NOW.replace(hour=7)), 0.2)
+        self.assertEqual(price_at(NOW.replace(hour=23)), 0.08)
+        self.assertEqual(tariff_price((('07:00:00', 0.2), ('21:00:00', 0.08)))(NOW.replace(hour=3)), 0.08)
+
+    def test_read_forecast_from_price_sensor_attributes(self):
+        state = State('sensor.price', '0.1', {
+            'unit_of_measurement': '$/kWh',
+            'raw_today': [{'start': '2024-01-01T21:00:00+00:00', 'end': '2024-01-01T21:15:00+00:00', 'value': 0.05},
+                          {'start': NOW, 'value': 0.3},
+                          {'start': 'invalid', 'value': 0.1},
+                          {'value': 0.1}],
+            'prices': [{'start': '2024-01-01T22:00:00+00:00', 'price': '0.04'}],
+        })
+
+        self.assertEqual(forecast_prices(state), [(NOW, at(1), 0.3),
+                                                  (at(1), at(1.25), 0.05),
+                                                  (at(2), at(3), 0.04)])
+        self.assertEqual(forecast_prices(None), [])
+
+
+@patch('custom_components.evduty.charging_planner.async_track_state_change_event')
+@patch('custom_components.evduty.charging_planner.async_track_point_in_utc_time')
+@patch('custom_components.evduty.charging_planner.dt_util.utcnow', return_value=NOW)
+class EVDutyChargingPlannerTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hass = hass_mocks.hass_mock()
+        self.hass.states = Mock()
+        self.hass.async_create_task = MagicMock(side_effect=lambda coroutine, name: coroutine)
+        self.coordinator = Mock(EVDutyCoordinator)
+        self.coordinator.data = {'1': terminal()}
+        self.coordinator.async_set_terminals_max_charging_current = AsyncMock(side_effect=lambda currents: {terminal_id: None for terminal_id in currents})
+        self.store = Mock(EVDutyStore)
+        self.store.restore_plans.return_value = {}
+        self.planner = EVDutyChargingPlanner(self.hass, self.coordinator, self.store)
+
+    async def asyncTearDown(self):
+        await self.written()
+
+    async def test_plan_cheapest_hours_and_pause_until_then(self, _, async_track_point_in_utc_time, __):
+        plan = self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+        await self.written()
+
+        self.assertEqual(plan.setpoints, ((NOW, 0), (at(1), 48), (at(2), 0)))
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 0})
+        async_track_point_in_utc_time.assert_called_once_with(self.hass, self.planner.async_apply, at(1))
+        self.store.async_save_plans.assert_called_once_with(plans_to_json({'1': plan}))
+
+    async def test_plan_only_the_energy_left_in_the_session(self, _, __, ___):
+        self.coordinator.data = {'1': terminal(energy_consumed=HOUR_AT_MAX / 2)}
+
+        plan = self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+
+        self.assertEqual(plan.setpoints, ((NOW, 0), (at(1), 48), (at(1.5), 0)))
+
+    async def test_never_exceed_share_of_site_limit(self, utcnow, _, __):
+        self.planner.load_balancer = Mock(EVDutyLoadBalancer)
+        self.planner.load_balancer.async_cap.side_effect = lambda currents: {terminal_id: min(current, 24) for terminal_id, current in currents.items()}
+        self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+        await self.written()
+        self.coordinator.data = {'1': terminal(current_limit=0)}
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+        utcnow.return_value = at(1)
+        self.planner.async_apply()
+        await self.written()
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 24})
+
+    async def test_write_setpoints_only_at_slot_boundaries_that_change_them(self, utcnow, async_track_point_in_utc_time, _):
+        self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+        await self.written()
+        self.coordinator.data = {'1': terminal(current_limit=0)}
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+        utcnow.return_value = at(1)
+        self.planner.async_apply()
+        await self.written()
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 48})
+        async_track_point_in_utc_time.assert_called_with(self.hass, self.planner.async_apply, at(2))
+
+    async def test_restore_max_current_at_departure(self, utcnow, async_track_point_in_utc_time, _):
+        self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+        await self.written()
+        self.coordinator.data = {'1': terminal(current_limit=0)}
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+        async_track_point_in_utc_time.reset_mock()
+
+        utcnow.return_value = at(3)
+        self.planner.async_apply()
+        await self.written()
+
+        self.assertEqual(self.planner.plans, {})
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 48})
+        self.store.async_save_plans.assert_called_with({})
+        async_track_point_in_utc_time.assert_not_called()
+
+    async def test_clear_plan_restores_max_current(self, _, __, ___):
+        self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+        await self.written()
+        self.coordinator.data = {'1': terminal(current_limit=0)}
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+        self.assertTrue(self.planner.async_clear_plan('1'))
+        await self.written()
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 48})
+        self.assertFalse(self.planner.async_clear_plan('1'))
+
+    async def test_replan_only_when_prices_change(self, _, __, async_track_state_change_event):
+        self.hass.states.get.return_value = price_state(0.2, 0.08, 0.2)
+        plan = self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), price_entity='sensor.price')
+        async_track_state_change_event.assert_called_once_with(self.hass, ['sensor.price'], self.planner._async_prices_changed)
+
+        self.planner._async_prices_changed(price_event(price_state(0.2, 0.08, 0.2)))
+        self.planner._async_prices_changed(price_event(State('sensor.price', 'unavailable')))
+        self.assertIs(self.planner.plans['1'], plan)
+
+        self.hass.states.get.return_value = price_state(0.2, 0.2, 0.08)
+        self.planner._async_prices_changed(price_event(price_state(0.2, 0.2, 0.08)))
+        self.assertEqual(self.planner.plans['1'].setpoints, ((NOW, 0), (at(2), 48)))
+
+    async def test_restore_stored_plans_on_start(self, _, async_track_point_in_utc_time, __):
+        plan = self.planner.async_set_plan('1', HOUR_AT_MAX / 1000, at(3), TARIFF)
+        self.store.restore_plans.return_value = plans_to_json({'1': plan})
+        planner = EVDutyChargingPlanner(self.hass, self.coordinator, self.store)
+        async_track_point_in_utc_time.reset_mock()
+
+        stop = planner.async_start()
+
+        self.assertEqual(planner.plans, {'1': plan})
+        async_track_point_in_utc_time.assert_called_once_with(self.hass, planner.async_apply, at(1))
+        stop()
+        async_track_point_in_utc_time.return_value.assert_called_once()
+
+    def test_ignore_invalid_stored_plans(self, _, __, ___):
+        self.assertEqual(plans_from_json({'1': {'energy': 10}}), {})
+
+    async def written(self):
+        for call in self.hass.async_create_task.call_args_list:
+            await call.args[0]
+        self.hass.async_create_task.reset_mock()
+
+
+def slots(*prices):
+    return [(at(index / 4), at((index + 1) / 4), price) for index, price in enumerate(prices)]
+
+
+def at(hours):
+    return NOW + timedelta(hours=hours)
+
+
+def terminal(current_limit=48, energy_consumed=0):
+    terminal = Mock(Terminal)
+    terminal.id = '1'
+    terminal.charging_profile = ChargingProfile(power_limitation=True, current_limit=current_limit, current_max=48)
+    terminal.session = ChargingSession(is_active=energy_consumed > 0, is_charging=False, volt=240, amp=0, power=0, energy_consumed=energy_consumed,
+                                       start_date=NOW, duration=timedelta(), cost=0)
+    return terminal
+
+
+def price_state(*hourly_prices):
+    return State('sensor.price', str(hourly_prices[0]), {'prices': [{'start': at(hour).isoformat(), 'price': price} for hour, price in enumerate(hourly_prices)]})
+
+
+def price_event(state):
+    return Event('state_changed', {'entity_id': 'sensor.price', 'old_state': None, 'new_state': state})
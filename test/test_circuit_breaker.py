@@ -0,0 +1,77 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from custom_components.evduty.circuit_breaker import CircuitBreaker, CircuitState
+
+
+@patch('custom_components.evduty.circuit_breaker.uniform', side_effect=lambda low, high: high)
+@patch('custom_components.evduty.circuit_breaker.monotonic', return_value=1000)
+class CircuitBreakerTest(TestCase):
+
+    def test_stay_closed_below_failure_threshold(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=2)
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitState.closed)
+        self.assertTrue(breaker.allow_request())
+
+    def test_open_after_consecutive_failures(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=2, base_delay=30)
+
+        breaker.record_failure()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitState.open)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.retry_in, 30)
+
+    def test_jitter_delay(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=1, base_delay=30)
+
+        breaker.record_failure()
+
+        uniform.assert_called_once_with(15, 30)
+
+    def test_let_a_single_probe_through_once_delay_passed(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=1, base_delay=30)
+        breaker.record_failure()
+
+        monotonic.return_value = 1030
+
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitState.half_open)
+        self.assertFalse(breaker.allow_request())
+
+    def test_close_when_probe_succeeds(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=1, base_delay=30)
+        breaker.record_failure()
+        monotonic.return_value = 1030
+        breaker.allow_request()
+
+        breaker.record_success()
+
+        self.assertEqual(breaker.state, CircuitState.closed)
+        self.assertEqual(breaker.failures, 0)
+        self.assertTrue(breaker.allow_request())
+
+    def test_double_delay_when_probe_fails_up_to_max_delay(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=1, base_delay=30, max_delay=100)
+        delays = []
+        for _ in range(4):
+            breaker.record_failure()
+            delays.append(breaker.retry_in)
+            monotonic.return_value += breaker.retry_in
+            breaker.allow_request()
+
+        self.assertEqual(delays, [30, 60, 100, 100])
+
+    def test_probe_again_when_probe_cancelled(self, monotonic, uniform):
+        breaker = CircuitBreaker(failure_threshold=1, base_delay=30)
+        breaker.record_failure()
+        monotonic.return_value = 1030
+        breaker.allow_request()
+
+        breaker.release()
+
+        self.assertTrue(breaker.allow_request())
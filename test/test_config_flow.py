@@ -13,17 +13,21 @@ from homeassistant.data_entry_flow import FlowResultType
 from homeassistant.loader import DATA_PRELOAD_PLATFORMS, DATA_MISSING_PLATFORMS, DATA_INTEGRATIONS, DATA_COMPONENTS
 
 from custom_components.evduty import DOMAIN
+from custom_components.evduty.config_flow import EVDutyConfigFlow, EVDutyOptionsFlow
+from custom_components.evduty.const import CONF_CHARGING_INTERVAL, CONF_IDLE_INTERVAL, CONF_MAX_IDLE_INTERVAL, CONF_NETWORK_INTERVAL, CONF_SITE_CURRENT_LIMIT, \
+    CONF_LOAD_BALANCING_THRESHOLD, CONF_SURPLUS_WRITE_INTERVAL, CONF_ENERGY_ESTIMATE_INTERVAL, CONF_LOCAL_SESSION_DURATION
+from test import hass_mocks
 
 
 class ConfigFlowTest(IsolatedAsyncioTestCase):
 
-    @patch('custom_components.evduty.config_flow.EVDutyApi')
+    @patch('custom_components.evduty.api.EVDutyApi')
     @patch('custom_components.evduty.async_setup_entry')
-    @patch('custom_components.evduty.config_flow.async_create_clientsession')
-    async def test_form_authentication_success(self, async_create_clientsession_constructor, async_setup_entry,
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_form_authentication_success(self, async_get_clientsession_constructor, async_setup_entry,
                                                evduty_api_constructor):
         evduty_api = self.evduty_api_mock(evduty_api_constructor)
-        async_create_clientsession = self.async_create_client_session_mock(async_create_clientsession_constructor)
+        async_get_clientsession = self.async_get_client_session_mock(async_get_clientsession_constructor)
         async_setup_entry.return_value = True
         hass = self.hass_setup()
 
@@ -45,7 +49,7 @@ class ConfigFlowTest(IsolatedAsyncioTestCase):
         self.assertEqual(result['data'], {CONF_USERNAME: 'test-username', CONF_PASSWORD: 'test-password'})
 
         # api auth called
-        evduty_api_constructor.assert_called_once_with('test-username', 'test-password', async_create_clientsession)
+        evduty_api_constructor.assert_called_once_with('test-username', 'test-password', async_get_clientsession)
         evduty_api.async_authenticate.assert_called_once_with()
 
         # entry setup called
@@ -61,11 +65,11 @@ class ConfigFlowTest(IsolatedAsyncioTestCase):
         # show form
         self.assertEqual(result['type'], FlowResultType.FORM)
 
-    @patch('custom_components.evduty.config_flow.EVDutyApi')
-    @patch('custom_components.evduty.config_flow.async_create_clientsession')
-    async def test_form_authentication_error(self, async_create_clientsession_constructor, evduty_api_constructor):
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_form_authentication_error(self, async_get_clientsession_constructor, evduty_api_constructor):
         self.evduty_api_mock(evduty_api_constructor, auth_success=False)
-        self.async_create_client_session_mock(async_create_clientsession_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
         hass = self.hass_setup()
 
         result = await hass.config_entries.flow.async_init(DOMAIN, context={'source': config_entries.SOURCE_USER})
@@ -77,14 +81,14 @@ class ConfigFlowTest(IsolatedAsyncioTestCase):
         self.assertEqual(result['type'], FlowResultType.FORM)
         self.assertEqual(result['errors'], {"base": "invalid_auth"})
 
-    @patch('custom_components.evduty.config_flow.EVDutyApi')
+    @patch('custom_components.evduty.api.EVDutyApi')
     @patch('custom_components.evduty.async_setup_entry')
-    @patch('custom_components.evduty.config_flow.async_create_clientsession')
+    @patch('custom_components.evduty.api.async_get_clientsession')
     @unittest.skip("Re-auth flow changed")
-    async def test_form_re_authentication_success(self, async_create_clientsession_constructor, async_setup_entry,
+    async def test_form_re_authentication_success(self, async_get_clientsession_constructor, async_setup_entry,
                                                   evduty_api_constructor):
         evduty_api = self.evduty_api_mock(evduty_api_constructor)
-        async_create_clientsession = self.async_create_client_session_mock(async_create_clientsession_constructor)
+        async_get_clientsession = self.async_get_client_session_mock(async_get_clientsession_constructor)
         async_setup_entry.return_value = True
         hass = self.hass_setup()
 
@@ -94,12 +98,92 @@ class ConfigFlowTest(IsolatedAsyncioTestCase):
                                                                                     CONF_PASSWORD: 'test-password-new'})
         await hass.async_block_till_done()
 
-        evduty_api_constructor.assert_called_once_with('test-username', 'test-password-new', async_create_clientsession)
+        evduty_api_constructor.assert_called_once_with('test-username', 'test-password-new', async_get_clientsession)
         evduty_api.async_authenticate.assert_called_once()
 
         self.assertEqual(result['type'], FlowResultType.CREATE_ENTRY)
         self.assertEqual(result['context'], {'source': 'reauth', 'entry_id': 'evduty-id', 'unique_id': 'test-username'})
 
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_re_authentication_updates_running_coordinator(self, async_get_clientsession_constructor, evduty_api_constructor):
+        evduty_api = self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        entry = hass_mocks.config_entry_mock(username='test-username', id='evduty-id')
+        entry.state = config_entries.ConfigEntryState.LOADED
+        coordinator = MagicMock()
+        coordinator.api.username = 'test-username'
+        flow = self.reauth_flow_setup(entry, coordinator)
+
+        result = await flow.async_step_reauth({CONF_USERNAME: 'test-username', CONF_PASSWORD: 'test-password-new'})
+
+        self.assertEqual(result['type'], FlowResultType.ABORT)
+        self.assertEqual(result['reason'], 'reauth_successful')
+        coordinator.async_update_credentials.assert_called_once_with(evduty_api)
+        flow.hass.config_entries.async_update_entry.assert_called_once_with(entry, data={CONF_USERNAME: 'test-username', CONF_PASSWORD: 'test-password-new'})
+        flow.hass.config_entries.async_reload.assert_not_called()
+
+    @patch('custom_components.evduty.api.EVDutyApi')
+    @patch('custom_components.evduty.api.async_get_clientsession')
+    async def test_re_authentication_reloads_entry_not_loaded(self, async_get_clientsession_constructor, evduty_api_constructor):
+        self.evduty_api_mock(evduty_api_constructor)
+        self.async_get_client_session_mock(async_get_clientsession_constructor)
+        entry = hass_mocks.config_entry_mock(username='test-username', id='evduty-id')
+        entry.state = config_entries.ConfigEntryState.SETUP_ERROR
+        coordinator = MagicMock()
+        flow = self.reauth_flow_setup(entry, coordinator)
+
+        result = await flow.async_step_reauth({CONF_USERNAME: 'test-username', CONF_PASSWORD: 'test-password-new'})
+
+        self.assertEqual(result['reason'], 'reauth_successful')
+        coordinator.async_update_credentials.assert_not_called()
+        flow.hass.config_entries.async_reload.assert_called_once_with('evduty-id')
+
+    async def test_options_form_shows_current_intervals(self):
+        entry = hass_mocks.config_entry_mock(options={CONF_CHARGING_INTERVAL: 10, CONF_IDLE_INTERVAL: 30, CONF_MAX_IDLE_INTERVAL: 90})
+        flow = self.options_flow_setup(entry)
+
+        result = await flow.async_step_init()
+
+        self.assertEqual(result['type'], FlowResultType.FORM)
+        self.assertEqual(result['data_schema']({}), {CONF_CHARGING_INTERVAL: 10, CONF_IDLE_INTERVAL: 30, CONF_MAX_IDLE_INTERVAL: 90,
+                                                    CONF_NETWORK_INTERVAL: 3600, CONF_SITE_CURRENT_LIMIT: 0, CONF_LOAD_BALANCING_THRESHOLD: 2, CONF_SURPLUS_WRITE_INTERVAL: 300,
+                                                    CONF_ENERGY_ESTIMATE_INTERVAL: 0,
+                                                    CONF_LOCAL_SESSION_DURATION: False})
+
+    async def test_options_saved(self):
+        entry = hass_mocks.config_entry_mock()
+        flow = self.options_flow_setup(entry)
+
+        result = await flow.async_step_init({CONF_CHARGING_INTERVAL: 10, CONF_IDLE_INTERVAL: 30, CONF_MAX_IDLE_INTERVAL: 90})
+
+        self.assertEqual(result['type'], FlowResultType.CREATE_ENTRY)
+        self.assertEqual(result['data'], {CONF_CHARGING_INTERVAL: 10, CONF_IDLE_INTERVAL: 30, CONF_MAX_IDLE_INTERVAL: 90})
+
+    @staticmethod
+    def options_flow_setup(entry):
+        hass = hass_mocks.hass_mock()
+        hass.config_entries.async_get_known_entry.return_value = entry
+        flow = EVDutyOptionsFlow()
+        flow.hass = hass
+        flow.handler = entry.entry_id
+        flow.flow_id = 'flow'
+        return flow
+
+    @staticmethod
+    def reauth_flow_setup(entry, coordinator):
+        hass = hass_mocks.hass_mock()
+        hass.data[DOMAIN] = {entry.entry_id: coordinator}
+        hass.config_entries.async_get_entry = MagicMock(return_value=entry)
+        hass.config_entries.async_update_entry = MagicMock()
+        hass.config_entries.flow = MagicMock()
+        flow = EVDutyConfigFlow()
+        flow.hass = hass
+        flow.handler = DOMAIN
+        flow.flow_id = 'flow'
+        flow.context = {'source': config_entries.SOURCE_REAUTH, 'entry_id': entry.entry_id}
+        return flow
+
     @staticmethod
     def hass_setup():
         hass = HomeAssistant(".")
@@ -130,8 +214,8 @@ class ConfigFlowTest(IsolatedAsyncioTestCase):
         return evduty_api
 
     @staticmethod
-    def async_create_client_session_mock(async_create_clientsession_constructor):
-        async_create_clientsession = MagicMock()
-        async_create_clientsession_constructor.return_value = async_create_clientsession
-        async_create_clientsession.return_value = AsyncMock(ClientSession)
-        return async_create_clientsession
+    def async_get_client_session_mock(async_get_clientsession_constructor):
+        async_get_clientsession = MagicMock()
+        async_get_clientsession_constructor.return_value = async_get_clientsession
+        async_get_clientsession.return_value = AsyncMock(ClientSession)
+        return async_get_clientsession
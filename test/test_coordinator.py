@@ -1,12 +1,19 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
 from unittest import IsolatedAsyncioTestCase
-from unittest.mock import Mock, AsyncMock
+from unittest.mock import Mock, AsyncMock, patch
 
-from evdutyapi import EVDutyApi, Station, Terminal, EVDutyApiInvalidCredentialsError, EVDutyApiError
+from evdutyapi import EVDutyApi, Station, Terminal, ChargingStatus, ChargingSession, NetworkInfo, EVDutyApiInvalidCredentialsError, EVDutyApiError
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.update_coordinator import UpdateFailed
 
 from custom_components.evduty import EVDutyCoordinator, DOMAIN
+from custom_components.evduty.circuit_breaker import CircuitBreaker, CircuitState
+from custom_components.evduty.storage import EVDutyStore
+from custom_components.evduty.const import CONF_CHARGING_INTERVAL, CONF_IDLE_INTERVAL, CONF_MAX_IDLE_INTERVAL, CONF_NETWORK_INTERVAL
+from custom_components.evduty.coordinator import SLOW_TIER
+from custom_components.evduty.poll_scheduler import EVDutyPollScheduler
+from custom_components.evduty.statistics import EVDutySessionStatistics
 from test import hass_mocks
 
 
@@ -29,6 +36,227 @@ class TestEVDutyCoordinator(IsolatedAsyncioTestCase):
 
         self.assertEqual(coordinator.update_interval, timedelta(seconds=60))
 
+    async def test_notify_listeners_only_when_data_changed(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+
+        self.assertFalse(coordinator.always_update)
+
+    async def test_notify_only_listeners_of_changed_terminals(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1'), '2': self.terminal('2')})
+        listener_1, listener_2, listener = Mock(), Mock(), Mock()
+        coordinator.async_add_listener(listener_1, '1')
+        coordinator.async_add_listener(listener_2, '2')
+        coordinator.async_add_listener(listener)
+
+        coordinator.data = {'1': self.terminal('1'), '2': self.terminal('2', status=ChargingStatus.in_use)}
+        coordinator.async_update_listeners()
+
+        listener_1.assert_not_called()
+        listener_2.assert_called_once()
+        listener.assert_called_once()
+
+    async def test_notify_slow_tier_listeners_only_when_network_or_device_changed(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1')})
+        fast_listener, slow_listener = Mock(), Mock()
+        coordinator.async_add_listener(fast_listener, '1')
+        coordinator.async_add_listener(slow_listener, ('1', SLOW_TIER))
+
+        coordinator.data = {'1': self.terminal('1', status=ChargingStatus.in_use)}
+        coordinator.async_update_listeners()
+        fast_listener.assert_called_once()
+        slow_listener.assert_not_called()
+
+        coordinator.data = {'1': self.terminal('1', status=ChargingStatus.in_use, network_info=self.network_info(wifi_rssi=-80))}
+        coordinator.async_update_listeners()
+        fast_listener.assert_called_once()
+        slow_listener.assert_called_once()
+
+    async def test_notify_listeners_of_vanished_terminals(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1'), '2': self.terminal('2')})
+        listener_1, listener_2, slow_listener_2 = Mock(), Mock(), Mock()
+        coordinator.async_add_listener(listener_1, '1')
+        coordinator.async_add_listener(listener_2, '2')
+        coordinator.async_add_listener(slow_listener_2, ('2', SLOW_TIER))
+
+        coordinator.data = {'1': self.terminal('1')}
+        coordinator.async_update_listeners()
+
+        listener_1.assert_not_called()
+        listener_2.assert_called_once()
+        slow_listener_2.assert_called_once()
+
+    async def test_notify_all_listeners_when_update_success_changed(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1'), '2': self.terminal('2')})
+        listener_1, listener_2 = Mock(), Mock()
+        coordinator.async_add_listener(listener_1, '1')
+        coordinator.async_add_listener(listener_2, '2')
+
+        coordinator.last_update_success = False
+        coordinator.async_update_listeners()
+
+        listener_1.assert_called_once()
+        listener_2.assert_called_once()
+
+    async def test_removed_terminal_listener_is_not_notified(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1')})
+        listener = Mock()
+        remove_listener = coordinator.async_add_listener(listener, '1')
+
+        remove_listener()
+        coordinator.data = {'1': self.terminal('1', status=ChargingStatus.in_use)}
+        coordinator.async_update_listeners()
+
+        listener.assert_not_called()
+
+    async def test_notify_terminals_listeners_of_added_and_removed_terminals(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1'), '2': self.terminal('2')})
+        terminals_listener = Mock()
+        coordinator.async_add_terminals_listener(terminals_listener)
+
+        coordinator.data = {'1': self.terminal('1', status=ChargingStatus.in_use)}
+        coordinator.async_update_listeners()
+        terminals_listener.assert_called_once_with([], ['2'])
+
+        coordinator.data = {'1': self.terminal('1'), '3': self.terminal('3')}
+        coordinator.async_update_listeners()
+        terminals_listener.assert_called_with([self.terminal('3')], [])
+        self.assertEqual(terminals_listener.call_count, 2)
+
+    async def test_removed_terminals_listener_is_not_notified(self):
+        coordinator = self.coordinator_with_data({'1': self.terminal('1')})
+        terminals_listener = Mock()
+        remove_listener = coordinator.async_add_terminals_listener(terminals_listener)
+
+        remove_listener()
+        coordinator.data = {'2': self.terminal('2')}
+        coordinator.async_update_listeners()
+
+        terminals_listener.assert_not_called()
+
+    async def test_hold_network_info_and_firmware_between_slow_refreshes(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(options={CONF_NETWORK_INTERVAL: 3600})
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+
+        with patch('custom_components.evduty.coordinator.monotonic', return_value=1000):
+            coordinator.data = await self.refresh(coordinator, self.terminal('1'))
+
+        with patch('custom_components.evduty.coordinator.monotonic', return_value=4000):
+            coordinator.data = await self.refresh(coordinator, self.terminal('1', status=ChargingStatus.in_use, firmware_version='2.0.0',
+                                                                              network_info=self.network_info(wifi_rssi=-80)))
+        self.assertEqual(coordinator.data['1'].status, ChargingStatus.in_use)
+        self.assertEqual(coordinator.data['1'].firmware_version, '1.0.0')
+        self.assertEqual(coordinator.data['1'].network_info, self.network_info())
+
+        with patch('custom_components.evduty.coordinator.monotonic', return_value=4600):
+            coordinator.data = await self.refresh(coordinator, self.terminal('1', status=ChargingStatus.in_use, firmware_version='2.0.0',
+                                                                              network_info=self.network_info(wifi_rssi=-80)))
+        self.assertEqual(coordinator.data['1'].firmware_version, '2.0.0')
+        self.assertEqual(coordinator.data['1'].network_info, self.network_info(wifi_rssi=-80))
+
+    async def test_new_terminals_get_their_network_info_before_the_slow_refresh(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+        coordinator.data = await self.refresh(coordinator, self.terminal('1'))
+
+        coordinator.data = await self.refresh(coordinator, self.terminal('1'), self.terminal('2', network_info=self.network_info(wifi_ssid='other')))
+
+        self.assertEqual(coordinator.data['2'].network_info.wifi_ssid, 'other')
+
+    async def test_schedule_refresh_on_account_slot(self):
+        hass = hass_mocks.hass_mock()
+        hass.loop.time.return_value = 1000
+        hass.is_stopping = False
+        config_entry = hass_mocks.config_entry_mock(id='entry')
+        poll_scheduler = EVDutyPollScheduler()
+        poll_scheduler.next_refresh = Mock(return_value=1045)
+        config_entry.async_create_background_task = Mock()
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=Mock(EVDutyApi), poll_scheduler=poll_scheduler)
+        station = Mock(Station)
+        station.terminals = [self.terminal('1')]
+        coordinator.api.async_get_stations = AsyncMock(return_value=[station])
+
+        coordinator.async_add_listener(Mock())
+
+        poll_scheduler.next_refresh.assert_called_once_with('entry', 1000, 60)
+        when, scheduled_refresh = hass.loop.call_at.call_args.args
+        self.assertEqual(when, 1045)
+
+        scheduled_refresh()
+        await config_entry.async_create_background_task.call_args.args[1]
+
+        coordinator.api.async_get_stations.assert_awaited_once()
+        self.assertEqual(coordinator.data, {'1': self.terminal('1')})
+
+    async def test_resume_polling_with_reauthenticated_credentials(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = EVDutyApi('user', 'old-password', Mock())
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+        reauthenticated_api = EVDutyApi('user', 'new-password', Mock())
+        reauthenticated_api.headers['Authorization'] = 'Bearer token'
+        reauthenticated_api.expires_at = datetime(2030, 1, 1)
+
+        coordinator.async_update_credentials(reauthenticated_api)
+
+        self.assertIs(coordinator.api, api)
+        self.assertEqual(api.password, 'new-password')
+        self.assertEqual(api.headers['Authorization'], 'Bearer token')
+        self.assertEqual(api.expires_at, datetime(2030, 1, 1))
+        config_entry.async_create_background_task.assert_called_once()
+        config_entry.async_create_background_task.call_args.args[1].close()
+
+    async def test_refresh_data_every_15_seconds_while_charging(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+        api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.available, ChargingStatus.in_use)])
+
+        await coordinator._async_update_data()
+
+        self.assertEqual(coordinator.update_interval, timedelta(seconds=15))
+
+    async def test_back_off_refresh_interval_while_idle(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+        api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.in_use)])
+        await coordinator._async_update_data()
+
+        api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.available, ChargingStatus.out_of_service)])
+        intervals = []
+        for _ in range(5):
+            await coordinator._async_update_data()
+            intervals.append(coordinator.update_interval.total_seconds())
+
+        self.assertEqual(intervals, [60, 120, 240, 300, 300])
+
+    async def test_refresh_data_using_configured_intervals(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock(options={CONF_CHARGING_INTERVAL: 10, CONF_IDLE_INTERVAL: 30, CONF_MAX_IDLE_INTERVAL: 90})
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+        self.assertEqual(coordinator.update_interval, timedelta(seconds=30))
+
+        api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.in_use)])
+        await coordinator._async_update_data()
+        self.assertEqual(coordinator.update_interval, timedelta(seconds=10))
+
+        api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.available)])
+        intervals = []
+        for _ in range(3):
+            await coordinator._async_update_data()
+            intervals.append(coordinator.update_interval.total_seconds())
+        self.assertEqual(intervals, [30, 60, 90])
+
     async def test_get_charging_stations(self):
         hass = hass_mocks.hass_mock()
         config_entry = hass_mocks.config_entry_mock()
@@ -38,6 +266,8 @@ class TestEVDutyCoordinator(IsolatedAsyncioTestCase):
         station = Mock(Station)
         terminal = Mock(Terminal)
         terminal.id = "123"
+        terminal.status = ChargingStatus.available
+        terminal.session = ChargingSession.no_session()
         station.terminals = [terminal]
         api.async_get_stations = AsyncMock(return_value=[station])
 
@@ -74,6 +304,150 @@ class TestEVDutyCoordinator(IsolatedAsyncioTestCase):
 
         self.assertEqual(terminals, previous_data)
 
+    async def test_save_token_after_refresh(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        store = Mock(EVDutyStore)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api, store=store)
+        api.async_get_stations = AsyncMock(return_value=[])
+
+        await coordinator._async_update_data()
+
+        store.async_save_token.assert_called_once_with(api)
+        store.async_save_terminals.assert_called_once_with({})
+
+    async def test_stored_terminals_are_stale_until_refreshed(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api)
+        api.async_get_stations = AsyncMock(return_value=[])
+
+        coordinator.async_restore_data({'123': 'terminal'})
+        self.assertEqual(coordinator.data, {'123': 'terminal'})
+        self.assertTrue(coordinator.stale)
+
+        await coordinator._async_update_data()
+        self.assertFalse(coordinator.stale)
+
+    async def test_notify_every_entity_when_stored_terminals_are_refreshed_unchanged(self):
+        coordinator = EVDutyCoordinator(hass=hass_mocks.hass_mock(), config_entry=hass_mocks.config_entry_mock(), api=Mock(EVDutyApi))
+        coordinator.async_restore_data({'1': self.terminal('1')})
+        fast_listener, slow_listener = Mock(), Mock()
+        coordinator.async_add_listener(fast_listener, '1')
+        coordinator.async_add_listener(slow_listener, ('1', SLOW_TIER))
+        station = Mock(Station)
+        station.terminals = [self.terminal('1')]
+        coordinator.api.async_get_stations = AsyncMock(return_value=[station])
+
+        await coordinator.async_refresh()
+        await coordinator.async_refresh()
+
+        self.assertFalse(coordinator.stale)
+        fast_listener.assert_called_once()
+        slow_listener.assert_called_once()
+
+    async def test_clear_token_on_invalid_credentials_error(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        api = Mock(EVDutyApi)
+        store = Mock(EVDutyStore)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=api, store=store)
+        api.async_get_stations.side_effect = EVDutyApiInvalidCredentialsError(AsyncMock())
+
+        with self.assertRaises(ConfigEntryAuthFailed):
+            await coordinator._async_update_data()
+
+        store.async_clear_token.assert_called_once()
+
+    async def test_set_many_terminals_max_charging_current_then_refresh_once(self):
+        coordinator = self.coordinator_with_data({'1': 'terminal-1', '2': 'terminal-2'})
+        coordinator.api.async_set_terminal_max_charging_current = AsyncMock()
+        coordinator.async_request_refresh = AsyncMock()
+
+        results = await coordinator.async_set_terminals_max_charging_current({'1': 16, '2': 32})
+
+        self.assertEqual(results, {'1': None, '2': None})
+        coordinator.api.async_set_terminal_max_charging_current.assert_any_call('terminal-1', 16)
+        coordinator.api.async_set_terminal_max_charging_current.assert_any_call('terminal-2', 32)
+        coordinator.async_request_refresh.assert_called_once()
+
+    async def test_report_errors_of_many_terminals_max_charging_current(self):
+        coordinator = self.coordinator_with_data({'1': 'terminal-1', '2': 'terminal-2'})
+        response = AsyncMock()
+        response.status = HTTPStatus.INTERNAL_SERVER_ERROR
+        coordinator.api.async_set_terminal_max_charging_current = AsyncMock(side_effect=[None, EVDutyApiError(response)])
+        coordinator.async_request_refresh = AsyncMock()
+
+        results = await coordinator.async_set_terminals_max_charging_current({'1': 16, '2': 32})
+
+        self.assertEqual(results, {'1': None, '2': 'cannot_connect'})
+        coordinator.async_request_refresh.assert_called_once()
+
+    async def test_record_terminal_telemetry_on_refresh(self):
+        coordinator = self.coordinator_with_data({})
+        coordinator.api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.in_use, ChargingStatus.available)])
+
+        await coordinator._async_update_data()
+        await coordinator._async_update_data()
+
+        self.assertEqual(len(coordinator.telemetry['0']), 2)
+        self.assertEqual(len(coordinator.telemetry['1']), 2)
+
+    async def test_import_sessions_completed_while_home_assistant_was_down(self):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        session_statistics = Mock(EVDutySessionStatistics)
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=Mock(EVDutyApi), session_statistics=session_statistics)
+        charging = self.terminal('1', status=ChargingStatus.in_use, session=ChargingSession(
+            is_active=True, is_charging=True, volt=240, amp=30, power=7200, energy_consumed=5000, start_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            duration=timedelta(hours=1), cost=0.5))
+        coordinator.async_restore_data({'1': charging})
+
+        await self.refresh(coordinator, self.terminal('1'))
+
+        session_statistics.async_import.assert_called_once_with([(charging, charging.session)])
+
+    async def test_drop_telemetry_of_vanished_terminals(self):
+        coordinator = self.coordinator_with_data({})
+        coordinator.api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.in_use, ChargingStatus.available)])
+        await coordinator._async_update_data()
+
+        coordinator.api.async_get_stations = AsyncMock(return_value=[self.station(ChargingStatus.in_use)])
+        await coordinator._async_update_data()
+
+        self.assertEqual(list(coordinator.telemetry), ['0'])
+
+    async def test_track_poll_health(self):
+        coordinator = self.coordinator_with_data({})
+        response = AsyncMock()
+        response.status = HTTPStatus.UNAUTHORIZED
+        coordinator.api.async_get_stations = AsyncMock(side_effect=[[], EVDutyApiError(response), TimeoutError()])
+
+        await coordinator._async_update_data()
+        await coordinator._async_update_data()
+        with self.assertRaises(TimeoutError):
+            await coordinator._async_update_data()
+
+        self.assertEqual(coordinator.health.successes, 1)
+        self.assertEqual(coordinator.health.stale_returns, 1)
+        self.assertEqual(coordinator.health.timeouts, 1)
+        self.assertEqual(sum(coordinator.health.latency_histogram), 3)
+        self.assertIsNotNone(coordinator.health.last_success)
+
+    async def test_notify_health_listeners_after_refresh_without_changes(self):
+        coordinator = self.coordinator_with_data({})
+        coordinator.api.async_get_stations = AsyncMock(return_value=[])
+        listener, health_listener = Mock(), Mock()
+        coordinator.async_add_listener(listener)
+        coordinator.health.async_add_listener(health_listener)
+
+        await coordinator.async_refresh()
+
+        listener.assert_not_called()
+        health_listener.assert_called_once()
+
     async def test_raise_on_other_api_error(self):
         hass = hass_mocks.hass_mock()
         config_entry = hass_mocks.config_entry_mock()
@@ -86,3 +460,84 @@ class TestEVDutyCoordinator(IsolatedAsyncioTestCase):
 
         with self.assertRaises(ConnectionError):
             await coordinator._async_update_data()
+
+    async def test_open_circuit_after_consecutive_api_errors(self):
+        coordinator = self.coordinator_with_data({})
+        coordinator.api.async_get_stations = AsyncMock(side_effect=EVDutyApiError(AsyncMock()))
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                await coordinator._async_update_data()
+
+        with self.assertRaises(UpdateFailed):
+            await coordinator._async_update_data()
+        self.assertEqual(coordinator.api.async_get_stations.call_count, 2)
+        self.assertEqual(coordinator.circuit_breaker.state, CircuitState.open)
+
+    async def test_reject_writes_while_circuit_open(self):
+        coordinator = self.coordinator_with_data({})
+        coordinator.circuit_breaker = CircuitBreaker(failure_threshold=1)
+        coordinator.circuit_breaker.record_failure()
+
+        with self.assertRaises(ConnectionError):
+            await coordinator._async_write_max_charging_current(Mock(Terminal), 16)
+
+        coordinator.api.async_set_terminal_max_charging_current.assert_not_called()
+
+    async def test_simultaneous_usage_does_not_trip_circuit(self):
+        coordinator = self.coordinator_with_data({})
+        response = AsyncMock()
+        response.status = HTTPStatus.UNAUTHORIZED
+        coordinator.api.async_get_stations = AsyncMock(side_effect=EVDutyApiError(response))
+
+        for _ in range(3):
+            await coordinator._async_update_data()
+
+        self.assertEqual(coordinator.circuit_breaker.state, CircuitState.closed)
+
+    async def test_close_circuit_after_successful_refresh(self):
+        coordinator = self.coordinator_with_data({})
+        coordinator.api.async_get_stations = AsyncMock(side_effect=[EVDutyApiError(AsyncMock()), []])
+
+        with self.assertRaises(ConnectionError):
+            await coordinator._async_update_data()
+        await coordinator._async_update_data()
+
+        self.assertEqual(coordinator.circuit_breaker.failures, 0)
+
+    @staticmethod
+    def station(*statuses):
+        station = Mock(Station)
+        station.terminals = []
+        for index, status in enumerate(statuses):
+            terminal = Mock(Terminal)
+            terminal.id = str(index)
+            terminal.status = status
+            terminal.session = ChargingSession.no_session()
+            station.terminals.append(terminal)
+        return station
+
+    @staticmethod
+    async def refresh(coordinator, *terminals):
+        station = Mock(Station)
+        station.terminals = list(terminals)
+        coordinator.api.async_get_stations = AsyncMock(return_value=[station])
+        return await coordinator._async_update_data()
+
+    @staticmethod
+    def terminal(terminal_id, status=ChargingStatus.available, firmware_version='1.0.0', network_info=None, session=None):
+        return Terminal(id=terminal_id, station_id='1', name=f'Terminal {terminal_id}', status=status, charge_box_identity='A', firmware_version=firmware_version,
+                        session=session or ChargingSession.no_session(), network_info=network_info or TestEVDutyCoordinator.network_info())
+
+    @staticmethod
+    def network_info(wifi_ssid='ssid', wifi_rssi=-60):
+        return NetworkInfo(wifi_ssid=wifi_ssid, wifi_rssi=wifi_rssi, mac_address='mac', ip_address='ip')
+
+    @staticmethod
+    def coordinator_with_data(data):
+        hass = hass_mocks.hass_mock()
+        config_entry = hass_mocks.config_entry_mock()
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=config_entry, api=Mock(EVDutyApi))
+        coordinator.data = data
+        coordinator.async_update_listeners()
+        return coordinator
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import Mock
+
+from evdutyapi import EVDutyApi, Terminal, ChargingStatus, ChargingSession, NetworkInfo, ChargingProfile
+
+from custom_components.evduty import DOMAIN, EVDutyCoordinator
+from custom_components.evduty.charging_planner import EVDutyChargingPlanner, ChargingPlan
+from custom_components.evduty.const import DATA_CHARGING_PLANNERS
+from custom_components.evduty.diagnostics import async_get_config_entry_diagnostics
+from test import hass_mocks
+
+
+class DiagnosticsTest(IsolatedAsyncioTestCase):
+
+    async def test_report_redacted_entry_health_and_terminals(self):
+        hass = hass_mocks.hass_mock()
+        entry = hass_mocks.config_entry_mock(username='user@example.com', password='secret', id='entry')
+        coordinator = EVDutyCoordinator(hass=hass, config_entry=entry, api=Mock(EVDutyApi))
+        coordinator.data = {'123': Terminal(id='123',
+                                            station_id='456',
+                                            name='Test',
+                                            status=ChargingStatus.in_use,
+                                            charge_box_identity='A',
+                                            firmware_version='1.2.3',
+                                            session=ChargingSession(is_active=True,
+                                                                    is_charging=True,
+                                                                    volt=240,
+                                                                    amp=30,
+                                                                    power=7200,
+                                                                    energy_consumed=2000,
+                                                                    start_date=datetime(2024, 1, 1),
+                                                                    duration=timedelta(seconds=55),
+                                                                    cost=0.32),
+                                            network_info=NetworkInfo(wifi_ssid='ssid', wifi_rssi=-72, ip_address='ip', mac_address='mac'),
+                                            charging_profile=ChargingProfile(power_limitation=True, current_limit=30, current_max=48))}
+        coordinator.health.record_success(0.4)
+        coordinator._record_telemetry(coordinator.data)
+        hass.data[DOMAIN] = {'entry': coordinator}
+        planner = EVDutyChargingPlanner(hass, coordinator)
+        planner.plans = {'123': ChargingPlan(energy=20, departure=datetime(2024, 1, 2, 7), tariff=(('00:00:00', 0.08),), price_entity=None,
+                                             prices=((datetime(2024, 1, 2, 6, 45), 0.08),), setpoints=((datetime(2024, 1, 2, 6, 45), 48),))}
+        hass.data[DATA_CHARGING_PLANNERS] = {'entry': planner}
+
+        diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+
+        self.assertEqual(diagnostics['entry']['data'], {'username': '**REDACTED**', 'password': '**REDACTED**'})
+        self.assertEqual(diagnostics['update_interval'], 60)
+        self.assertEqual(diagnostics['health']['successes'], 1)
+        self.assertEqual(diagnostics['circuit_breaker'], {'state': 'closed', 'failures': 0, 'retry_in': 0})
+        self.assertEqual(diagnostics['request_scheduler'], {'requests': 0, 'deduplicated': 0, 'authentications': 0})
+        self.assertEqual(diagnostics['poll_scheduler'], {'max_concurrent_polls': 4, 'in_flight': 0, 'waiting': 0, 'schedule': []})
+        self.assertEqual(diagnostics['charging_plans']['123']['setpoints'], [['2024-01-02T06:45:00', 48]])
+        self.assertEqual([(sample['power'], sample['energy']) for sample in diagnostics['telemetry']['123']], [(7200, 2000)])
+        terminal = diagnostics['terminals']['123']
+        self.assertEqual(terminal['status'], ChargingStatus.in_use.value)
+        self.assertEqual(terminal['session']['start_date'], '2024-01-01T00:00:00')
+        self.assertEqual(terminal['session']['duration'], 55)
+        self.assertEqual(terminal['network_info'], {'wifi_ssid': '**REDACTED**', 'wifi_rssi': -72, 'mac_address': '**REDACTED**', 'ip_address': '**REDACTED**'})
@@ -0,0 +1,54 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from evdutyapi import Terminal, NetworkInfo
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import slugify
+
+from custom_components.evduty.entity import EVDutyTerminalDevice
+
+
+class EVDutyTerminalDeviceTest(TestCase):
+
+    def test_unique_id_is_slug_of_name(self):
+        for terminal_name in ('Test', "Garage d'Été #2", 'Borne-1 &amp; co', '  ', ''):
+            for sensor_name in ('Power', 'Wi-Fi IP', 'Max Amp'):
+                entity = EVDutyTerminalDevice(self.coordinator(), self.terminal(terminal_name), sensor_name)
+
+                self.assertEqual(entity._attr_unique_id, slugify(entity._attr_name))
+
+    def test_share_device_info_of_a_terminal(self):
+        terminal = self.terminal('Test')
+        coordinator = self.coordinator()
+
+        power = EVDutyTerminalDevice(coordinator, terminal, 'Power')
+        amp = EVDutyTerminalDevice(coordinator, terminal, 'Amp')
+
+        self.assertIs(power.device_info, amp.device_info)
+        self.assertIsNot(EVDutyTerminalDevice(self.coordinator(), terminal, 'Power').device_info, power.device_info)
+
+    def test_replace_device_info_when_terminal_changed(self):
+        coordinator = self.coordinator()
+        power = EVDutyTerminalDevice(coordinator, self.terminal('Test'), 'Power')
+
+        renamed = EVDutyTerminalDevice(coordinator, self.terminal('Garage'), 'Power')
+
+        self.assertEqual(renamed.device_info['name'], 'EVduty Garage')
+        self.assertIsNot(renamed.device_info, power.device_info)
+        self.assertEqual(list(coordinator.device_infos), ['123'])
+
+    @staticmethod
+    def coordinator():
+        coordinator = Mock(DataUpdateCoordinator)
+        coordinator.device_infos = {}
+        return coordinator
+
+    @staticmethod
+    def terminal(name):
+        terminal = Mock(Terminal)
+        terminal.id = '123'
+        terminal.name = name
+        terminal.charge_box_identity = 'A'
+        terminal.firmware_version = '1.2.3'
+        terminal.network_info = NetworkInfo(wifi_ssid='ssid', wifi_rssi=-72, ip_address='ip', mac_address='mac')
+        return terminal
@@ -0,0 +1,119 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch, AsyncMock, Mock
+
+from aiohttp import ClientSession
+from evdutyapi import EVDutyApi, ChargingStatus
+
+from custom_components.evduty import EVDutyCoordinator
+from custom_components.evduty.circuit_breaker import CircuitState
+from test import hass_mocks
+from test.fake_evduty_cloud import FakeEVDutyCloud, USERNAME, PASSWORD
+
+
+# real EVDutyApi and EVDutyCoordinator against a local fake of the EVduty cloud
+class EVDutyCloudTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.cloud = FakeEVDutyCloud()
+        await self.cloud.start()
+        self.addAsyncCleanup(self.cloud.close)
+        session = ClientSession()
+        self.addAsyncCleanup(session.close)
+        self.api = EVDutyApi(USERNAME, PASSWORD, session)
+        self.api.base_url = self.cloud.base_url
+        self.coordinator = EVDutyCoordinator(hass=hass_mocks.hass_mock(), config_entry=hass_mocks.config_entry_mock(), api=self.api)
+        self.coordinator.async_request_refresh = AsyncMock()
+
+    async def test_refresh_fleet(self):
+        terminals = self.cloud.add_fleet(3)
+        terminals[0].charge(power=7200, energy_consumed=1500)
+        terminals[1].charging_rate = 16
+
+        data = await self.coordinator._async_update_data()
+
+        self.assertEqual(list(data), ['terminal-0', 'terminal-1', 'terminal-2'])
+        self.assertEqual(data['terminal-0'].status, ChargingStatus.in_use)
+        self.assertEqual(data['terminal-0'].session.power, 7200)
+        self.assertEqual(data['terminal-0'].session.energy_consumed, 1500)
+        self.assertEqual(data['terminal-1'].charging_profile.current_limit, 16)
+        self.assertEqual(data['terminal-2'].network_info.mac_address, 'mac-terminal-2')
+        self.assertEqual(self.cloud.logins, 1)
+
+    async def test_discover_added_and_removed_terminals_without_logging_in_again(self):
+        self.cloud.add_fleet(2)
+        self.coordinator.data = await self.coordinator._async_update_data()
+        terminals_listener = Mock()
+        self.coordinator.async_add_terminals_listener(terminals_listener)
+        self.cloud.add_fleet(3)
+        del self.cloud.terminals['terminal-0']
+
+        self.coordinator.data = await self.coordinator._async_update_data()
+        self.coordinator.async_update_listeners()
+
+        added, removed = terminals_listener.call_args.args
+        self.assertEqual([terminal.id for terminal in added], ['terminal-2'])
+        self.assertEqual(removed, ['terminal-0'])
+        self.assertEqual(self.cloud.logins, 1)
+
+    async def test_write_max_charging_current(self):
+        self.cloud.add_fleet(2)
+        self.coordinator.data = await self.coordinator._async_update_data()
+
+        results = await self.coordinator.async_set_terminals_max_charging_current({'terminal-0': 10, 'terminal-1': 20})
+
+        self.assertEqual(results, {'terminal-0': None, 'terminal-1': None})
+        self.assertEqual([terminal.charging_rate for terminal in self.cloud.terminals.values()], [10, 20])
+
+    async def test_concurrent_requests_do_not_revoke_each_other_tokens(self):
+        self.cloud.add_fleet(4)
+        self.coordinator.data = await self.coordinator._async_update_data()
+        self.cloud.revoke_token()
+        self.api.expires_at = self.api.expires_at.min
+
+        await asyncio.gather(self.coordinator._async_update_data(),
+                             self.coordinator.async_set_terminals_max_charging_current({'terminal-0': 10, 'terminal-1': 20}))
+
+        self.assertEqual(self.coordinator.health.stale_returns, 0)
+        self.assertEqual(self.cloud.logins, 2)
+
+    async def test_keep_last_data_on_simultaneous_usage(self):
+        self.cloud.add_fleet(1)
+        self.coordinator.data = await self.coordinator._async_update_data()
+        self.cloud.unauthorized_requests = 1
+
+        data = await self.coordinator._async_update_data()
+
+        self.assertIs(data, self.coordinator.data)
+        self.assertEqual(self.coordinator.health.stale_returns, 1)
+
+    async def test_reauthenticate_after_simultaneous_usage(self):
+        self.cloud.add_fleet(1)
+        self.coordinator.data = await self.coordinator._async_update_data()
+        self.cloud.unauthorized_requests = 1
+        await self.coordinator._async_update_data()
+
+        await self.coordinator._async_update_data()
+
+        self.assertEqual(self.cloud.logins, 2)
+        self.assertEqual(self.coordinator.health.successes, 2)
+
+    async def test_open_circuit_on_server_errors(self):
+        self.cloud.add_fleet(1)
+        self.cloud.error_rate = 1
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                await self.coordinator._async_update_data()
+
+        self.assertEqual(self.coordinator.circuit_breaker.state, CircuitState.open)
+
+    @patch('custom_components.evduty.request_scheduler.REQUEST_TIMEOUT', 0.05)
+    async def test_time_out_slow_cloud(self):
+        self.cloud.add_fleet(1)
+        self.cloud.latency = 0.2
+
+        with self.assertRaises(TimeoutError):
+            await self.coordinator._async_update_data()
+
+        self.assertEqual(self.coordinator.health.timeouts, 1)
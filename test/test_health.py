@@ -0,0 +1,52 @@
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.evduty.health import CoordinatorHealth
+
+
+class CoordinatorHealthTest(TestCase):
+
+    def test_count_poll_outcomes(self):
+        health = CoordinatorHealth()
+
+        health.record_success(0.1)
+        health.record_success(0.2)
+        health.record_error(0.3)
+        health.record_timeout(10)
+        health.record_stale_return(0.4)
+
+        self.assertEqual((health.successes, health.errors, health.timeouts, health.stale_returns), (2, 1, 1, 1))
+        self.assertEqual(health.last_latency, 0.4)
+
+    def test_bucket_latencies(self):
+        health = CoordinatorHealth()
+
+        for latency in (0.1, 0.25, 0.3, 3, 12):
+            health.record_success(latency)
+
+        self.assertEqual(health.as_dict()['latency_histogram'],
+                         {'le_0.25': 2, 'le_0.5': 1, 'le_1': 0, 'le_2': 0, 'le_5': 1, 'le_10': 0, 'le_inf': 1})
+
+    def test_data_age_since_last_success(self):
+        health = CoordinatorHealth()
+        self.assertIsNone(health.data_age)
+
+        last_success = dt_util.utcnow()
+        with patch('custom_components.evduty.health.dt_util.utcnow', return_value=last_success):
+            health.record_success(0.1)
+        with patch('custom_components.evduty.health.dt_util.utcnow', return_value=last_success + timedelta(seconds=90)):
+            self.assertEqual(health.data_age, 90)
+
+    def test_notify_listeners_until_removed(self):
+        health = CoordinatorHealth()
+        listener = Mock()
+        remove_listener = health.async_add_listener(listener)
+
+        health.async_update_listeners()
+        remove_listener()
+        health.async_update_listeners()
+
+        listener.assert_called_once()
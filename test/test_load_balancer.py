@@ -0,0 +1,160 @@
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
+
+from evdutyapi import Terminal, ChargingStatus, ChargingProfile, ChargingSession
+from homeassistant.core import State
+
+from custom_components.evduty import EVDutyCoordinator
+from custom_components.evduty.load_balancer import allocate_current, EVDutyLoadBalancer
+from test import hass_mocks
+
+
+class AllocateCurrentTest(IsolatedAsyncioTestCase):
+
+    def test_share_current_equally(self):
+        self.assertEqual(allocate_current(60, {'1': 48, '2': 48}), {'1': 30, '2': 30})
+
+    def test_give_unused_share_to_other_terminals(self):
+        self.assertEqual(allocate_current(60, {'1': 16, '2': 48, '3': 48}), {'1': 16, '2': 22, '3': 22})
+
+    def test_limit_to_terminal_max(self):
+        self.assertEqual(allocate_current(100, {'1': 16, '2': 32}), {'1': 16, '2': 32})
+
+    def test_pause_terminals_when_not_enough_current_for_minimum(self):
+        self.assertEqual(allocate_current(14, {'1': 48, '2': 48, '3': 48}), {'1': 7, '2': 7, '3': 0})
+
+    def test_pause_all_terminals_when_no_current_available(self):
+        self.assertEqual(allocate_current(-10, {'1': 48, '2': 48}), {'1': 0, '2': 0})
+
+
+class EVDutyLoadBalancerTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hass = hass_mocks.hass_mock()
+        self.hass.states = Mock()
+        self.hass.async_create_task = MagicMock(side_effect=lambda coroutine, name: coroutine)
+        self.coordinator = Mock(EVDutyCoordinator)
+        self.coordinator.async_set_terminals_max_charging_current = AsyncMock(side_effect=lambda currents: {terminal_id: None for terminal_id in currents})
+
+    async def test_balance_site_limit_across_charging_terminals(self):
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48), ('2', ChargingStatus.in_use, 48), ('3', ChargingStatus.available, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 60, None, 2)
+
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 30, '2': 30})
+
+    async def test_subtract_building_load(self):
+        self.hass.states.get.return_value = State('sensor.building_load', '20.5')
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48), ('2', ChargingStatus.in_use, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 60, 'sensor.building_load', 2)
+
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 19, '2': 20})
+
+    async def test_skip_balancing_when_building_load_unknown(self):
+        self.hass.states.get.return_value = State('sensor.building_load', 'unavailable')
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 60, 'sensor.building_load', 2)
+
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_not_called()
+
+    async def test_send_only_changes_above_threshold(self):
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48, 31), ('2', ChargingStatus.in_use, 48, 40))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 60, None, 2)
+
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'2': 30})
+
+    async def test_skip_recompute_when_inputs_unchanged(self):
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 30, None, 2)
+
+        await self.balance(load_balancer)
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 30})
+
+    async def test_resume_terminal_paused_while_its_session_lasts(self):
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48), ('2', ChargingStatus.in_use, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 10, None, 2)
+        await self.balance(load_balancer)
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 10, '2': 0})
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48, 10), ('2', ChargingStatus.available, 48, 0))
+        load_balancer.site_current_limit = 60
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 30, '2': 30})
+
+    async def test_restore_max_current_when_session_of_lowered_terminal_ends(self):
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48), ('2', ChargingStatus.in_use, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 60, None, 2)
+        await self.balance(load_balancer)
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48, 30), ('2', ChargingStatus.available, 48, 30, False))
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with({'1': 48, '2': 48})
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48, 48), ('2', ChargingStatus.available, 48, 48, False))
+        await self.balance(load_balancer)
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_not_called()
+
+    async def test_cap_currents_of_charging_terminals_to_their_share(self):
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48), ('2', ChargingStatus.in_use, 48), ('3', ChargingStatus.available, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 60, None, 2)
+        await self.balance(load_balancer)
+
+        self.assertEqual(load_balancer.async_cap({'1': 48, '2': 20, '3': 48}), {'1': 30, '2': 20, '3': 48})
+
+    async def test_retry_after_failed_write(self):
+        self.coordinator.async_set_terminals_max_charging_current.side_effect = lambda currents: {'1': 'cannot_connect'}
+        self.coordinator.data = self.terminals(('1', ChargingStatus.in_use, 48))
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 30, None, 2)
+
+        await self.balance(load_balancer)
+
+        self.assertIsNone(load_balancer._last_inputs)
+
+    @patch('custom_components.evduty.load_balancer.async_track_state_change_event')
+    async def test_start_listening_to_coordinator_and_building_load(self, async_track_state_change_event):
+        load_balancer = EVDutyLoadBalancer(self.hass, self.coordinator, 30, 'sensor.building_load', 2)
+
+        stop = load_balancer.async_start()
+
+        self.coordinator.async_add_listener.assert_called_once_with(load_balancer.async_balance)
+        async_track_state_change_event.assert_called_once()
+        stop()
+        self.coordinator.async_add_listener.return_value.assert_called_once()
+        async_track_state_change_event.return_value.assert_called_once()
+
+    async def balance(self, load_balancer):
+        # writes run until the balancer settles on the current data
+        load_balancer.async_balance()
+        while self.hass.async_create_task.called:
+            balancing = self.hass.async_create_task.call_args.args[0]
+            self.hass.async_create_task.reset_mock()
+            await balancing
+
+    @staticmethod
+    def terminals(*terminals):
+        data = {}
+        for terminal_id, status, current_max, *current_limit_and_session in terminals:
+            current_limit = current_limit_and_session[0] if current_limit_and_session else current_max
+            session_active = current_limit_and_session[1] if len(current_limit_and_session) > 1 else True
+            terminal = Mock(Terminal)
+            terminal.id = terminal_id
+            terminal.status = status
+            terminal.charging_profile = ChargingProfile(power_limitation=True, current_limit=current_limit, current_max=current_max)
+            terminal.session = Mock(ChargingSession, is_active=session_active)
+            data[terminal_id] = terminal
+        return data
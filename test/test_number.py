@@ -1,16 +1,18 @@
+import asyncio
+from dataclasses import replace
 from datetime import datetime, timedelta
 from unittest import IsolatedAsyncioTestCase
-from unittest.mock import Mock, AsyncMock
+from unittest.mock import Mock, AsyncMock, patch
 
 from evdutyapi import ChargingProfile, Terminal, ChargingStatus, ChargingSession, NetworkInfo
 from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.const import UnitOfElectricCurrent
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import slugify
 
-from custom_components.evduty import DOMAIN
+from custom_components.evduty import DOMAIN, EVDutyCoordinator
 from custom_components.evduty.const import MANUFACTURER
 from custom_components.evduty.number import MaxAmpNumber, async_setup_entry
 
@@ -20,7 +22,8 @@ class TestNumberCreation(IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         entry = Mock()
         entry.entry_id = 'id'
-        self.coordinator = Mock(DataUpdateCoordinator)
+        self.coordinator = Mock(EVDutyCoordinator)
+        self.coordinator.device_infos = {}
         self.terminal = Terminal(id='123',
                                  station_id='456',
                                  name='Test',
@@ -39,6 +42,10 @@ class TestNumberCreation(IsolatedAsyncioTestCase):
                                  network_info=NetworkInfo(wifi_ssid="ssid", wifi_rssi=-72, ip_address="ip", mac_address="mac"),
                                  charging_profile=ChargingProfile(power_limitation=True, current_limit=15, current_max=50))
         self.coordinator.data = {'123': self.terminal}
+        self.coordinator.last_update_success = True
+        self.coordinator.stale = False
+        self.coordinator.hass = Mock(HomeAssistant)
+        self.coordinator.config_entry = Mock()
         hass = Mock(HomeAssistant)
         hass.data = {DOMAIN: {entry.entry_id: self.coordinator}}
 
@@ -49,10 +56,19 @@ class TestNumberCreation(IsolatedAsyncioTestCase):
         async_add_devices.assert_called_once()
 
         self.numbers = async_add_devices.call_args.args[0]
+        self.async_add_devices = async_add_devices
 
     async def test_add_sensors_on_setup(self):
         self.assertEqual(len(self.numbers), 1)
 
+    def test_add_numbers_of_new_terminals(self):
+        async_add_terminals = self.coordinator.async_add_terminals_listener.call_args.args[0]
+
+        async_add_terminals([replace(self.terminal, id='789', name='New')], [])
+
+        numbers = self.async_add_devices.call_args.args[0]
+        self.assertEqual([number._attr_name for number in numbers], ['EVduty New Max Amp'])
+
     def test_max_amp_number_created(self):
         self.assert_sensor_created(type=MaxAmpNumber,
                                    name='Max Amp',
@@ -66,10 +82,133 @@ class TestNumberCreation(IsolatedAsyncioTestCase):
     async def test_set_max_amp_number(self):
         self.coordinator.async_set_terminal_max_charging_current = AsyncMock(return_value=None)
 
-        max_amp_number = next(s for s in self.numbers if isinstance(s, MaxAmpNumber))
+        max_amp_number = self.max_amp_number_with_debounced_writes()
         await max_amp_number.async_set_native_value(22)
+        await self.cooldown()
+
+        self.coordinator.async_set_terminal_max_charging_current.assert_called_once_with(self.terminal, 22)
+
+    async def test_set_max_amp_number_shows_value_before_write(self):
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(return_value=None)
+
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(22)
+
+        self.assertEqual(max_amp_number.native_value, 22)
+        max_amp_number.async_write_ha_state.assert_called_once()
+        self.coordinator.async_set_terminal_max_charging_current.assert_not_called()
+
+    async def test_set_max_amp_number_writes_last_value_within_cooldown_only(self):
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(return_value=None)
+
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(40)
+        await max_amp_number.async_set_native_value(30)
+        await max_amp_number.async_set_native_value(16)
+        await self.cooldown()
+
+        self.coordinator.async_set_terminal_max_charging_current.assert_called_once_with(self.terminal, 16)
+
+    async def test_set_max_amp_number_writes_again_after_cooldown(self):
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(return_value=None)
+
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(16)
+        await self.cooldown()
+        await max_amp_number.async_set_native_value(20)
+        await self.cooldown()
+
+        self.assertEqual(self.written_values(), [16, 20])
+
+    async def test_set_max_amp_number_writes_value_set_during_write(self):
+        release = asyncio.Event()
+
+        async def write(terminal, current):
+            await release.wait()
+
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(side_effect=write)
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(16)
+        await self.cooldown()
+
+        await max_amp_number.async_set_native_value(20)
+        self.assertEqual(max_amp_number.native_value, 20)
+        release.set()
+        await self.cooldown()
+
+        self.assertEqual(self.written_values(), [16, 20])
+        self.assertIsNone(max_amp_number._optimistic_value)
+
+    async def test_set_max_amp_number_shows_refreshed_value_after_write(self):
+        refreshed_terminal = replace(self.terminal, charging_profile=ChargingProfile(power_limitation=True, current_limit=16, current_max=50))
+
+        async def write(terminal, current):
+            self.coordinator.data = {'123': refreshed_terminal}
+
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(side_effect=write)
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(16)
+        await self.cooldown()
+
+        self.assertEqual(max_amp_number.native_value, 16)
+        self.assertEqual(max_amp_number._terminal, refreshed_terminal)
+        self.assertIsNone(max_amp_number._optimistic_value)
+
+    async def test_set_max_amp_number_shows_current_value_after_failed_write(self):
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(side_effect=ConnectionError)
+
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(22)
+        await self.cooldown()
+
+        self.assertIsNone(max_amp_number._optimistic_value)
+        self.assertEqual(max_amp_number.native_value, 15)
+        self.coordinator.config_entry.async_start_reauth.assert_not_called()
+
+    async def test_set_max_amp_number_starts_reauth_on_invalid_credentials(self):
+        self.coordinator.async_set_terminal_max_charging_current = AsyncMock(side_effect=ConfigEntryAuthFailed)
+
+        max_amp_number = self.max_amp_number_with_debounced_writes()
+        await max_amp_number.async_set_native_value(22)
+        await self.cooldown()
+
+        self.assertIsNone(max_amp_number._optimistic_value)
+        self.coordinator.config_entry.async_start_reauth.assert_called_once_with(self.coordinator.hass)
+
+    @patch('custom_components.evduty.number.WRITE_COOLDOWN', 0.01)
+    def max_amp_number_with_debounced_writes(self):
+        self.coordinator.hass = HomeAssistant('.')
+        max_amp_number = MaxAmpNumber(self.coordinator, self.terminal)
+        max_amp_number._written_state = (True, False, 15, 50)
+        max_amp_number.async_write_ha_state = Mock()
+        self.addCleanup(max_amp_number._write_debouncer.async_shutdown)
+        return max_amp_number
+
+    @staticmethod
+    async def cooldown():
+        await asyncio.sleep(0.05)
+
+    def written_values(self):
+        return [call.args[1] for call in self.coordinator.async_set_terminal_max_charging_current.call_args_list]
+
+    def test_write_state_when_max_current_changed(self):
+        number = self.coordinator_updated(ChargingProfile(power_limitation=True, current_limit=15, current_max=40))
+
+        number.async_write_ha_state.assert_called_once()
+        self.assertEqual(number.native_max_value, 40)
+
+    def test_skip_state_write_when_charging_profile_unchanged(self):
+        number = self.coordinator_updated(ChargingProfile(power_limitation=True, current_limit=15, current_max=50))
+
+        number.async_write_ha_state.assert_not_called()
 
-        self.coordinator.async_set_terminal_max_charging_current.assert_called_with(self.terminal, 22)
+    def coordinator_updated(self, charging_profile):
+        number = next(s for s in self.numbers if isinstance(s, MaxAmpNumber))
+        number._written_state = (True, False, 15, 50)
+        number.async_write_ha_state = Mock()
+        self.coordinator.data = {'123': replace(self.terminal, charging_profile=charging_profile)}
+        number._handle_coordinator_update()
+        return number
 
     def assert_sensor_created(self, type, name, state_class=None, device_class=None, unit=None, value=None, native_step=1, native_min_value=None, native_max_value=None):
         number = next(s for s in self.numbers if isinstance(s, type))
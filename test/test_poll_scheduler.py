@@ -0,0 +1,79 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from custom_components.evduty.poll_scheduler import EVDutyPollScheduler, async_get_poll_scheduler
+from test import hass_mocks
+
+
+class EVDutyPollSchedulerTest(IsolatedAsyncioTestCase):
+
+    @patch('custom_components.evduty.poll_scheduler.uniform', return_value=0)
+    def test_spread_accounts_evenly_across_the_interval(self, _):
+        scheduler = EVDutyPollScheduler()
+        for entry_id in ('a', 'b', 'c', 'd'):
+            scheduler.async_register(entry_id)
+
+        refreshes = [scheduler.next_refresh(entry_id, now=1000, interval=60) for entry_id in ('a', 'b', 'c', 'd')]
+
+        self.assertEqual(refreshes, [1080, 1035, 1050, 1065])
+
+    @patch('custom_components.evduty.poll_scheduler.uniform', return_value=0.2)
+    def test_jitter_moves_slots_within_their_share(self, _):
+        scheduler = EVDutyPollScheduler()
+        scheduler.async_register('a')
+        scheduler.async_register('b')
+
+        self.assertEqual(scheduler.phase('a'), 0.1)
+        self.assertEqual(scheduler.phase('b'), 0.6)
+
+    @patch('custom_components.evduty.poll_scheduler.uniform', return_value=0)
+    def test_refresh_at_least_half_an_interval_later(self, _):
+        scheduler = EVDutyPollScheduler()
+        scheduler.async_register('a')
+        scheduler.async_register('b')
+
+        self.assertEqual(scheduler.next_refresh('b', now=1085, interval=60), 1170)
+        self.assertEqual(scheduler.next_refresh('b', now=1170, interval=60), 1230)
+
+    @patch('custom_components.evduty.poll_scheduler.uniform', return_value=0)
+    def test_respread_remaining_accounts_when_one_is_removed(self, _):
+        scheduler = EVDutyPollScheduler()
+        unregister = scheduler.async_register('a')
+        scheduler.async_register('b')
+        scheduler.async_register('c')
+
+        unregister()
+
+        self.assertEqual(scheduler.phase('b'), 0)
+        self.assertEqual(scheduler.phase('c'), 0.5)
+
+    async def test_cap_polls_in_flight(self):
+        scheduler = EVDutyPollScheduler(max_concurrent_polls=2)
+        in_flight = []
+
+        async def poll():
+            async with scheduler.async_poll():
+                in_flight.append(scheduler.in_flight)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(poll() for _ in range(5)))
+
+        self.assertEqual(max(in_flight), 2)
+        self.assertEqual((scheduler.in_flight, scheduler.waiting), (0, 0))
+
+    @patch('custom_components.evduty.poll_scheduler.uniform', return_value=0)
+    def test_report_schedule(self, _):
+        scheduler = EVDutyPollScheduler()
+        scheduler.async_register('a')
+        scheduler.async_register('b')
+        scheduler.next_refresh('b', now=1000, interval=60)
+
+        self.assertEqual(scheduler.as_dict(now=1010), {'max_concurrent_polls': 4, 'in_flight': 0, 'waiting': 0,
+                                                       'schedule': [{'entry_id': 'a', 'phase': 0, 'next_refresh_in': None},
+                                                                    {'entry_id': 'b', 'phase': 0.5, 'next_refresh_in': 40}]})
+
+    def test_share_scheduler_between_accounts(self):
+        hass = hass_mocks.hass_mock()
+
+        self.assertIs(async_get_poll_scheduler(hass), async_get_poll_scheduler(hass))
@@ -0,0 +1,101 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from custom_components.evduty.request_scheduler import EVDutyRequestScheduler, async_get_request_scheduler
+from test import hass_mocks
+
+
+class EVDutyRequestSchedulerTest(IsolatedAsyncioTestCase):
+
+    async def test_run_requests_concurrently(self):
+        scheduler = EVDutyRequestScheduler()
+        running, calls = [], []
+
+        async def call(name):
+            running.append(name)
+            await asyncio.sleep(0)
+            calls.append(len(running))
+            running.remove(name)
+            return name
+
+        results = await asyncio.gather(*(scheduler.async_run(lambda name=name: call(name)) for name in ('a', 'b', 'c')))
+
+        self.assertEqual(results, ['a', 'b', 'c'])
+        self.assertEqual(calls, [3, 2, 1])
+        self.assertEqual(scheduler.as_dict(), {'requests': 3, 'deduplicated': 0, 'authentications': 0})
+
+    async def test_authenticate_one_request_at_a_time(self):
+        scheduler = EVDutyRequestScheduler()
+        logging_in, logins = [], []
+
+        async def authenticate():
+            logging_in.append(True)
+            logins.append(len(logging_in))
+            await asyncio.sleep(0)
+            logging_in.pop()
+
+        await asyncio.gather(*(scheduler.async_run(AsyncMock(), authenticate=authenticate) for _ in range(3)))
+
+        self.assertEqual(logins, [1, 1, 1])
+        self.assertEqual(scheduler.authentications, 3)
+
+    async def test_share_result_of_identical_pending_request(self):
+        scheduler = EVDutyRequestScheduler()
+        call = AsyncMock(return_value='stations')
+
+        results = await asyncio.gather(scheduler.async_run(call, key='stations'), scheduler.async_run(call, key='stations'))
+
+        self.assertEqual(results, ['stations', 'stations'])
+        call.assert_called_once()
+        self.assertEqual(scheduler.deduplicated, 1)
+
+    async def test_cancelled_caller_does_not_cancel_shared_request(self):
+        scheduler = EVDutyRequestScheduler()
+        released = asyncio.Event()
+
+        async def call():
+            await released.wait()
+            return 'stations'
+
+        first = asyncio.ensure_future(scheduler.async_run(call, key='stations'))
+        second = asyncio.ensure_future(scheduler.async_run(call, key='stations'))
+        await asyncio.sleep(0)
+        first.cancel()
+        released.set()
+
+        self.assertEqual(await second, 'stations')
+        self.assertTrue(first.cancelled())
+
+    async def test_run_identical_request_again_once_completed(self):
+        scheduler = EVDutyRequestScheduler()
+        call = AsyncMock(return_value='stations')
+
+        await scheduler.async_run(call, key='stations')
+        await scheduler.async_run(call, key='stations')
+
+        self.assertEqual(call.call_count, 2)
+
+    @patch('custom_components.evduty.request_scheduler.REQUEST_TIMEOUT', 0.05)
+    async def test_timeout_excludes_time_waiting_for_logins(self):
+        scheduler = EVDutyRequestScheduler()
+
+        async def authenticate():
+            await asyncio.sleep(0.03)
+
+        await asyncio.gather(*(scheduler.async_run(AsyncMock(), authenticate=authenticate) for _ in range(3)))
+
+    @patch('custom_components.evduty.request_scheduler.REQUEST_TIMEOUT', 0.01)
+    async def test_timeout_slow_request(self):
+        scheduler = EVDutyRequestScheduler()
+
+        with self.assertRaises(TimeoutError):
+            await scheduler.async_run(lambda: asyncio.sleep(1))
+
+    async def test_share_scheduler_of_an_account(self):
+        hass = hass_mocks.hass_mock()
+
+        scheduler = async_get_request_scheduler(hass, 'User@example.com')
+
+        self.assertIs(async_get_request_scheduler(hass, 'user@example.com'), scheduler)
+        self.assertIsNot(async_get_request_scheduler(hass, 'other@example.com'), scheduler)
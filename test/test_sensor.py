@@ -1,6 +1,7 @@
-from datetime import datetime, timedelta
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 from unittest import IsolatedAsyncioTestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from evdutyapi import Terminal, ChargingStatus, ChargingSession, NetworkInfo
 from homeassistant.components.sensor import SensorStateClass, SensorDeviceClass
@@ -10,10 +11,11 @@ from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import slugify
 
-from custom_components.evduty import DOMAIN
-from custom_components.evduty.const import MANUFACTURER
-from custom_components.evduty.sensor import async_setup_entry, PowerSensor, AmpSensor, VoltSensor, EnergyConsumedSensor, ChargingStateSensor, ChargingSessionStartDateSensor, \
-    ChargingSessionDurationSensor, ChargingSessionEstimatedCostSensor, WifiSsidSensor, WifiRssiSensor, WifiIpSensor
+from custom_components.evduty import DOMAIN, EVDutyCoordinator
+from custom_components.evduty.const import MANUFACTURER, CONF_ENERGY_ESTIMATE_INTERVAL, CONF_LOCAL_SESSION_DURATION
+from custom_components.evduty.coordinator import SLOW_TIER
+from custom_components.evduty.health import CoordinatorHealth
+from custom_components.evduty.sensor import async_setup_entry, EVDutySensor, EnergyConsumedSensor, SessionDurationSensor
 
 
 class TestSensorCreation(IsolatedAsyncioTestCase):
@@ -21,7 +23,12 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         entry = Mock()
         entry.entry_id = 'id'
-        self.coordinator = Mock(DataUpdateCoordinator)
+        entry.title = 'user'
+        self.coordinator = Mock(EVDutyCoordinator)
+        self.coordinator.device_infos = {}
+        self.coordinator.health = CoordinatorHealth()
+        self.coordinator.config_entry = Mock()
+        self.coordinator.config_entry.options = {}
         self.terminal = Terminal(id='123',
                                  station_id='456',
                                  name='Test',
@@ -39,6 +46,8 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
                                                          cost=0.32),
                                  network_info=NetworkInfo(wifi_ssid="ssid", wifi_rssi=-72, ip_address="ip", mac_address="mac"))
         self.coordinator.data = {'123': self.terminal}
+        self.coordinator.last_update_success = True
+        self.coordinator.stale = False
         hass = Mock(HomeAssistant)
         hass.data = {DOMAIN: {entry.entry_id: self.coordinator}}
 
@@ -49,12 +58,13 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
         async_add_devices.assert_called_once()
 
         self.sensors = async_add_devices.call_args.args[0]
+        self.async_add_devices = async_add_devices
 
     async def test_add_sensors_on_setup(self):
-        self.assertEqual(len(self.sensors), 11)
+        self.assertEqual(len(self.sensors), 17)
 
     def test_power_sensor_created(self):
-        self.assert_sensor_created(type=PowerSensor,
+        self.assert_sensor_created(key='power',
                                    name='Power',
                                    state_class=SensorStateClass.MEASUREMENT,
                                    device_class=SensorDeviceClass.POWER,
@@ -62,21 +72,21 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
                                    value=960)
 
     def test_amp_sensor_created(self):
-        self.assert_sensor_created(type=AmpSensor,
+        self.assert_sensor_created(key='amp',
                                    name='Amp',
                                    device_class=SensorDeviceClass.CURRENT,
                                    unit=UnitOfElectricCurrent.AMPERE,
                                    value=8)
 
     def test_volt_sensor_created(self):
-        self.assert_sensor_created(type=VoltSensor,
+        self.assert_sensor_created(key='volt',
                                    name='Volt',
                                    device_class=SensorDeviceClass.VOLTAGE,
                                    unit=UnitOfElectricPotential.VOLT,
                                    value=120)
 
     def test_energy_consumed_sensor_created(self):
-        self.assert_sensor_created(type=EnergyConsumedSensor,
+        self.assert_sensor_created(key='energy_consumed',
                                    name='Energy Consumed',
                                    state_class=SensorStateClass.TOTAL_INCREASING,
                                    device_class=SensorDeviceClass.ENERGY,
@@ -85,27 +95,27 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
                                    value=2)
 
     def test_charging_state_sensor_created(self):
-        self.assert_sensor_created(type=ChargingStateSensor,
+        self.assert_sensor_created(key='state',
                                    name='State',
                                    device_class=SensorDeviceClass.ENUM,
                                    options=['Available', 'Charging', 'Offline'],
                                    value='Charging')
 
     def test_charging_session_start_date_sensor_created(self):
-        self.assert_sensor_created(type=ChargingSessionStartDateSensor,
+        self.assert_sensor_created(key='session_start_date',
                                    name='Session Start Date',
                                    device_class=SensorDeviceClass.TIMESTAMP,
                                    value=self.terminal.session.start_date)
 
     def test_charging_session_duration_sensor_created(self):
-        self.assert_sensor_created(type=ChargingSessionDurationSensor,
+        self.assert_sensor_created(key='session_duration',
                                    name='Session Duration',
                                    device_class=SensorDeviceClass.DURATION,
                                    unit=UnitOfTime.SECONDS,
                                    value=55)
 
     def test_estimated_cost_sensor_created(self):
-        self.assert_sensor_created(type=ChargingSessionEstimatedCostSensor,
+        self.assert_sensor_created(key='session_estimated_cost',
                                    name='Session Estimated Cost',
                                    state_class=SensorStateClass.TOTAL_INCREASING,
                                    unit='$',
@@ -113,27 +123,126 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
                                    value=0.32)
 
     def test_wifi_ip_sensor_created(self):
-        self.assert_sensor_created(type=WifiIpSensor,
+        self.assert_sensor_created(key='wifi_ip',
                                    name='Wi-Fi IP',
                                    entity_category=EntityCategory.DIAGNOSTIC,
+                                   enabled_default=False,
                                    value="ip")
 
     def test_wifi_ssid_sensor_created(self):
-        self.assert_sensor_created(type=WifiSsidSensor,
+        self.assert_sensor_created(key='wifi_ssid',
                                    name='Wi-Fi SSID',
                                    entity_category=EntityCategory.DIAGNOSTIC,
+                                   enabled_default=False,
                                    value="ssid")
 
     def test_wifi_rssi_sensor_created(self):
-        self.assert_sensor_created(type=WifiRssiSensor,
+        self.assert_sensor_created(key='wifi_rssi',
                                    name='Wi-Fi Signal Strength',
                                    entity_category=EntityCategory.DIAGNOSTIC,
+                                   enabled_default=False,
                                    device_class=SensorDeviceClass.SIGNAL_STRENGTH,
                                    unit=SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
                                    value=-72)
 
-    def assert_sensor_created(self, type, name, state_class=None, device_class=None, unit=None, precision=None, options=None, value=None, entity_category=None):
-        sensor = next(s for s in self.sensors if isinstance(s, type))
+    def test_add_sensors_of_new_terminals(self):
+        async_add_terminals = self.coordinator.async_add_terminals_listener.call_args.args[0]
+
+        async_add_terminals([replace(self.terminal, id='789', name='New')], [])
+
+        sensors = self.async_add_devices.call_args.args[0]
+        self.assertEqual(len(sensors), 11)
+        self.assertTrue(all(sensor._attr_name.startswith('EVduty New ') for sensor in sensors))
+
+    def test_network_sensors_listen_to_slow_tier(self):
+        contexts = {s.entity_description.key: s.coordinator_context for s in self.sensors if isinstance(s, EVDutySensor)}
+
+        self.assertEqual(contexts['power'], '123')
+        self.assertEqual(contexts['energy_consumed'], '123')
+        for key in ('wifi_ip', 'wifi_ssid', 'wifi_rssi'):
+            self.assertEqual(contexts[key], ('123', SLOW_TIER))
+
+    def test_poll_health_sensors_created(self):
+        self.coordinator.health.record_success(0.3)
+        self.coordinator.health.record_error(0.2)
+        self.coordinator.health.record_timeout(10)
+        self.coordinator.health.record_stale_return(0.1)
+
+        expected = {'poll_latency': ('Poll Latency', 0.1),
+                    'successful_polls': ('Successful Polls', 1),
+                    'failed_polls': ('Failed Polls', 1),
+                    'timed_out_polls': ('Timed Out Polls', 1),
+                    'stale_polls': ('Stale Polls', 1),
+                    'last_successful_poll': ('Last Successful Poll', self.coordinator.health.last_success)}
+        for key, (name, value) in expected.items():
+            sensor = next(s for s in self.sensors if s.entity_description.key == key)
+            self.assertEqual(sensor._attr_name, f'EVduty user {name}')
+            self.assertEqual(sensor._attr_unique_id, f'id_{slugify(name)}')
+            self.assertEqual(sensor.entity_category, EntityCategory.DIAGNOSTIC)
+            self.assertFalse(sensor.entity_registry_enabled_default)
+            self.assertIsNone(sensor.extra_state_attributes)
+            self.assertEqual(sensor.device_info['identifiers'], {(DOMAIN, 'id')})
+            self.assertEqual(sensor.native_value, value)
+
+    async def test_poll_health_sensors_write_state_on_health_update(self):
+        sensor = next(s for s in self.sensors if s.entity_description.key == 'successful_polls')
+        sensor.async_write_ha_state = Mock()
+        await sensor.async_added_to_hass()
+
+        self.coordinator.health.async_update_listeners()
+
+        sensor.async_write_ha_state.assert_called_once()
+
+    def test_write_state_when_value_changed(self):
+        sensor = self.coordinator_updated('power', power=1200)
+
+        sensor.async_write_ha_state.assert_called_once()
+        self.assertEqual(sensor.native_value, 1200)
+
+    def test_skip_state_write_when_value_unchanged(self):
+        sensor = self.coordinator_updated('power', volt=240)
+
+        sensor.async_write_ha_state.assert_not_called()
+        self.assertEqual(sensor._terminal, self.coordinator.data['123'])
+
+    def test_write_state_when_availability_changed(self):
+        self.coordinator.last_update_success = False
+        sensor = self.coordinator_updated('power')
+
+        sensor.async_write_ha_state.assert_called_once()
+
+    def test_write_state_when_stale_data_refreshed(self):
+        sensor = next(s for s in self.sensors if s.entity_description.key == 'power')
+        sensor._written_state = (True, True, sensor.native_value)
+        sensor.async_write_ha_state = Mock()
+
+        sensor._handle_coordinator_update()
+
+        sensor.async_write_ha_state.assert_called_once()
+        self.assertFalse(sensor.assumed_state)
+
+    def test_unavailable_when_terminal_vanished(self):
+        sensor = next(s for s in self.sensors if s.entity_description.key == 'power')
+        sensor._written_state = (True, False, sensor.native_value)
+        sensor.async_write_ha_state = Mock()
+        self.coordinator.data = {}
+
+        sensor._handle_coordinator_update()
+
+        sensor.async_write_ha_state.assert_called_once()
+        self.assertFalse(sensor.available)
+
+    def coordinator_updated(self, key, **session_changes):
+        sensor = next(s for s in self.sensors if s.entity_description.key == key)
+        sensor._written_state = (True, False, sensor.native_value)
+        sensor.async_write_ha_state = Mock()
+        self.coordinator.data = {'123': replace(self.terminal, session=replace(self.terminal.session, **session_changes))}
+        sensor._handle_coordinator_update()
+        return sensor
+
+    def assert_sensor_created(self, key, name, state_class=None, device_class=None, unit=None, precision=None, options=None, value=None, entity_category=None,
+                              enabled_default=True):
+        sensor = next(s for s in self.sensors if s.entity_description.key == key)
         self.assertEqual(sensor.coordinator, self.coordinator)
         self.assertEqual(sensor._terminal, self.terminal)
         self.assertEqual(sensor.device_info, DeviceInfo(identifiers={(DOMAIN, self.terminal.id)},
@@ -143,19 +252,212 @@ class TestSensorCreation(IsolatedAsyncioTestCase):
                                                         connections={('mac', 'mac')},
                                                         name='EVduty Test'))
         if state_class is not None:
-            self.assertEqual(sensor._attr_state_class, state_class)
+            self.assertEqual(sensor.state_class, state_class)
         if device_class is not None:
-            self.assertEqual(sensor._attr_device_class, device_class)
+            self.assertEqual(sensor.device_class, device_class)
         if unit is not None:
-            self.assertEqual(sensor._attr_native_unit_of_measurement, unit)
+            self.assertEqual(sensor.native_unit_of_measurement, unit)
         if precision is not None:
-            self.assertEqual(sensor._attr_suggested_display_precision, precision)
+            self.assertEqual(sensor.suggested_display_precision, precision)
         if options is not None:
-            self.assertEqual(sensor._attr_options, options)
+            self.assertEqual(sensor.options, options)
         if entity_category is not None:
-            self.assertEqual(sensor._attr_entity_category, entity_category)
+            self.assertEqual(sensor.entity_category, entity_category)
+        self.assertEqual(sensor.entity_registry_enabled_default, enabled_default)
 
         self.assertEqual(sensor._attr_name, f'EVduty Test {name}')
         self.assertEqual(sensor._attr_unique_id, f'evduty_test_{slugify(name)}')
 
         self.assertEqual(sensor.native_value, value)
+
+
+class TestEnergyConsumedEstimate(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.terminal = Terminal(id='123',
+                                 station_id='456',
+                                 name='Test',
+                                 status=ChargingStatus.in_use,
+                                 charge_box_identity='A',
+                                 firmware_version='1.2.3',
+                                 session=ChargingSession(is_active=True,
+                                                         is_charging=True,
+                                                         volt=240,
+                                                         amp=30,
+                                                         power=7200,
+                                                         energy_consumed=2000,
+                                                         start_date=datetime.now(),
+                                                         duration=timedelta(minutes=20),
+                                                         cost=0.32),
+                                 network_info=NetworkInfo(wifi_ssid="ssid", wifi_rssi=-72, ip_address="ip", mac_address="mac"))
+        self.coordinator = Mock(DataUpdateCoordinator)
+        self.coordinator.device_infos = {}
+        self.coordinator.data = {'123': self.terminal}
+        self.coordinator.last_update_success = True
+        self.coordinator.stale = False
+        self.coordinator.config_entry = Mock()
+        self.coordinator.config_entry.options = {CONF_ENERGY_ESTIMATE_INTERVAL: 5}
+        self.coordinator.update_interval = timedelta(minutes=10)
+        self.sensor = EnergyConsumedSensor(self.coordinator, self.terminal)
+        self.sensor.hass = Mock(HomeAssistant)
+        self.sensor.async_write_ha_state = Mock()
+        self.reading_time = datetime(2024, 1, 1, 12)
+        self.sensor._reading_time = self.reading_time
+
+    @patch('custom_components.evduty.sensor.async_track_time_interval')
+    async def test_estimate_energy_at_configured_interval(self, async_track_time_interval):
+        await self.sensor.async_added_to_hass()
+
+        async_track_time_interval.assert_called_once_with(self.sensor.hass, self.sensor._async_estimate_energy, timedelta(seconds=5))
+
+    @patch('custom_components.evduty.sensor.async_track_time_interval')
+    async def test_does_not_estimate_energy_by_default(self, async_track_time_interval):
+        self.coordinator.config_entry.options = {}
+
+        await self.sensor.async_added_to_hass()
+
+        async_track_time_interval.assert_not_called()
+
+    def test_project_energy_from_last_power_reading(self):
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=10))
+
+        self.assertEqual(self.sensor.native_value, 3.2)
+        self.sensor.async_write_ha_state.assert_called_once()
+
+    def test_does_not_estimate_energy_when_not_charging(self):
+        self.sensor._terminal = replace(self.terminal, status=ChargingStatus.available)
+
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=10))
+
+        self.assertEqual(self.sensor.native_value, 2)
+
+    def test_stop_projecting_one_refresh_interval_after_last_reading(self):
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=30))
+
+        self.assertEqual(self.sensor.native_value, 3.2)
+
+    def test_does_not_estimate_energy_when_refresh_failed(self):
+        self.coordinator.last_update_success = False
+
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=10))
+
+        self.assertEqual(self.sensor.native_value, 2)
+        self.sensor.async_write_ha_state.assert_not_called()
+
+    def test_clamp_estimate_to_one_refresh_interval_above_reading(self):
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=10))
+
+        self.coordinator_updated(energy_consumed=2100, power=3600)
+
+        self.assertEqual(self.sensor.native_value, 2.7)
+
+    def test_hold_estimate_until_reading_catches_up(self):
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=10))
+
+        self.coordinator_updated(energy_consumed=3000)
+        self.assertEqual(self.sensor.native_value, 3.2)
+
+        self.coordinator_updated(energy_consumed=3300)
+        self.assertEqual(self.sensor.native_value, 3.3)
+        self.assertIsNone(self.sensor._estimated_energy)
+
+    def test_reset_estimate_on_new_session(self):
+        self.sensor._async_estimate_energy(self.reading_time + timedelta(minutes=10))
+
+        self.coordinator_updated(energy_consumed=0)
+
+        self.assertEqual(self.sensor.native_value, 0)
+
+    def coordinator_updated(self, **session_changes):
+        self.coordinator.data = {'123': replace(self.terminal, session=replace(self.terminal.session, **session_changes))}
+        self.sensor._handle_coordinator_update()
+
+
+@patch('custom_components.evduty.sensor.dt_util.utcnow', return_value=datetime(2024, 1, 1, 12, 30, 20, tzinfo=timezone.utc))
+class TestLocalSessionDuration(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.start_date = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        self.terminal = Terminal(id='123',
+                                 station_id='456',
+                                 name='Test',
+                                 status=ChargingStatus.in_use,
+                                 charge_box_identity='A',
+                                 firmware_version='1.2.3',
+                                 session=ChargingSession(is_active=True,
+                                                         is_charging=True,
+                                                         volt=240,
+                                                         amp=30,
+                                                         power=7200,
+                                                         energy_consumed=2000,
+                                                         start_date=self.start_date,
+                                                         duration=timedelta(minutes=20),
+                                                         cost=0.32),
+                                 network_info=NetworkInfo(wifi_ssid="ssid", wifi_rssi=-72, ip_address="ip", mac_address="mac"))
+        self.coordinator = Mock(DataUpdateCoordinator)
+        self.coordinator.device_infos = {}
+        self.coordinator.data = {'123': self.terminal}
+        self.coordinator.last_update_success = True
+        self.coordinator.stale = False
+        self.coordinator.config_entry = Mock()
+        self.coordinator.config_entry.options = {CONF_LOCAL_SESSION_DURATION: True}
+        self.sensor = SessionDurationSensor(self.coordinator, self.terminal)
+        self.sensor.async_write_ha_state = Mock()
+        with patch('custom_components.evduty.sensor.dt_util.utcnow', return_value=datetime(2024, 1, 1, 12, 30, 20, tzinfo=timezone.utc)):
+            self.sensor._written_state = self.sensor._state()
+
+    def test_duration_computed_from_start_date(self, _):
+        self.assertEqual(self.sensor.native_value, 1820)
+
+    def test_skip_state_write_while_session_goes_on(self, utcnow):
+        utcnow.return_value = datetime(2024, 1, 1, 12, 35, 5, tzinfo=timezone.utc)
+
+        self.coordinator_updated(duration=timedelta(minutes=25), energy_consumed=2500)
+
+        self.sensor.async_write_ha_state.assert_not_called()
+        self.assertEqual(self.sensor.native_value, 2105)
+
+    def test_keep_local_duration_when_session_is_cleared(self, utcnow):
+        utcnow.return_value = datetime(2024, 1, 1, 12, 45, tzinfo=timezone.utc)
+        self.coordinator.data = {'123': replace(self.terminal, status=ChargingStatus.available, session=ChargingSession.no_session())}
+
+        self.sensor._handle_coordinator_update()
+
+        self.sensor.async_write_ha_state.assert_called_once()
+        self.assertEqual(self.sensor.native_value, 2700)
+        utcnow.return_value = datetime(2024, 1, 1, 13, 45, tzinfo=timezone.utc)
+        self.assertEqual(self.sensor.native_value, 2700)
+
+    def test_use_reported_duration_when_session_is_kept(self, utcnow):
+        utcnow.return_value = datetime(2024, 1, 1, 12, 45, tzinfo=timezone.utc)
+        self.coordinator.data = {'123': replace(self.terminal, status=ChargingStatus.available, session=replace(self.terminal.session, is_active=False,
+                                                                                                                duration=timedelta(minutes=44)))}
+
+        self.sensor._handle_coordinator_update()
+
+        self.assertEqual(self.sensor.native_value, 2640)
+        utcnow.return_value = datetime(2024, 1, 1, 13, 45, tzinfo=timezone.utc)
+        self.coordinator.data = {'123': replace(self.coordinator.data['123'], session=replace(self.coordinator.data['123'].session, energy_consumed=2600))}
+        self.sensor._handle_coordinator_update()
+        self.assertEqual(self.sensor.native_value, 2640)
+
+    def test_count_new_session_from_its_start_date(self, utcnow):
+        self.coordinator.data = {'123': replace(self.terminal, status=ChargingStatus.available, session=ChargingSession.no_session())}
+        self.sensor._handle_coordinator_update()
+
+        utcnow.return_value = datetime(2024, 1, 1, 14, 10, tzinfo=timezone.utc)
+        self.coordinator.data = {'123': replace(self.terminal, session=replace(self.terminal.session, start_date=datetime(2024, 1, 1, 14, tzinfo=timezone.utc)))}
+        self.sensor._handle_coordinator_update()
+
+        self.assertEqual(self.sensor.async_write_ha_state.call_count, 2)
+        self.assertEqual(self.sensor.native_value, 600)
+
+    def coordinator_updated(self, **session_changes):
+        self.coordinator.data = {'123': replace(self.terminal, session=replace(self.terminal.session, **session_changes))}
+        self.sensor._handle_coordinator_update()
+
+    def test_use_reported_duration_by_default(self, _):
+        self.coordinator.config_entry.options = {}
+        sensor = SessionDurationSensor(self.coordinator, self.terminal)
+
+        self.assertEqual(sensor.native_value, 1200)
@@ -0,0 +1,208 @@
+from datetime import datetime, time, timezone
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch, AsyncMock, Mock
+
+import voluptuous as vol
+
+from evdutyapi import Terminal, ChargingProfile
+from homeassistant.core import ServiceCall, SupportsResponse, State
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers.device_registry import DeviceEntry
+
+from custom_components.evduty import DOMAIN, EVDutyCoordinator
+from custom_components.evduty.charging_planner import EVDutyChargingPlanner, ChargingPlan
+from custom_components.evduty.const import DATA_CHARGING_PLANNERS
+from custom_components.evduty.services import async_setup_services, next_departure, SERVICE_SET_MAX_CURRENT, SET_MAX_CURRENT_SCHEMA, SERVICE_PLAN_CHARGING, \
+    PLAN_CHARGING_SCHEMA, SERVICE_CLEAR_CHARGING_PLAN, CLEAR_CHARGING_PLAN_SCHEMA
+from test import hass_mocks
+
+DEPARTURE = datetime(2024, 1, 2, 12, 0, tzinfo=timezone.utc)
+
+
+class SetMaxCurrentServiceTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hass = hass_mocks.hass_mock()
+        self.hass.services = Mock()
+        self.account_1 = self.coordinator_mock('account-1', [self.terminal('1', 'station-1'), self.terminal('2', 'station-1')])
+        self.account_2 = self.coordinator_mock('account-2', [self.terminal('3', 'station-2', current_max=32)])
+        self.hass.data = {DOMAIN: {'account-1': self.account_1, 'account-2': self.account_2}}
+
+        async_setup_services(self.hass)
+
+        self.service = registered_service(self.hass, SERVICE_SET_MAX_CURRENT)
+
+    def test_registers_service(self):
+        self.hass.services.async_register.assert_any_call(DOMAIN, SERVICE_SET_MAX_CURRENT, self.service, schema=SET_MAX_CURRENT_SCHEMA,
+                                                          supports_response=SupportsResponse.OPTIONAL)
+
+    @patch('custom_components.evduty.services.dr.async_get')
+    async def test_sets_current_of_selected_devices(self, device_registry_get):
+        device_registry_get.return_value.async_get.side_effect = lambda device_id: {
+            'device-1': DeviceEntry(identifiers={(DOMAIN, '1')}),
+            'device-3': DeviceEntry(identifiers={(DOMAIN, '3')}),
+        }.get(device_id)
+
+        response = await self.call_service({'current': 40, 'device_id': ['device-1', 'device-3', 'unknown']})
+
+        self.account_1.async_set_terminals_max_charging_current.assert_called_once_with({'1': 40})
+        self.account_2.async_set_terminals_max_charging_current.assert_called_once_with({'3': 32})
+        self.assertEqual(response, {'terminals': {'1': {'name': 'Terminal 1', 'current': 40, 'error': None},
+                                                  '3': {'name': 'Terminal 3', 'current': 32, 'error': None}}})
+
+    async def test_sets_current_of_station_terminals(self):
+        await self.call_service({'current': 16, 'station_id': 'station-1'})
+
+        self.account_1.async_set_terminals_max_charging_current.assert_called_once_with({'1': 16, '2': 16})
+        self.account_2.async_set_terminals_max_charging_current.assert_not_called()
+
+    async def test_sets_current_of_account_terminals(self):
+        self.account_2.async_set_terminals_max_charging_current.side_effect = lambda currents: {'3': 'cannot_connect'}
+
+        response = await self.call_service({'current': 16, 'config_entry_id': 'account-2'})
+
+        self.account_1.async_set_terminals_max_charging_current.assert_not_called()
+        self.assertEqual(response, {'terminals': {'3': {'name': 'Terminal 3', 'current': 16, 'error': 'cannot_connect'}}})
+
+    async def test_skip_accounts_without_data(self):
+        self.account_1.data = None
+
+        response = await self.call_service({'current': 16, 'config_entry_id': ['account-1', 'account-2']})
+
+        self.assertEqual(response, {'terminals': {'3': {'name': 'Terminal 3', 'current': 16, 'error': None}}})
+
+    async def test_report_terminals_removed_during_the_writes(self):
+        async def write(currents):
+            self.account_2.data = {}
+            return {'3': None}
+
+        self.account_2.async_set_terminals_max_charging_current.side_effect = write
+
+        response = await self.call_service({'current': 16, 'config_entry_id': 'account-2'})
+
+        self.assertEqual(response, {'terminals': {'3': {'name': 'Terminal 3', 'current': 16, 'error': None}}})
+
+    async def test_raise_when_no_terminal_selected(self):
+        with self.assertRaises(ServiceValidationError):
+            await self.call_service({'current': 16, 'station_id': 'unknown'})
+
+    async def call_service(self, data):
+        call = Mock(ServiceCall)
+        call.data = SET_MAX_CURRENT_SCHEMA(data)
+        return await self.service(call)
+
+    @staticmethod
+    def coordinator_mock(entry_id, terminals):
+        coordinator = Mock(EVDutyCoordinator)
+        coordinator.config_entry = hass_mocks.config_entry_mock(id=entry_id)
+        coordinator.data = {terminal.id: terminal for terminal in terminals}
+        coordinator.async_set_terminals_max_charging_current = AsyncMock(side_effect=lambda currents: {terminal_id: None for terminal_id in currents})
+        return coordinator
+
+    @staticmethod
+    def terminal(terminal_id, station_id, current_max=48):
+        terminal = Mock(Terminal)
+        terminal.id = terminal_id
+        terminal.station_id = station_id
+        terminal.name = f'Terminal {terminal_id}'
+        terminal.charging_profile = ChargingProfile(power_limitation=True, current_limit=current_max, current_max=current_max)
+        return terminal
+
+
+@patch('custom_components.evduty.services.dr.async_get')
+class ChargingPlanServicesTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hass = hass_mocks.hass_mock()
+        self.hass.services = Mock()
+        self.hass.states = Mock()
+        self.account = SetMaxCurrentServiceTest.coordinator_mock('account', [SetMaxCurrentServiceTest.terminal('1', 'station-1')])
+        self.planner = Mock(EVDutyChargingPlanner)
+        self.planner.async_set_plan.side_effect = lambda terminal_id, energy, departure, tariff, price_entity: ChargingPlan(
+            energy=energy, departure=departure, tariff=tariff, price_entity=price_entity, prices=(), setpoints=((DEPARTURE.replace(hour=4), 48),))
+        self.hass.data = {DOMAIN: {'account': self.account}, DATA_CHARGING_PLANNERS: {'account': self.planner}}
+
+        async_setup_services(self.hass)
+
+    def test_registers_services(self, _):
+        self.hass.services.async_register.assert_any_call(DOMAIN, SERVICE_PLAN_CHARGING, registered_service(self.hass, SERVICE_PLAN_CHARGING),
+                                                          schema=PLAN_CHARGING_SCHEMA, supports_response=SupportsResponse.OPTIONAL)
+        self.hass.services.async_register.assert_any_call(DOMAIN, SERVICE_CLEAR_CHARGING_PLAN, registered_service(self.hass, SERVICE_CLEAR_CHARGING_PLAN),
+                                                          schema=CLEAR_CHARGING_PLAN_SCHEMA)
+
+    def test_requires_tariff_or_price_entity(self, _):
+        with self.assertRaises(vol.Invalid):
+            PLAN_CHARGING_SCHEMA({'device_id': 'device-1', 'energy': 20, 'departure': '07:00'})
+        with self.assertRaises(vol.Invalid):
+            PLAN_CHARGING_SCHEMA({'device_id': 'device-1', 'energy': 20, 'departure': '07:00', 'tariff': {'00:00': 0.08}, 'price_entity': 'sensor.price'})
+
+    @patch('custom_components.evduty.services.next_departure', return_value=DEPARTURE)
+    async def test_plans_selected_terminals_with_tariff(self, _, device_registry_get):
+        self.select_devices(device_registry_get)
+
+        response = await self.call_service(SERVICE_PLAN_CHARGING, PLAN_CHARGING_SCHEMA,
+                                           {'device_id': 'device-1', 'energy': 20, 'departure': '07:00', 'tariff': {'07:00': 0.20, '00:00': 0.08}})
+
+        self.planner.async_set_plan.assert_called_once_with('1', 20.0, DEPARTURE, (('00:00:00', 0.08), ('07:00:00', 0.2)), None)
+        self.assertEqual(response, {'terminals': {'1': {'name': 'Terminal 1', 'departure': '2024-01-02T12:00:00+00:00',
+                                                        'setpoints': [{'start': '2024-01-02T04:00:00+00:00', 'current': 48}]}}})
+
+    @patch('custom_components.evduty.services.next_departure', return_value=DEPARTURE)
+    async def test_plans_with_price_entity_forecast(self, _, device_registry_get):
+        self.select_devices(device_registry_get)
+        self.hass.states.get.return_value = State('sensor.price', '0.1', {'prices': [{'start': '2024-01-02T00:00:00+00:00', 'price': 0.1}]})
+
+        await self.call_service(SERVICE_PLAN_CHARGING, PLAN_CHARGING_SCHEMA, {'device_id': 'device-1', 'energy': 20, 'departure': '07:00', 'price_entity': 'sensor.price'})
+
+        self.planner.async_set_plan.assert_called_once_with('1', 20.0, DEPARTURE, None, 'sensor.price')
+
+    async def test_raise_when_price_entity_has_no_forecast(self, device_registry_get):
+        self.select_devices(device_registry_get)
+        self.hass.states.get.return_value = State('sensor.price', '0.1')
+
+        with self.assertRaises(ServiceValidationError):
+            await self.call_service(SERVICE_PLAN_CHARGING, PLAN_CHARGING_SCHEMA, {'device_id': 'device-1', 'energy': 20, 'departure': '07:00', 'price_entity': 'sensor.price'})
+
+        self.planner.async_set_plan.assert_not_called()
+
+    @patch('custom_components.evduty.services.next_departure', return_value=DEPARTURE)
+    async def test_skip_accounts_without_data(self, _, device_registry_get):
+        self.select_devices(device_registry_get)
+        self.hass.data[DOMAIN]['offline'] = SetMaxCurrentServiceTest.coordinator_mock('offline', [])
+        self.hass.data[DOMAIN]['offline'].data = None
+        self.hass.data[DATA_CHARGING_PLANNERS]['offline'] = Mock(EVDutyChargingPlanner)
+
+        response = await self.call_service(SERVICE_PLAN_CHARGING, PLAN_CHARGING_SCHEMA, {'device_id': 'device-1', 'energy': 20, 'departure': '07:00', 'tariff': {'00:00': 0.08}})
+
+        self.assertEqual(list(response['terminals']), ['1'])
+
+    async def test_raise_when_no_terminal_planned(self, device_registry_get):
+        device_registry_get.return_value.async_get.return_value = None
+
+        with self.assertRaises(ServiceValidationError):
+            await self.call_service(SERVICE_PLAN_CHARGING, PLAN_CHARGING_SCHEMA, {'device_id': 'unknown', 'energy': 20, 'departure': '07:00', 'tariff': {'00:00': 0.08}})
+
+    async def test_clears_plans_of_selected_terminals(self, device_registry_get):
+        self.select_devices(device_registry_get)
+
+        await self.call_service(SERVICE_CLEAR_CHARGING_PLAN, CLEAR_CHARGING_PLAN_SCHEMA, {'device_id': 'device-1'})
+
+        self.planner.async_clear_plan.assert_called_once_with('1')
+
+    @patch('custom_components.evduty.services.dt_util.now', return_value=datetime(2024, 1, 2, 6, 30, tzinfo=timezone.utc))
+    def test_departure_is_the_next_occurrence_of_its_time(self, _, __):
+        self.assertEqual(next_departure(time(7, 0)), datetime(2024, 1, 2, 7, 0, tzinfo=timezone.utc))
+        self.assertEqual(next_departure(time(6, 0)), datetime(2024, 1, 3, 6, 0, tzinfo=timezone.utc))
+
+    @staticmethod
+    def select_devices(device_registry_get):
+        device_registry_get.return_value.async_get.side_effect = lambda device_id: {'device-1': DeviceEntry(identifiers={(DOMAIN, '1')})}.get(device_id)
+
+    async def call_service(self, name, schema, data):
+        call = Mock(ServiceCall)
+        call.data = schema(data)
+        return await registered_service(self.hass, name)(call)
+
+
+def registered_service(hass, name):
+    return next(call.args[2] for call in hass.services.async_register.call_args_list if call.args[1] == name)
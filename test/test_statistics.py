@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import Mock, AsyncMock, patch
+
+from evdutyapi import Terminal, ChargingStatus, ChargingSession
+
+from custom_components.evduty.statistics import EVDutySessionStatistics, completed_sessions
+from test import hass_mocks
+
+START = datetime(2024, 1, 1, 20, 10, tzinfo=timezone.utc)
+
+
+class CompletedSessionsTest(IsolatedAsyncioTestCase):
+
+    def test_session_completed_when_terminal_stops_charging(self):
+        charging = terminal(ChargingStatus.in_use, session(START))
+
+        self.assertEqual(completed_sessions({'1': charging}, {'1': terminal(ChargingStatus.available, ChargingSession.no_session())}), [(charging, charging.session)])
+
+    def test_session_completed_when_another_session_starts(self):
+        charging = terminal(ChargingStatus.in_use, session(START))
+        charging_again = terminal(ChargingStatus.in_use, session(START + timedelta(hours=5)))
+
+        self.assertEqual(completed_sessions({'1': charging}, {'1': charging_again}), [(charging, charging.session)])
+
+    def test_session_not_completed_while_charging(self):
+        charging = terminal(ChargingStatus.in_use, session(START))
+
+        self.assertEqual(completed_sessions({'1': charging}, {'1': terminal(ChargingStatus.in_use, session(START, energy_consumed=9000))}), [])
+
+    def test_session_completed_when_it_is_no_longer_active(self):
+        charging = terminal(ChargingStatus.in_use, session(START))
+        ended = terminal(ChargingStatus.available, session(START, is_active=False))
+
+        self.assertEqual(completed_sessions({'1': charging}, {'1': ended}), [(charging, charging.session)])
+
+    def test_session_not_completed_twice_when_session_cleared_after_charging(self):
+        ended = terminal(ChargingStatus.available, session(START, is_active=False))
+
+        self.assertEqual(completed_sessions({'1': ended}, {'1': terminal(ChargingStatus.available, ChargingSession.no_session())}), [])
+
+    def test_paused_session_completed_once_when_it_ends(self):
+        charging = terminal(ChargingStatus.in_use, session(START))
+        paused = terminal(ChargingStatus.available, session(START, energy_consumed=8000))
+        resumed = terminal(ChargingStatus.in_use, session(START, energy_consumed=8000))
+        ended = terminal(ChargingStatus.available, session(START, energy_consumed=9000, is_active=False))
+        cleared = terminal(ChargingStatus.available, ChargingSession.no_session())
+
+        self.assertEqual(completed_sessions({'1': charging}, {'1': paused}), [])
+        self.assertEqual(completed_sessions({'1': paused}, {'1': resumed}), [])
+        self.assertEqual(completed_sessions({'1': resumed}, {'1': ended}), [(resumed, resumed.session)])
+        self.assertEqual(completed_sessions({'1': ended}, {'1': cleared}), [])
+
+    def test_no_session_completed_without_previous_data_or_for_vanished_terminals(self):
+        charging = terminal(ChargingStatus.in_use, session(START))
+
+        self.assertEqual(completed_sessions(None, {'1': charging}), [])
+        self.assertEqual(completed_sessions({'1': charging}, {}), [])
+
+
+class EVDutySessionStatisticsTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        add_patcher = patch('custom_components.evduty.statistics.async_add_external_statistics')
+        self.async_add_external_statistics = add_patcher.start()
+        self.addCleanup(add_patcher.stop)
+        instance_patcher = patch('custom_components.evduty.statistics.get_instance')
+        self.recorder = instance_patcher.start().return_value
+        self.addCleanup(instance_patcher.stop)
+        self.recorder.async_add_executor_job = AsyncMock(return_value={})
+        self.statistics = EVDutySessionStatistics(hass_mocks.hass_mock())
+
+    async def test_import_energy_cost_and_duration_at_the_hour_the_session_ended(self):
+        await self.statistics.async_import_sessions([(terminal(ChargingStatus.in_use, session(START)), session(START))])
+
+        imported = self.imported()
+        self.assertEqual(imported.keys(), {'evduty:1_session_energy', 'evduty:1_session_cost', 'evduty:1_session_duration'})
+        metadata, rows = imported['evduty:1_session_energy']
+        self.assertEqual(metadata['name'], 'EVduty Test Session Energy')
+        self.assertEqual(metadata['source'], 'evduty')
+        self.assertEqual(metadata['unit_of_measurement'], 'kWh')
+        self.assertTrue(metadata['has_sum'])
+        self.assertEqual(rows, [{'start': datetime(2024, 1, 1, 21, tzinfo=timezone.utc), 'state': 7.2, 'sum': 7.2}])
+        self.assertEqual(imported['evduty:1_session_cost'][1][0]['sum'], 0.72)
+        self.assertEqual(imported['evduty:1_session_duration'][1][0]['sum'], 1.5)
+        self.assertEqual(self.statistics.imported, 1)
+
+    async def test_continue_the_last_recorded_sum(self):
+        self.recorder.async_add_executor_job = AsyncMock(
+            side_effect=lambda _, hass, count, statistic_id, *args: {statistic_id: [{'start': START.timestamp() - 86400, 'sum': 10}]})
+
+        await self.statistics.async_import_sessions([(terminal(ChargingStatus.in_use, session(START)), session(START))])
+        await self.statistics.async_import_sessions([(terminal(ChargingStatus.in_use, session(START)), session(START + timedelta(hours=5)))])
+
+        sums = [call.args[2][0]['sum'] for call in self.async_add_external_statistics.call_args_list if call.args[1]['statistic_id'] == 'evduty:1_session_energy']
+        self.assertEqual(sums, [17.2, 24.4])
+        self.assertEqual(self.recorder.async_add_executor_job.await_count, 3)
+
+    async def test_skip_sessions_ended_before_the_last_recorded_sum(self):
+        self.recorder.async_add_executor_job = AsyncMock(
+            side_effect=lambda _, hass, count, statistic_id, *args: {statistic_id: [{'start': START.timestamp() + 86400, 'sum': 10}]})
+
+        await self.statistics.async_import_sessions([(terminal(ChargingStatus.in_use, session(START)), session(START))])
+
+        self.async_add_external_statistics.assert_not_called()
+
+    def imported(self):
+        return {call.args[1]['statistic_id']: (call.args[1], call.args[2]) for call in self.async_add_external_statistics.call_args_list}
+
+
+def terminal(status, charging_session):
+    terminal = Mock(Terminal)
+    terminal.id = '1'
+    terminal.name = 'Test'
+    terminal.status = status
+    terminal.session = charging_session
+    return terminal
+
+
+def session(start_date, energy_consumed=7200, is_active=True):
+    return ChargingSession(is_active=is_active, is_charging=True, volt=240, amp=20, power=4800, energy_consumed=energy_consumed, start_date=start_date,
+                           duration=timedelta(minutes=90), cost=0.72)
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch, AsyncMock, Mock
+from zoneinfo import ZoneInfo
+
+from evdutyapi import EVDutyApi, Terminal, ChargingStatus, ChargingSession, NetworkInfo, ChargingProfile
+
+from custom_components.evduty.storage import EVDutyStore
+from test import hass_mocks
+
+
+class EVDutyStoreTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        store_patcher = patch('custom_components.evduty.storage.Store')
+        store_constructor = store_patcher.start()
+        self.addCleanup(store_patcher.stop)
+        self.store = AsyncMock()
+        self.store.async_delay_save = Mock()
+        store_constructor.return_value = self.store
+        self.hass = hass_mocks.hass_mock()
+        self.api = EVDutyApi('username', 'password', AsyncMock())
+
+    async def test_restore_valid_token(self):
+        expires_at = datetime.now() + timedelta(hours=1)
+        evduty_store = await self.evduty_store_with({'token': {'authorization': 'Bearer token', 'expires_at': expires_at.timestamp()}})
+
+        restored = evduty_store.restore_token(self.api)
+
+        self.assertTrue(restored)
+        self.assertEqual(self.api.headers['Authorization'], 'Bearer token')
+        self.assertEqual(self.api.expires_at, expires_at)
+
+    async def test_does_not_restore_expired_token(self):
+        expires_at = datetime.now() - timedelta(seconds=1)
+        evduty_store = await self.evduty_store_with({'token': {'authorization': 'Bearer token', 'expires_at': expires_at.timestamp()}})
+
+        restored = evduty_store.restore_token(self.api)
+
+        self.assertFalse(restored)
+        self.assertNotIn('Authorization', self.api.headers)
+
+    async def test_does_not_restore_missing_token(self):
+        evduty_store = await self.evduty_store_with(None)
+
+        self.assertFalse(evduty_store.restore_token(self.api))
+
+    async def test_save_changed_token(self):
+        evduty_store = await self.evduty_store_with(None)
+        self.api.headers['Authorization'] = 'Bearer token'
+        self.api.expires_at = datetime.now() + timedelta(hours=1)
+
+        evduty_store.async_save_token(self.api)
+        evduty_store.async_save_token(self.api)
+
+        self.store.async_delay_save.assert_called_once()
+        data = self.store.async_delay_save.call_args.args[0]()
+        self.assertEqual(data, {'token': {'authorization': 'Bearer token', 'expires_at': self.api.expires_at.timestamp()}})
+
+    async def test_does_not_save_missing_token(self):
+        evduty_store = await self.evduty_store_with(None)
+
+        evduty_store.async_save_token(self.api)
+
+        self.store.async_delay_save.assert_not_called()
+
+    async def test_clear_token(self):
+        evduty_store = await self.evduty_store_with({'token': {'authorization': 'Bearer token', 'expires_at': 0}})
+
+        evduty_store.async_clear_token()
+
+        data = self.store.async_delay_save.call_args.args[0]()
+        self.assertEqual(data, {})
+
+    async def test_restore_saved_terminals(self):
+        terminal = Terminal(id='123',
+                            station_id='456',
+                            name='Test',
+                            status=ChargingStatus.in_use,
+                            charge_box_identity='A',
+                            firmware_version='1.2.3',
+                            session=ChargingSession(is_active=True,
+                                                    is_charging=True,
+                                                    volt=240,
+                                                    amp=30,
+                                                    power=7200,
+                                                    energy_consumed=2000,
+                                                    start_date=datetime(2024, 1, 2, 3, 4, 5, tzinfo=ZoneInfo('US/Eastern')),
+                                                    duration=timedelta(seconds=55),
+                                                    cost=0.32),
+                            network_info=NetworkInfo(wifi_ssid='ssid', wifi_rssi=-72, ip_address='ip', mac_address='mac'),
+                            charging_profile=ChargingProfile(power_limitation=True, current_limit=15, current_max=50))
+        idle_terminal = Terminal(id='789', station_id='456', name='Idle', status=ChargingStatus.available, charge_box_identity='B', firmware_version='1.2.3',
+                                 session=ChargingSession.no_session())
+        evduty_store = await self.evduty_store_with(None)
+
+        evduty_store.async_save_terminals({'123': terminal, '789': idle_terminal})
+        saved = self.store.async_delay_save.call_args.args[0]()
+        restored = (await self.evduty_store_with(saved)).restore_terminals()
+
+        self.assertEqual(restored, {'123': terminal, '789': idle_terminal})
+
+    async def test_does_not_restore_missing_terminals(self):
+        evduty_store = await self.evduty_store_with({})
+
+        self.assertIsNone(evduty_store.restore_terminals())
+
+    async def test_does_not_restore_invalid_terminals(self):
+        evduty_store = await self.evduty_store_with({'terminals': [['123']]})
+
+        self.assertIsNone(evduty_store.restore_terminals())
+
+    async def test_save_and_restore_plans(self):
+        evduty_store = await self.evduty_store_with({'token': {'authorization': 'Bearer token', 'expires_at': 0}})
+        plans = {'123': {'energy': 20, 'departure': '2024-01-02T12:00:00+00:00'}}
+
+        evduty_store.async_save_plans(plans)
+
+        self.assertEqual(evduty_store.restore_plans(), plans)
+        self.assertEqual(self.store.async_delay_save.call_args.args[0](), {'token': {'authorization': 'Bearer token', 'expires_at': 0}, 'plans': plans})
+
+    async def test_restore_no_plans_by_default(self):
+        evduty_store = await self.evduty_store_with({})
+
+        self.assertEqual(evduty_store.restore_plans(), {})
+
+    async def evduty_store_with(self, data):
+        self.store.async_load.return_value = data
+        evduty_store = EVDutyStore(self.hass, 'entry')
+        await evduty_store.async_load()
+        return evduty_store
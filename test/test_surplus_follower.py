@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from math import exp
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
+
+from evdutyapi import Terminal, ChargingStatus, ChargingProfile, ChargingSession
+from homeassistant.core import Event, State
+
+from custom_components.evduty import EVDutyCoordinator
+from custom_components.evduty.load_balancer import EVDutyLoadBalancer
+from custom_components.evduty.surplus_follower import EVDutySurplusFollower
+from test import hass_mocks
+
+
+@patch('custom_components.evduty.surplus_follower.async_call_later')
+@patch('custom_components.evduty.surplus_follower.monotonic', return_value=1000)
+class EVDutySurplusFollowerTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hass = hass_mocks.hass_mock()
+        self.hass.async_create_task = MagicMock(side_effect=lambda coroutine, name: coroutine)
+        self.coordinator = Mock(EVDutyCoordinator)
+        self.coordinator.async_set_terminals_max_charging_current = AsyncMock(side_effect=lambda currents: {terminal_id: None for terminal_id in currents})
+        self.coordinator.data = terminals(('1', ChargingStatus.in_use, 0))
+        self.follower = EVDutySurplusFollower(self.hass, self.coordinator, 'sensor.grid_export', 300, 2)
+
+    async def test_follow_surplus_clamped_to_terminal_max(self, monotonic, _):
+        await self.surplus_changed('4800')
+        self.assertWritten({'1': 20})
+
+        self.coordinator.data = terminals(('1', ChargingStatus.in_use, 20))
+        monotonic.return_value = 10000
+        await self.surplus_changed('100000')
+        self.assertWritten({'1': 48})
+
+    async def test_count_the_power_drawn_by_charging_terminals_as_surplus(self, _, __):
+        self.coordinator.data = terminals(('1', ChargingStatus.in_use, 30, 7200))
+
+        await self.surplus_changed('0')
+
+        self.assertEqual(self.follower.surplus, 7200)
+        self.coordinator.async_set_terminals_max_charging_current.assert_not_called()
+
+    async def test_smooth_surplus_over_time(self, monotonic, _):
+        await self.surplus_changed('4800')
+        monotonic.return_value = 1120
+
+        await self.surplus_changed('2400')
+
+        self.assertAlmostEqual(self.follower.surplus, 4800 - 2400 * (1 - exp(-1)))
+
+    async def test_skip_changes_within_deadband(self, _, __):
+        self.coordinator.data = terminals(('1', ChargingStatus.in_use, 21))
+
+        await self.surplus_changed('4800')
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_not_called()
+
+    async def test_wait_for_write_interval_between_writes(self, monotonic, async_call_later):
+        await self.surplus_changed('4800')
+        self.assertWritten({'1': 20})
+        self.coordinator.data = terminals(('1', ChargingStatus.in_use, 20))
+
+        monotonic.return_value = 1100
+        await self.surplus_changed('100000')
+
+        self.coordinator.async_set_terminals_max_charging_current.assert_not_called()
+        async_call_later.assert_called_once_with(self.hass, 200, self.follower.async_follow)
+
+        monotonic.return_value = 1300
+        self.follower.async_follow(datetime.now())
+        await self.written()
+        async_call_later.return_value.assert_called_once()
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once()
+
+    async def test_pause_below_minimum_current_then_resume(self, monotonic, _):
+        self.coordinator.data = terminals(('1', ChargingStatus.in_use, 20))
+        await self.surplus_changed('-1000')
+        self.assertWritten({'1': 0})
+
+        self.coordinator.data = terminals(('1', ChargingStatus.available, 0))
+        monotonic.return_value = 10000
+        await self.surplus_changed('4800')
+        self.assertWritten({'1': 20})
+
+    async def test_never_exceed_share_of_site_limit(self, _, __):
+        self.follower.load_balancer = Mock(EVDutyLoadBalancer)
+        self.follower.load_balancer.async_cap.side_effect = lambda currents: {terminal_id: min(current, 16) for terminal_id, current in currents.items()}
+
+        await self.surplus_changed('100000')
+
+        self.assertWritten({'1': 16})
+
+    async def test_ignore_unavailable_surplus(self, _, __):
+        await self.surplus_changed('unavailable')
+        await self.surplus_changed('invalid')
+
+        self.assertIsNone(self.follower.surplus)
+        self.coordinator.async_set_terminals_max_charging_current.assert_not_called()
+
+    async def test_retry_after_failed_write(self, _, __):
+        self.coordinator.async_set_terminals_max_charging_current.side_effect = lambda currents: {'1': 'cannot_connect'}
+
+        await self.surplus_changed('4800')
+
+        self.assertIsNone(self.follower._last_write)
+
+    @patch('custom_components.evduty.surplus_follower.async_track_state_change_event')
+    async def test_start_listening_to_surplus_sensor(self, async_track_state_change_event, _, __):
+        stop = self.follower.async_start()
+
+        async_track_state_change_event.assert_called_once_with(self.hass, ['sensor.grid_export'], self.follower._async_surplus_changed)
+        stop()
+        async_track_state_change_event.return_value.assert_called_once()
+
+    async def surplus_changed(self, state):
+        self.follower._async_surplus_changed(Event('state_changed', {'entity_id': 'sensor.grid_export', 'old_state': None,
+                                                                    'new_state': State('sensor.grid_export', state)}))
+        await self.written()
+
+    async def written(self):
+        for call in self.hass.async_create_task.call_args_list:
+            await call.args[0]
+        self.hass.async_create_task.reset_mock()
+
+    def assertWritten(self, currents):
+        self.coordinator.async_set_terminals_max_charging_current.assert_called_once_with(currents)
+        self.coordinator.async_set_terminals_max_charging_current.reset_mock()
+
+
+def terminals(*terminals):
+    data = {}
+    for terminal_id, status, current_limit, *power in terminals:
+        terminal = Mock(Terminal)
+        terminal.id = terminal_id
+        terminal.status = status
+        terminal.charging_profile = ChargingProfile(power_limitation=True, current_limit=current_limit, current_max=48)
+        terminal.session = ChargingSession(is_active=True, is_charging=bool(power), volt=240, amp=0, power=(power or [0])[0], energy_consumed=0,
+                                           start_date=datetime(2024, 1, 1), duration=timedelta(), cost=0)
+        data[terminal_id] = terminal
+    return data
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from evdutyapi import ChargingSession
+
+from custom_components.evduty.telemetry import TerminalTelemetry, TelemetrySample
+
+
+class TerminalTelemetryTest(TestCase):
+
+    def test_empty(self):
+        telemetry = TerminalTelemetry(size=3)
+
+        self.assertEqual(len(telemetry), 0)
+        self.assertIsNone(telemetry.latest())
+        self.assertEqual(telemetry.window(60), [])
+
+    def test_keep_samples_in_order(self):
+        telemetry = TerminalTelemetry(size=3)
+
+        telemetry.append(10, session(power=1000, amp=4, volt=240, energy=100))
+        telemetry.append(20, session(power=2000, amp=8, volt=241, energy=110))
+
+        self.assertEqual(list(telemetry), [TelemetrySample(10, 1000, 4, 240, 100), TelemetrySample(20, 2000, 8, 241, 110)])
+        self.assertEqual(telemetry.latest(), TelemetrySample(20, 2000, 8, 241, 110))
+
+    def test_overwrite_oldest_samples_when_full(self):
+        telemetry = TerminalTelemetry(size=3)
+
+        for timestamp in range(5):
+            telemetry.append(timestamp, session(power=timestamp))
+
+        self.assertEqual(len(telemetry), 3)
+        self.assertEqual([sample.timestamp for sample in telemetry], [2, 3, 4])
+        self.assertEqual(telemetry[0].power, 2)
+        self.assertEqual(telemetry[-1].power, 4)
+
+    def test_raise_on_index_out_of_range(self):
+        telemetry = TerminalTelemetry(size=3)
+        telemetry.append(10, session())
+
+        with self.assertRaises(IndexError):
+            _ = telemetry[1]
+
+    def test_grow_up_to_size(self):
+        telemetry = TerminalTelemetry(size=3)
+
+        telemetry.append(10, session())
+
+        self.assertEqual(len(telemetry._timestamps), 1)
+
+    def test_window_of_latest_samples_after_overwrite(self):
+        telemetry = TerminalTelemetry(size=4)
+
+        for timestamp in (0, 15, 30, 45, 60, 75):
+            telemetry.append(timestamp, session(power=timestamp))
+
+        self.assertEqual([sample.timestamp for sample in telemetry.window(30)], [45, 60, 75])
+        self.assertEqual([sample.timestamp for sample in telemetry.window(3600)], [30, 45, 60, 75])
+
+    def test_window_of_latest_samples(self):
+        telemetry = TerminalTelemetry(size=5)
+
+        for timestamp in (0, 15, 30, 45, 60):
+            telemetry.append(timestamp, session(power=timestamp))
+
+        self.assertEqual([sample.timestamp for sample in telemetry.window(30)], [30, 45, 60])
+
+
+def session(power=0, amp=0, volt=0, energy=0):
+    return ChargingSession(is_active=True, is_charging=True, volt=volt, amp=amp, power=power, energy_consumed=energy,
+                           start_date=datetime(2024, 1, 1), duration=timedelta(minutes=1), cost=0)